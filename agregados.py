@@ -0,0 +1,264 @@
+import numpy as np
+import pandas as pd
+
+from fluxos import rotular
+from handshake import extrair_handshakes, tempos_handshake
+from quantis import esbocar, limitar, momentos, combinar_momentos, resumir, distribuicao
+from retransmissoes import NAO_SEGMENTO, RETRANSMISSAO
+from tempo import NS_POR_SEGUNDO, NS_POR_MINUTO, piso, em_segundos, para_datas, com_datas
+
+# Agregados parciais mescláveis usados pelo modo em blocos do dataProcessing.
+# Um parcial é um dict de Series; cada Series é combinada com a do outro
+# parcial pela operação indicada em AGREGACOES. Os resultados por fluxo são
+# indexados pelo rótulo da conexão, que é estável entre blocos (os flow_id
+# são locais a cada bloco).
+
+AGREGACOES = {
+    # por fluxo
+    'pacotes_fluxo': 'sum',
+    'bytes_fluxo': 'sum',
+    'inicio_fluxo': 'min',
+    'fim_fluxo': 'max',
+    'syn_fluxo': 'min',
+    'synack_fluxo': 'min',
+    'ack_fluxo': 'min',
+    'mss_fluxo': 'min',
+    'segmentos_fluxo': 'sum',
+    'retrans_fluxo': 'sum',
+    # estado do detector de retransmissões, por (rótulo, sentido)
+    'seq_fim': 'last',
+    't_seq_fim': 'last',
+    # contadores globais
+    'ips_origem': 'sum',
+    'portas_destino': 'sum',
+    'ips_destino': 'sum',
+    # posição da primeira ocorrência de cada chave, que decide os empates nos top 10
+    'ordem_ips_origem': 'min',
+    'ordem_portas_destino': 'min',
+    'ordem_ips_destino': 'min',
+    'retrans_ip': 'sum',
+    # esboço de quantis dos tamanhos de segmento (ver quantis.py), com os
+    # extremos exatos; os momentos (momentos_tamanhos) são mesclados à parte
+    # por combinar_momentos
+    'esboco_tamanhos': 'sum',
+    'minimo_tamanhos': 'min',
+    'maximo_tamanhos': 'max',
+    # séries temporais
+    'pacotes_segundo': 'sum',
+    'bytes_minuto': 'sum',
+    'ip_minuto': 'sum',
+}
+
+def parcial_vazio():
+    vazio = {nome: pd.Series(dtype=float) for nome in AGREGACOES}
+    vazio['momentos_tamanhos'] = momentos([])
+    for nome in ('inicio_fluxo', 'fim_fluxo', 'syn_fluxo', 'synack_fluxo', 'ack_fluxo'):
+        vazio[nome] = pd.Series(dtype='int64')
+    for nome in ('ip_minuto', 'seq_fim', 't_seq_fim'):
+        vazio[nome] = pd.Series(dtype='int64', index=pd.MultiIndex.from_arrays([[], []]))
+    return vazio
+
+
+def estado_seq(parcial, anterior=None):
+    """
+    Estado do detector de retransmissões (seq_fim, t_seq_fim por rótulo e
+    sentido) do parcial, sobreposto a um estado `anterior` opcional.
+    """
+    partes = [p for p in (anterior, parcial) if p is not None and not p['seq_fim'].empty]
+    if not partes:
+        return None
+    if len(partes) == 1:
+        return partes[0]['seq_fim'], partes[0]['t_seq_fim']
+    a, b = partes
+    return tuple(pd.concat([a[nome], b[nome]]).groupby(level=[0, 1], sort=False).last()
+                 for nome in ('seq_fim', 't_seq_fim'))
+
+
+def estado_retransmissoes(parcial, rotulos, anterior=None):
+    """
+    Converte o estado do detector guardado no parcial (e em `anterior`),
+    indexado por (rótulo, sentido), para as chaves flow_id * 2 + sentido do
+    bloco atual.
+    """
+    estado = estado_seq(parcial, anterior)
+    if estado is None:
+        return None
+    seq_fim, t_seq_fim = estado
+    indice = seq_fim.index
+    flow_id = pd.Index(rotulos).get_indexer(indice.get_level_values(0))
+    presente = flow_id >= 0
+    direcao = flow_id[presente] * 2 + indice.get_level_values(1).to_numpy()[presente]
+    return pd.DataFrame({'seq_fim': seq_fim.to_numpy()[presente],
+                         't_seq_fim': t_seq_fim.reindex(indice).to_numpy()[presente]},
+                        index=pd.Index(direcao, name='direcao'))
+
+
+def deslocar_posicoes(parcial, deslocamento):
+    """Soma `deslocamento` às posições de primeira ocorrência (parcial calculado a partir da posição 0)"""
+    parcial = dict(parcial)
+    for nome in AGREGACOES:
+        if nome.startswith('ordem_'):
+            parcial[nome] = parcial[nome] + deslocamento
+    return parcial
+
+
+def agregar_bloco(df, rotulos, estado_seq=None):
+    """
+    Calcula o parcial de um bloco já preparado (com flow_id, flags detalhadas
+    e classe_segmento). `estado_seq` é o estado devolvido pelo detector de
+    retransmissões para este bloco, que segue para o próximo.
+    """
+    grouped = df.groupby('flow_id')
+    parcial = {
+        'pacotes_fluxo': grouped.size(),
+        'bytes_fluxo': grouped['length'].sum(),
+        'inicio_fluxo': grouped['timestamp_ns'].min(),
+        'fim_fluxo': grouped['timestamp_ns'].max(),
+        'mss_fluxo': df[df['mss'] != -1].groupby('flow_id')['mss'].min(),
+        'segmentos_fluxo': (df['classe_segmento'] != NAO_SEGMENTO).groupby(df['flow_id']).sum(),
+        'retrans_fluxo': (df['classe_segmento'] == RETRANSMISSAO).groupby(df['flow_id']).sum(),
+    }
+    handshakes = extrair_handshakes(df)
+    parcial['syn_fluxo'] = handshakes['syn'].dropna().astype(np.int64)
+    parcial['synack_fluxo'] = handshakes['syn_ack'].dropna().astype(np.int64)
+    parcial['ack_fluxo'] = handshakes['ack'].dropna().astype(np.int64)
+    parcial = {nome: rotular(serie, rotulos) for nome, serie in parcial.items()}
+
+    # Contagens com a posição da primeira ocorrência (coluna 'posicao', global
+    # na captura), para que a mesclagem de blocos ou fatias recupere a ordem
+    # que o value_counts da captura inteira usaria nos empates
+    posicao = df['posicao'] if 'posicao' in df else pd.Series(np.arange(len(df)), index=df.index)
+    for nome, coluna in (('ips_origem', 'src_ip'), ('portas_destino', 'dst_port'), ('ips_destino', 'dst_ip')):
+        parcial[nome] = df[coluna].value_counts(sort=False)
+        parcial['ordem_' + nome] = posicao.groupby(df[coluna], sort=False).min()
+    parcial['retrans_ip'] = df.loc[df['classe_segmento'] == RETRANSMISSAO, 'src_ip'].value_counts(sort=False)
+    tamanhos = df['length'].dropna()
+    parcial['esboco_tamanhos'] = esbocar(tamanhos)
+    parcial['momentos_tamanhos'] = momentos(tamanhos)
+    parcial['minimo_tamanhos'] = pd.Series([tamanhos.min()] if len(tamanhos) else [], dtype=float)
+    parcial['maximo_tamanhos'] = pd.Series([tamanhos.max()] if len(tamanhos) else [], dtype=float)
+
+    # Séries por segundo/minuto indexadas pelo início do intervalo em ns
+    minuto = piso(df['timestamp_ns'], NS_POR_MINUTO)
+    parcial['pacotes_segundo'] = df.groupby(piso(df['timestamp_ns'], NS_POR_SEGUNDO)).size()
+    parcial['bytes_minuto'] = df['length'].groupby(minuto).sum()
+    parcial['ip_minuto'] = df.groupby([df['src_ip'], minuto]).size()
+
+    if estado_seq is None or estado_seq.empty:
+        estado_seq = pd.DataFrame({'seq_fim': [], 't_seq_fim': []}, index=pd.Index([], dtype='int64'))
+    direcao = estado_seq.index.to_numpy(dtype=np.int64)
+    indice = pd.MultiIndex.from_arrays([rotulos[direcao // 2], direcao % 2])
+    parcial['seq_fim'] = pd.Series(estado_seq['seq_fim'].to_numpy(), index=indice)
+    parcial['t_seq_fim'] = pd.Series(estado_seq['t_seq_fim'].to_numpy(), index=indice)
+    return parcial
+
+
+def combinar_parciais(a, b):
+    """Mescla dois parciais; a operação é associativa, então a ordem dos blocos só afeta empates"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    combinado = {}
+    for nome, operacao in AGREGACOES.items():
+        serie = pd.concat([a[nome], b[nome]])
+        niveis = list(range(serie.index.nlevels))
+        combinado[nome] = serie.groupby(level=niveis, sort=False).agg(operacao)
+    combinado['esboco_tamanhos'] = limitar(combinado['esboco_tamanhos'])
+    partes = (a['momentos_tamanhos'], b['momentos_tamanhos'])
+    combinado['momentos_tamanhos'] = combinar_momentos(*([m[nome] for m in partes] for nome in ('n', 'soma', 'm2')))
+    return combinado
+
+
+def distribuicao_tamanhos(parcial):
+    """distribuicao_tamanhos_segmentos a partir do esboço mesclado, sem a lista de tamanhos"""
+    if parcial['minimo_tamanhos'].empty:
+        return {}
+    return resumir(parcial['esboco_tamanhos'], parcial['momentos_tamanhos'], parcial['minimo_tamanhos'].min(),
+                   parcial['maximo_tamanhos'].max(), chave_total='total_segmentos')
+
+
+def distribuicoes_por_conexao(duracao, throughput, rtt):
+    """
+    Distribuições (via esboço de quantis) dos valores por conexão. São
+    calculadas depois de mesclar os fluxos, pois a duração e o throughput de
+    uma conexão só ficam definidos com todos os seus pacotes.
+    """
+    return {
+        'distribuicao_duracao_conexoes': distribuicao(duracao, chave_total='total_conexoes'),
+        'distribuicao_throughput': distribuicao(throughput, chave_total='total_conexoes'),
+        'distribuicao_rtt': distribuicao(rtt, chave_total='total_conexoes'),
+    }
+
+
+def contar_em_ordem(serie):
+    """value_counts com as chaves na ordem da primeira ocorrência na captura"""
+    return serie.value_counts(sort=False).reindex(pd.unique(serie.dropna()))
+
+
+def ranking(contagem, n=10):
+    """Top n por contagem; empates ficam na ordem de primeira ocorrência"""
+    return contagem.sort_values(ascending=False, kind='stable').head(n)
+
+
+def _contagem_em_ordem(parcial, nome):
+    """Mesmo que contar_em_ordem sobre a captura inteira, a partir das contagens mescladas"""
+    ordem = parcial['ordem_' + nome].sort_values(kind='stable')
+    return parcial[nome].reindex(ordem.index)
+
+
+def finalizar_parciais(parcial):
+    """Gera as seções de stats a partir do parcial acumulado, como no analisar_estatisticas"""
+    por_fluxo = {nome: parcial[nome].sort_index() for nome in
+                 ('bytes_fluxo', 'inicio_fluxo', 'fim_fluxo', 'syn_fluxo', 'synack_fluxo', 'ack_fluxo', 'mss_fluxo')}
+    stats = {}
+
+    duration = em_segundos(por_fluxo['fim_fluxo'] - por_fluxo['inicio_fluxo'])
+    stats['duracao_conexoes'] = duration.to_dict()
+    throughput = por_fluxo['bytes_fluxo'] / duration.replace(0, np.nan)
+    stats['throughput_por_conexao'] = throughput.fillna(0).to_dict()
+
+    # RTT (SYN -> SYN-ACK) e tempo de estabelecimento (SYN -> ACK final)
+    handshakes = pd.DataFrame({'syn': por_fluxo['syn_fluxo'].astype('Int64'),
+                               'syn_ack': por_fluxo['synack_fluxo'].astype('Int64'),
+                               'ack': por_fluxo['ack_fluxo'].astype('Int64')})
+    rtt, estabelecimento = tempos_handshake(handshakes)
+    stats['rtt_por_conexao'] = rtt.to_dict()
+    stats['tempos_estabelecimento'] = estabelecimento.tolist()
+
+    ips_origem = _contagem_em_ordem(parcial, 'ips_origem')
+    taxa_ip = (parcial['retrans_ip'] / ips_origem).fillna(0).sort_index()
+    stats['taxa_retransmissoes'] = taxa_ip.to_dict()
+    segmentos = parcial['segmentos_fluxo'].sort_index()
+    segmentos = segmentos[segmentos > 0]
+    stats['taxa_retransmissoes_por_conexao'] = (parcial['retrans_fluxo'].reindex(segmentos.index) / segmentos).to_dict()
+
+    stats['distribuicao_tamanhos_segmentos'] = distribuicao_tamanhos(parcial)
+    stats.update(distribuicoes_por_conexao(duration, throughput.fillna(0), rtt))
+    stats['mss_por_conexao'] = por_fluxo['mss_fluxo'].to_dict()
+    # Mesma ordenação do analisar_estatisticas (por rótulo, depois por bytes)
+    stats['fluxos_elefantes'] = por_fluxo['bytes_fluxo'].sort_values(ascending=False).head(10).to_dict()
+
+    pacotes_por_tempo = parcial['pacotes_segundo'].sort_index()
+    stats['microbursts'] = com_datas(pacotes_por_tempo.sort_values(ascending=False).head(10)).to_dict()
+    stats['top_aplicacoes_portas'] = ranking(_contagem_em_ordem(parcial, 'portas_destino')).astype(np.int64).to_dict()
+    stats['top_ips_destino'] = dict(ranking(_contagem_em_ordem(parcial, 'ips_destino')).astype(np.int64))
+
+    stats['pacotes_por_tempo'] = pd.DataFrame({'timestamp': para_datas(pacotes_por_tempo.index),
+                                               'count': pacotes_por_tempo.to_numpy()}).to_dict(orient='records')
+    stats['trafego_por_minuto'] = com_datas(parcial['bytes_minuto'].sort_index()).to_dict()
+
+    top_ips = ranking(ips_origem).index.tolist()
+    ip_minuto = parcial['ip_minuto']
+    # combinar_parciais agrupa com sort=False, então os minutos do índice
+    # mesclado ficam na ordem em que os blocos/fatias chegaram: as colunas do
+    # heatmap são ordenadas por tempo depois do unstack
+    heatmap_data = (ip_minuto[ip_minuto.index.get_level_values(0).isin(top_ips)].sort_index()
+                    .unstack(fill_value=0).sort_index(axis=1))
+    heatmap_data.columns = para_datas(heatmap_data.columns)
+    stats['heatmap_ips_tempo'] = {
+        'matriz': heatmap_data.to_dict(),
+        'ips': heatmap_data.index.tolist(),
+        'tempos': heatmap_data.columns.astype(str).tolist()
+    }
+    return stats
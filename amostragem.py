@@ -0,0 +1,146 @@
+import argparse
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from fluxos import chavear_fluxos
+from leitorPcap import ips_para_texto
+from colunar import (eh_colunar, carregar_colunar, dataframe_para_colunas, colunas_para_csv,
+                     EscritorColunar, CABECALHO_CSV)
+
+# Amostras pequenas e representativas do data.csv (ou do formato colunar) para
+# iterar rápido, no lugar das primeiras 200 mil linhas da captura. Os dois
+# modos leem a entrada uma única vez, em blocos, e gravam a saída à medida que
+# leem, então a memória não depende do tamanho da captura:
+#   - por fluxo: cada conexão entra ou sai inteira, conforme o hash (crc32) do
+#     rótulo canônico "ip_a:porta_a <-> ip_b:porta_b", o mesmo usado pelo
+#     dataProcessing.py --workers; handshakes e retransmissões ficam completos
+#   - por tempo: a captura é dividida em estratos de `estrato` segundos e de
+#     cada estrato sai a mesma fração dos pacotes, espaçados uniformemente,
+#     então o começo da captura não pesa mais que o resto
+
+TAMANHO_BLOCO = 1_000_000
+_ESCALA_HASH = 1 << 32
+
+
+def _blocos(entrada, tamanho_bloco):
+    """Blocos de (texto do CSV ou colunas, timestamps em ns, src_ip, dst_ip, src_port, dst_port)"""
+    if eh_colunar(entrada):
+        colunas = carregar_colunar(entrada)
+        for inicio in range(0, len(colunas['timestamp_ns']), tamanho_bloco):
+            fatia = {nome: np.asarray(col[inicio:inicio + tamanho_bloco]) for nome, col in colunas.items()}
+            yield (fatia, fatia['timestamp_ns'], ips_para_texto(fatia['src_ip']), ips_para_texto(fatia['dst_ip']),
+                   fatia['src_port'], fatia['dst_port'])
+        return
+    # Tudo como texto e sem conversão de vazios, para regravar as linhas como vieram
+    for bloco in pd.read_csv(entrada, dtype=str, keep_default_na=False, chunksize=tamanho_bloco):
+        ts = pd.to_numeric(bloco['timestamp'], errors='coerce').to_numpy(dtype=np.float64)
+        ns = np.round(np.nan_to_num(ts) * 1e6).astype(np.int64) * 1000
+        yield (bloco, ns, bloco['src_ip'].replace('', None), bloco['dst_ip'].replace('', None),
+               bloco['src_port'], bloco['dst_port'])
+
+
+class _Saida:
+    """Grava as linhas escolhidas no formato pedido (CSV ou colunar), qualquer que seja a entrada"""
+
+    def __init__(self, caminho):
+        self.colunar = eh_colunar(caminho)
+        self.total = 0
+        if self.colunar:
+            self.destino = EscritorColunar(caminho)
+        else:
+            self.destino = open(caminho, "w", encoding="utf-8")
+            self.destino.write(CABECALHO_CSV)
+
+    def gravar(self, bloco, escolhidas):
+        self.total += int(escolhidas.sum())
+        if isinstance(bloco, dict):
+            fatia = {nome: col[escolhidas] for nome, col in bloco.items()}
+            if self.colunar:
+                self.destino.adicionar(fatia)
+            else:
+                colunas_para_csv(fatia, self.destino)
+        elif self.colunar:
+            self.destino.adicionar(dataframe_para_colunas(bloco[escolhidas]))
+        else:
+            bloco[escolhidas].to_csv(self.destino, index=False, header=False, lineterminator='\n')
+
+    def fechar(self):
+        if self.colunar:
+            self.destino.fechar()
+        else:
+            self.destino.close()
+
+
+def fluxos_escolhidos(rotulos, taxa, semente=0):
+    """Quais rótulos de fluxo entram na amostra: crc32(rótulo) / 2**32 < taxa"""
+    hashes = np.array([zlib.crc32(r.encode(), semente) for r in rotulos], dtype=np.int64)
+    return hashes < taxa * _ESCALA_HASH
+
+
+def amostrar_por_fluxo(entrada, saida, taxa, semente=0, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Mantém os pacotes de uma fração `taxa` das conexões, escolhidas pelo hash
+    do rótulo canônico. A escolha depende só do rótulo, então é a mesma em
+    qualquer bloco ou arquivo; `semente` troca o conjunto de fluxos escolhidos.
+    """
+    destino = _Saida(saida)
+    lidos = 0
+    try:
+        for bloco, _, src_ip, dst_ip, src_port, dst_port in _blocos(entrada, tamanho_bloco):
+            flow_id, rotulos = chavear_fluxos(src_ip, dst_ip, src_port, dst_port)
+            destino.gravar(bloco, fluxos_escolhidos(rotulos, taxa, semente)[flow_id])
+            lidos += len(flow_id)
+    finally:
+        destino.fechar()
+    print(f"[OK] {destino.total} de {lidos} pacotes ({taxa:.1%} dos fluxos) salvos em: {saida}")
+    return destino.total
+
+
+def amostrar_por_tempo(entrada, saida, taxa, estrato=1.0, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Divide a captura em estratos de `estrato` segundos e mantém, em cada um,
+    os pacotes em que a contagem acumulada de taxa * posição no estrato muda
+    de inteiro (amostragem sistemática). Cada estrato contribui com
+    ~taxa * pacotes, mesmo que um estrato fique dividido entre blocos. Como
+    os blocos chegam em ordem de tempo, os contadores de estratos anteriores
+    ao bloco atual são descartados: só os estratos do bloco ficam em memória.
+    """
+    destino = _Saida(saida)
+    vistos = pd.Series(dtype=np.int64)   # pacotes já vistos de cada estrato
+    lidos = 0
+    estrato_ns = int(round(estrato * 1e9))
+    try:
+        for bloco, ns, *_ in _blocos(entrada, tamanho_bloco):
+            estratos = pd.Series(ns // estrato_ns)
+            posicao = (estratos.groupby(estratos).cumcount().to_numpy()
+                       + vistos.reindex(estratos.to_numpy(), fill_value=0).to_numpy())
+            escolhidas = np.floor((posicao + 1) * taxa) > np.floor(posicao * taxa)
+            destino.gravar(bloco, escolhidas)
+            vistos = vistos.add(estratos.value_counts(), fill_value=0).astype(np.int64)
+            vistos = vistos[vistos.index >= estratos.min()]
+            lidos += len(ns)
+    finally:
+        destino.fechar()
+    print(f"[OK] {destino.total} de {lidos} pacotes ({taxa:.1%} de cada {estrato:g} s) salvos em: {saida}")
+    return destino.total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera uma amostra representativa do data.csv")
+    # ex.: python amostragem.py data_filtrado.csv data_1pct.csv --taxa 0.01
+    parser.add_argument("entrada", help="CSV do extrator ou diretório .colunas")
+    parser.add_argument("saida", help="CSV ou diretório .colunas de saída")
+    parser.add_argument("--taxa", type=float, default=0.1, help="fração da amostra (0 a 1)")
+    parser.add_argument("--modo", choices=["fluxo", "tempo"], default="fluxo",
+                        help="fluxo: conexões inteiras; tempo: mesma fração em cada estrato de tempo")
+    parser.add_argument("--semente", type=int, default=0, help="muda os fluxos escolhidos no modo fluxo")
+    parser.add_argument("--estrato", type=float, default=1.0, help="tamanho do estrato em segundos no modo tempo")
+    parser.add_argument("--blocos", type=int, default=TAMANHO_BLOCO, metavar="N", help="linhas lidas por vez")
+    args = parser.parse_args()
+
+    if args.modo == "fluxo":
+        amostrar_por_fluxo(args.entrada, args.saida, args.taxa, args.semente, args.blocos)
+    else:
+        amostrar_por_tempo(args.entrada, args.saida, args.taxa, args.estrato, args.blocos)
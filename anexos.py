@@ -0,0 +1,169 @@
+import json
+import os
+
+import numpy as np
+
+# Seções grandes dos jsons de estatísticas (um valor por pacote) gravadas em
+# arquivos .npz ao lado do json. No json a seção vira só uma referência
+# {"anexo": "stats_completo.janela_congestionamento.npz", "formato": "npz"},
+# então o json.load dos scripts de gráficos fica pequeno e a seção só é lida
+# do disco quando um gráfico pede por ela (ver carregar_estatisticas).
+#   - janela_congestionamento: rótulos dos fluxos, limites de cada fluxo nos
+#     arrays, timestamps em ns, resolução do texto de cada fluxo e valores
+#     (os arrays de Janelas, gravados direto, sem passar por texto)
+#   - tamanhos_segmentos: array float64
+
+SECOES_ANEXAS = ('janela_congestionamento', 'tamanhos_segmentos')
+FORMATO_ANEXO = 'npz'
+
+# Resolução usada pelo pandas ao converter datetimes para texto: a série inteira
+# usa a menor unidade que representa todos os valores (só data, s, ms, us, ns)
+UNIDADES_TEXTO = ['D', 's', 'ms', 'us', 'ns']
+
+
+def resolucao_texto(ns):
+    """Índice em UNIDADES_TEXTO necessário para cada timestamp em nanossegundos"""
+    nivel = np.full(len(ns), 4, dtype=np.int8)
+    nivel[ns % 1_000 == 0] = 3
+    nivel[ns % 1_000_000 == 0] = 2
+    nivel[ns % 1_000_000_000 == 0] = 1
+    nivel[ns % 86_400_000_000_000 == 0] = 0
+    return nivel
+
+
+def timestamps_para_texto(ns, nivel):
+    """Formata timestamps em ns como o astype(str) do pandas, na unidade indicada por nivel"""
+    texto = np.empty(len(ns), dtype=object)
+    datas = ns.view('datetime64[ns]')
+    for i, unidade in enumerate(UNIDADES_TEXTO):
+        mascara = nivel == i
+        if mascara.any():
+            texto[mascara] = np.char.replace(np.datetime_as_string(datas[mascara], unit=unidade), 'T', ' ')
+    return texto
+
+
+class Janelas:
+    """
+    janela_congestionamento como sai do cálculo: os mesmos arrays do anexo.
+    O texto dos timestamps só é gerado em para_dict (json com --embutir).
+    """
+
+    def __init__(self, rotulos, limites, timestamp_ns, nivel, valores):
+        self.rotulos = rotulos
+        self.limites = limites
+        self.timestamp_ns = timestamp_ns
+        self.nivel = nivel
+        self.valores = valores
+
+    def __len__(self):
+        return len(self.rotulos)
+
+    def arrays(self):
+        return {
+            'rotulos': np.array(list(self.rotulos), dtype=str),
+            'limites': np.asarray(self.limites, dtype=np.int64),
+            'timestamp_ns': np.asarray(self.timestamp_ns, dtype=np.int64),
+            'nivel': np.asarray(self.nivel, dtype=np.int8),
+            'valores': np.asarray(self.valores, dtype=np.float64),
+        }
+
+    def para_dict(self):
+        """{rótulo: [(timestamp_str, valor), ...]}"""
+        return _arrays_para_janelas(self.arrays())
+
+    @classmethod
+    def juntar(cls, partes):
+        """Junta janelas de fluxos disjuntos (as fatias do modo paralelo) na ordem dos rótulos"""
+        partes = list(partes)
+        rotulos = np.concatenate([np.asarray(p.rotulos, dtype=object) for p in partes] + [np.empty(0, dtype=object)])
+        deslocamentos = np.cumsum([0] + [p.limites[-1] for p in partes])
+        inicios = np.concatenate([p.limites[:-1] + d for p, d in zip(partes, deslocamentos)] + [np.empty(0, np.int64)])
+        tamanhos = np.concatenate([np.diff(p.limites) for p in partes] + [np.empty(0, np.int64)])
+        ordem = np.argsort(rotulos.astype(str), kind='stable')
+        inicios, tamanhos = inicios[ordem].astype(np.int64), tamanhos[ordem].astype(np.int64)
+        limites = np.concatenate(([0], np.cumsum(tamanhos))).astype(np.int64)
+        indice = np.repeat(inicios - limites[:-1], tamanhos) + np.arange(limites[-1])
+        juntos = {nome: np.concatenate([getattr(p, nome) for p in partes] + [np.empty(0, tipo)])
+                  for nome, tipo in (('timestamp_ns', np.int64), ('valores', np.float64))}
+        nivel = np.concatenate([p.nivel for p in partes] + [np.empty(0, np.int8)])
+        return cls(rotulos[ordem], limites, juntos['timestamp_ns'][indice], nivel[ordem], juntos['valores'][indice])
+
+
+def _arrays_para_janelas(arrays):
+    limites = arrays['limites']
+    nivel = np.repeat(arrays['nivel'], np.diff(limites))
+    texto = timestamps_para_texto(arrays['timestamp_ns'], nivel).tolist()
+    valores = arrays['valores'].tolist()
+    limites = limites.tolist()
+    return {rotulo: list(zip(texto[a:b], valores[a:b]))
+            for rotulo, a, b in zip(arrays['rotulos'].tolist(), limites[:-1], limites[1:])}
+
+
+def caminho_anexo(caminho_json, secao):
+    return f"{os.path.splitext(caminho_json)[0]}.{secao}.{FORMATO_ANEXO}"
+
+
+def salvar_anexo(secao, valor, caminho_json):
+    """Grava a seção em .npz ao lado do json e devolve a referência que vai no json"""
+    caminho = caminho_anexo(caminho_json, secao)
+    if isinstance(valor, Janelas):
+        arrays = valor.arrays()
+    else:
+        arrays = {'valores': np.asarray(valor, dtype=np.float64)}
+    np.savez(caminho, **arrays)
+    return {'anexo': os.path.basename(caminho), 'formato': FORMATO_ANEXO}
+
+
+def separar_anexos(stats, caminho_json, secoes=SECOES_ANEXAS):
+    """
+    Cópia rasa de `stats` com as seções grandes trocadas por referências aos
+    anexos. Seções que já são referências (o resumo montado de stats já
+    separado) ficam como estão, então cada anexo é gravado uma vez só.
+    """
+    return {secao: salvar_anexo(secao, valor, caminho_json)
+            if secao in secoes and not eh_referencia(valor) else valor
+            for secao, valor in stats.items()}
+
+
+def embutir_anexos(stats):
+    """Cópia rasa de `stats` com as janelas em texto, para gravar tudo dentro do json"""
+    return {secao: valor.para_dict() if isinstance(valor, Janelas) else valor
+            for secao, valor in stats.items()}
+
+
+def eh_referencia(valor):
+    return isinstance(valor, dict) and set(valor) == {'anexo', 'formato'}
+
+
+def carregar_anexo(secao, referencia, pasta='.'):
+    with np.load(os.path.join(pasta, referencia['anexo'])) as arrays:
+        if secao == 'janela_congestionamento':
+            return _arrays_para_janelas(arrays)
+        return arrays['valores'].tolist()
+
+
+class Estatisticas(dict):
+    """
+    Dict das estatísticas em que as seções anexas só são lidas do .npz no
+    primeiro acesso a elas (e ficam guardadas depois disso).
+    """
+
+    def __init__(self, dados, pasta='.'):
+        super().__init__(dados)
+        self.pasta = pasta
+
+    def __getitem__(self, secao):
+        valor = super().__getitem__(secao)
+        if eh_referencia(valor):
+            valor = carregar_anexo(secao, valor, self.pasta)
+            super().__setitem__(secao, valor)
+        return valor
+
+    def get(self, secao, padrao=None):
+        return self[secao] if secao in self else padrao
+
+
+def carregar_estatisticas(caminho):
+    """json.load que resolve as referências aos anexos sob demanda"""
+    with open(caminho, 'r') as f:
+        return Estatisticas(json.load(f), os.path.dirname(os.path.abspath(caminho)))
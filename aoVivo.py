@@ -0,0 +1,206 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from leitorPcap import ler_pcap_continuo
+from retransmissoes import NAO_SEGMENTO, RETRANSMISSAO
+from tabelaFluxos import TabelaFluxos
+from frequentes import resumo_vazio, resumir_frequentes, combinar_frequentes, mais_frequentes
+from microbursts import RESOLUCOES, RESOLUCAO_PADRAO, detectar_microbursts
+from quantis import distribuicao
+from handshake import segundos_em_microssegundos
+from tempo import NS_POR_SEGUNDO, para_datas
+
+# Análise ao vivo de um pcap que ainda está sendo capturado: lê do stdin
+# ("tcpdump -w - tcp | python aoVivo.py") ou acompanha um arquivo que cresce
+# (python aoVivo.py captura.pcap --seguir) e, a cada `intervalo` segundos do
+# tempo da captura, emite uma linha json com as métricas do intervalo.
+# Os pacotes chegam em blocos (ver leitorPcap.ler_pcap_continuo) e cada bloco
+# é processado de forma vetorizada, com custo proporcional ao número de
+# pacotes do bloco e não ao que já passou:
+#   - tabela de fluxos (tabelaFluxos.TabelaFluxos, com a marca de RTT já
+#     emitido), com primeiro/último pacote, pacotes, bytes, SYN/SYN-ACK e o
+#     estado do detector de retransmissões por sentido; fluxos sem pacotes há
+#     mais de `ocioso` segundos são expirados e a posição volta a ser usada
+#   - top portas em resumos Space-Saving (frequentes.py) do intervalo e total
+#   - microbursts do intervalo pelo motor de microbursts.py
+
+INTERVALO_PADRAO = 5.0
+OCIOSO_PADRAO = 120.0
+CAPACIDADE_INICIAL = 1 << 14
+_SEM_TEMPO = np.iinfo(np.int64).max
+
+
+class TabelaFluxosAoVivo(TabelaFluxos):
+    """TabelaFluxos com a marca de RTT já emitido por fluxo (o RTT sai uma vez por fluxo)"""
+
+    CAMPOS = {**TabelaFluxos.CAMPOS, 'rtt_emitido': (bool, None, False)}
+
+    def __init__(self, capacidade=CAPACIDADE_INICIAL):
+        super().__init__(capacidade)
+
+
+class _Rotulos:
+    """Rótulos indexados pela posição na tabela, calculados só para os fluxos emitidos"""
+
+    def __init__(self, tabela):
+        self.tabela = tabela
+
+    def __getitem__(self, posicao):
+        return self.tabela.rotulo(int(posicao))
+
+
+class AnalisadorAoVivo:
+    def __init__(self, intervalo=INTERVALO_PADRAO, ocioso=OCIOSO_PADRAO, resolucao=RESOLUCAO_PADRAO):
+        self.intervalo_ns = int(intervalo * NS_POR_SEGUNDO)
+        self.ocioso_ns = int(ocioso * NS_POR_SEGUNDO)
+        self.resolucao = resolucao
+        self.tabela = TabelaFluxosAoVivo()
+        self.portas_total = resumo_vazio()
+        self.vistos = 0
+        self.inicio_intervalo = None
+        self._zerar_intervalo()
+
+    def _zerar_intervalo(self):
+        self.pacotes = 0
+        self.bytes = 0
+        self.segmentos = 0
+        self.retransmissoes = 0
+        self.rtts = []
+        self.portas = resumo_vazio()
+        self.trechos = []
+
+    def processar(self, colunas):
+        """Incorpora um bloco de colunas (ler_pcap_continuo); gera as linhas dos intervalos fechados"""
+        ns = colunas['timestamp_ns']
+        if not len(ns):
+            return
+        if (np.diff(ns) < 0).any():
+            ordem = np.argsort(ns, kind='stable')
+            colunas = {nome: col[ordem] for nome, col in colunas.items()}
+            ns = colunas['timestamp_ns']
+        if self.inicio_intervalo is None:
+            self.inicio_intervalo = int(ns[0]) - int(ns[0]) % self.intervalo_ns
+        inicio = 0
+        while inicio < len(ns):
+            fim_intervalo = self.inicio_intervalo + self.intervalo_ns
+            fim = int(np.searchsorted(ns, fim_intervalo, side='left'))
+            if fim > inicio:
+                self._incorporar({nome: col[inicio:fim] for nome, col in colunas.items()})
+            if fim == len(ns):
+                break
+            yield self._emitir()
+            self.inicio_intervalo = fim_intervalo
+            inicio = fim
+
+    def _incorporar(self, c):
+        ns = c['timestamp_ns']
+        # Acumuladores por fluxo, handshake e retransmissões (com o estado dos
+        # sentidos) na tabela de fluxos
+        posicao, _, classes = self.tabela.atualizar(c)
+        a = self.tabela.arrays
+
+        # Handshake: o RTT sai uma vez por fluxo, quando o SYN-ACK chega depois do SYN
+        syn_ack = ((c['flags'] & 0x02) != 0) & ((c['flags'] & 0x10) != 0)
+        candidatos = np.unique(posicao[syn_ack])
+        completos = candidatos[~a['rtt_emitido'][candidatos] & (a['syn_ns'][candidatos] != _SEM_TEMPO)
+                               & (a['synack_ns'][candidatos] >= a['syn_ns'][candidatos])]
+        a['rtt_emitido'][completos] = True
+        self.rtts.append(segundos_em_microssegundos(pd.Series(a['synack_ns'][completos] - a['syn_ns'][completos])))
+
+        self.segmentos += int((classes != NAO_SEGMENTO).sum())
+        self.retransmissoes += int((classes == RETRANSMISSAO).sum())
+
+        self.pacotes += len(ns)
+        self.bytes += int(c['length'].sum())
+        posicoes = np.arange(self.vistos, self.vistos + len(ns))
+        self.portas = combinar_frequentes(self.portas, resumir_frequentes(c['dst_port'], posicoes=posicoes))
+        self.vistos += len(ns)
+        self.trechos.append((ns, c['length'], posicao))
+
+    def _emitir(self):
+        """Linha do intervalo atual; expira os fluxos ociosos e zera os contadores do intervalo"""
+        segundos = self.intervalo_ns / NS_POR_SEGUNDO
+        fim = self.inicio_intervalo + self.intervalo_ns
+        self.portas_total = combinar_frequentes(self.portas_total, self.portas)
+        rtts = np.concatenate(self.rtts) if self.rtts else np.empty(0)
+        microbursts = self._microbursts()
+        linha = {
+            'inicio': str(para_datas([self.inicio_intervalo])[0]),
+            'fim': str(para_datas([fim])[0]),
+            'pacotes': self.pacotes,
+            'bytes': self.bytes,
+            'throughput_bytes_por_s': self.bytes / segundos,
+            'pacotes_por_s': self.pacotes / segundos,
+            'rtt_handshake': distribuicao(rtts, chave_total='total_handshakes'),
+            'segmentos': self.segmentos,
+            'retransmissoes': self.retransmissoes,
+            'taxa_retransmissoes': self.retransmissoes / self.segmentos if self.segmentos else 0.0,
+            'top_portas': {str(p): int(n) for p, n in mais_frequentes(self.portas).items()},
+            'top_portas_total': {str(p): int(n) for p, n in mais_frequentes(self.portas_total).items()},
+            'microbursts': microbursts,
+            'fluxos_expirados': self.tabela.expirar(fim - self.ocioso_ns),
+        }
+        linha['fluxos_ativos'] = len(self.tabela)
+        self._zerar_intervalo()
+        return linha
+
+    def _microbursts(self):
+        if not self.trechos:
+            return []
+        ns, tamanhos, posicao = (np.concatenate(partes) for partes in zip(*self.trechos))
+        rajadas = detectar_microbursts(ns, tamanhos, posicao, _Rotulos(self.tabela), self.resolucao)
+        rajadas['inicio'] = para_datas(rajadas['inicio_ns']).astype(str)
+        return rajadas.drop(columns='inicio_ns').to_dict(orient='records')
+
+    def finalizar(self):
+        """Linha do último intervalo (parcial), no fim da entrada"""
+        return self._emitir() if self.inicio_intervalo is not None else None
+
+
+def analisar_ao_vivo(arquivo, saida, seguir=False, **opcoes):
+    """Lê o pcap de `arquivo` em blocos e escreve uma linha json por intervalo em `saida`"""
+    analisador = AnalisadorAoVivo(**opcoes)
+    try:
+        for colunas in ler_pcap_continuo(arquivo, seguir=seguir):
+            for linha in analisador.processar(colunas):
+                saida.write(json.dumps(linha) + "\n")
+                saida.flush()
+    finally:
+        # Fim da entrada ou Ctrl+C: emite o intervalo em andamento
+        linha = analisador.finalizar()
+        if linha is not None:
+            saida.write(json.dumps(linha) + "\n")
+            saida.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Métricas contínuas de um pcap em captura (stdin ou arquivo)")
+    # ex.: tcpdump -i eth0 -w - tcp | python aoVivo.py
+    parser.add_argument("entrada", nargs="?", default="-", help="arquivo .pcap ou - para o stdin")
+    parser.add_argument("--seguir", action="store_true", help="continua lendo o arquivo à medida que ele cresce")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_PADRAO,
+                        help="segundos (tempo da captura) entre duas linhas de métricas")
+    parser.add_argument("--ocioso", type=float, default=OCIOSO_PADRAO,
+                        help="segundos sem pacotes até um fluxo sair da tabela")
+    parser.add_argument("--resolucao", choices=list(RESOLUCOES), default=RESOLUCAO_PADRAO,
+                        help="largura dos intervalos na detecção de microbursts")
+    parser.add_argument("--saida", help="arquivo .jsonl de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    opcoes = dict(intervalo=args.intervalo, ocioso=args.ocioso, resolucao=args.resolucao)
+    saida = open(args.saida, "a") if args.saida else sys.stdout
+    try:
+        if args.entrada == "-":
+            analisar_ao_vivo(sys.stdin.buffer, saida, **opcoes)
+        else:
+            with open(args.entrada, "rb") as f:
+                analisar_ao_vivo(f, saida, seguir=args.seguir, **opcoes)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.saida:
+            saida.close()
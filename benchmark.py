@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from perfil import Perfil
+
+# Benchmark das etapas da análise sobre tráfego sintético (gerarTrafego.py).
+# Para cada tamanho o arquivo de entrada é gerado uma vez (mesma semente e
+# parâmetros -> mesmo arquivo, reaproveitado entre execuções) e as etapas
+# rodam em um processo novo, para que a memória de um tamanho não contamine
+# a medição do próximo:
+#   analisar_estatisticas -> salvar_estatisticas -> metricas.plotar_graficos
+#   -> graficos.gerar_graficos
+# Cada etapa registra tempo de relógio, CPU e pico de RSS (perfil.py), e as
+# etapas internas de analisar_estatisticas entram com nível 1. Os
+# resultados são acrescentados em benchmarks/resultados.jsonl (uma linha por
+# tamanho, com id da execução, commit e versões), e --comparar mostra a
+# variação de cada etapa entre duas execuções do mesmo formato de entrada.
+
+PASTA_BENCHMARKS = "benchmarks"
+TAMANHOS_PADRAO = "200k,2M,20M"
+SUFIXOS = {'k': 1_000, 'M': 1_000_000}
+
+
+def ler_tamanho(texto):
+    texto = texto.strip()
+    if texto[-1] in SUFIXOS:
+        return int(float(texto[:-1]) * SUFIXOS[texto[-1]])
+    return int(texto)
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def preparar_entrada(pacotes, formato, pasta, semente=1):
+    """Gera (se ainda não existir) o arquivo sintético do tamanho pedido"""
+    from gerarTrafego import gerar_colunas, salvar_csv, salvar_pcap
+    caminho = os.path.join(pasta, f"sintetico_{pacotes}_s{semente}.{formato}")
+    if not os.path.exists(caminho):
+        colunas = gerar_colunas(pacotes, semente=semente)
+        temporario = caminho + ".tmp"
+        (salvar_pcap if formato == 'pcap' else salvar_csv)(colunas, temporario)
+        os.replace(temporario, caminho)
+    return caminho
+
+
+def medir_etapas(entrada, pasta, graficos=True):
+    """Roda as etapas sobre `entrada` gravando as saídas em `pasta`; devolve o relatório do perfil"""
+    from dataProcessing import analisar_estatisticas, salvar_estatisticas, montar_resumo
+    from anexos import carregar_estatisticas
+
+    os.chdir(pasta)
+    perfil = Perfil()
+    with perfil.etapa('analisar_estatisticas') as registro:
+        stats, _ = analisar_estatisticas(entrada, perfil=perfil)
+        registro['fluxos'] = len(stats.get('duracao_conexoes', {}))
+    with perfil.etapa('salvar_estatisticas'):
+        stats = salvar_estatisticas(stats, "stats_completo.json")
+        salvar_estatisticas(montar_resumo(stats), "stats_metricas.json")
+    del stats
+
+    if graficos:
+        try:
+            import metricas
+            import graficos as graficos_
+        except ImportError as erro:
+            perfil.pular('metricas.plotar_graficos', str(erro))
+            perfil.pular('graficos.gerar_graficos', str(erro))
+        else:
+            with perfil.etapa('metricas.plotar_graficos'):
+                metricas.plotar_graficos(carregar_estatisticas("stats_metricas.json"))
+            with perfil.etapa('graficos.gerar_graficos'):
+                graficos_.gerar_graficos(carregar_estatisticas("stats_completo.json"))
+    return perfil.relatorio()
+
+
+def executar(tamanhos, formato='csv', pasta=PASTA_BENCHMARKS, semente=1, graficos=True):
+    """Mede todos os tamanhos e acrescenta os resultados em pasta/resultados.jsonl"""
+    dados = os.path.abspath(os.path.join(pasta, "dados"))
+    os.makedirs(dados, exist_ok=True)
+    execucao = time.strftime("%Y%m%d-%H%M%S")
+    comum = {
+        'execucao': execucao,
+        'commit': _commit(),
+        'formato': formato,
+        'semente': semente,
+        'maquina': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                    'plataforma': platform.platform(), 'cpus': os.cpu_count()},
+    }
+    for pacotes in tamanhos:
+        inicio = time.perf_counter()
+        entrada = preparar_entrada(pacotes, formato, dados, semente)
+        geracao = time.perf_counter() - inicio
+        saida = os.path.abspath(os.path.join(pasta, "saida", f"{execucao}_{pacotes}"))
+        os.makedirs(saida, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=1) as processo:
+            relatorio = processo.submit(medir_etapas, entrada, saida, graficos).result()
+        resultado = {**comum, 'pacotes': pacotes, 'geracao_entrada_s': geracao, **relatorio}
+        with open(os.path.join(pasta, "resultados.jsonl"), 'a') as f:
+            f.write(json.dumps(resultado) + "\n")
+        print(f"[+] {pacotes} pacotes: {relatorio['total_s']:.2f} s, pico {relatorio['pico_rss_mb']:.0f} MB")
+        for etapa in relatorio['etapas']:
+            nome = "  " * etapa['nivel'] + etapa['etapa']
+            if 'erro' in etapa:
+                print(f"    {nome:<30} pulada: {etapa['erro']}")
+            else:
+                print(f"    {nome:<30} {etapa['tempo_s']:8.2f} s  cpu {etapa['cpu_s']:8.2f} s  "
+                      f"+{etapa['pico_rss_delta_mb']:.0f} MB")
+    return execucao
+
+
+def carregar_resultados(pasta=PASTA_BENCHMARKS):
+    caminho = os.path.join(pasta, "resultados.jsonl")
+    if not os.path.exists(caminho):
+        return pd.DataFrame()
+    with open(caminho) as f:
+        linhas = [json.loads(linha) for linha in f if linha.strip()]
+    return pd.DataFrame([{'execucao': r['execucao'], 'commit': r['commit'], 'formato': r['formato'],
+                          'pacotes': r['pacotes'], **e} for r in linhas for e in r['etapas'] if 'erro' not in e])
+
+
+def comparar(base=None, nova=None, pasta=PASTA_BENCHMARKS):
+    """
+    Tabela etapa x tamanho com tempo e pico de RSS de duas execuções (padrão:
+    a última e a anterior a ela no mesmo formato) e a razão nova/base do tempo.
+    """
+    resultados = carregar_resultados(pasta)
+    execucoes = sorted(resultados['execucao'].unique()) if len(resultados) else []
+    if not execucoes and not (base and nova):
+        raise ValueError("são necessárias pelo menos duas execuções em resultados.jsonl")
+    nova = nova or execucoes[-1]
+    if base is None:
+        # csv e pcap medem leitores diferentes: a base é a execução anterior no mesmo formato
+        formatos = set(resultados.loc[resultados['execucao'] == nova, 'formato'])
+        anteriores = sorted(resultados.loc[(resultados['execucao'] < nova)
+                                           & resultados['formato'].isin(formatos), 'execucao'].unique())
+        if not anteriores:
+            raise ValueError(f"nenhuma execução anterior a {nova} no formato {', '.join(sorted(formatos))}")
+        base = anteriores[-1]
+    colunas = ['formato', 'pacotes', 'etapa', 'tempo_s', 'pico_rss_delta_mb']
+    a = resultados[resultados['execucao'] == base][colunas]
+    b = resultados[resultados['execucao'] == nova][colunas]
+    tabela = a.merge(b, on=['formato', 'pacotes', 'etapa'], suffixes=('_base', '_nova'))
+    tabela['razao_tempo'] = tabela['tempo_s_nova'] / tabela['tempo_s_base']
+    return base, nova, tabela
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das etapas da análise com tráfego sintético")
+    parser.add_argument("--tamanhos", default=TAMANHOS_PADRAO, help="ex.: 200k,2M,20M")
+    parser.add_argument("--formato", choices=["csv", "pcap"], default="csv")
+    parser.add_argument("--semente", type=int, default=1)
+    parser.add_argument("--pasta", default=PASTA_BENCHMARKS, help="dados gerados, saídas e resultados.jsonl")
+    parser.add_argument("--sem-graficos", action="store_true", help="não mede metricas.py e graficos.py")
+    parser.add_argument("--comparar", nargs="*", metavar="EXECUCAO",
+                        help="compara duas execuções (padrão: a última e a anterior no mesmo formato) "
+                             "em vez de rodar")
+    args = parser.parse_args()
+
+    if args.comparar is not None:
+        base, nova, tabela = comparar(*args.comparar[:2], pasta=args.pasta)
+        print(f"base {base} x nova {nova}")
+        with pd.option_context('display.width', 200, 'display.max_rows', None):
+            print(tabela.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+        sys.exit(0)
+
+    executar([ler_tamanho(t) for t in args.tamanhos.split(',')], args.formato, args.pasta, args.semente,
+             not args.sem_graficos)
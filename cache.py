@@ -0,0 +1,98 @@
+import functools
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+
+# Cache em disco dos agregados parciais de cada arquivo de entrada. A chave é
+# o hash do conteúdo do arquivo junto com a versão do código de análise (hash
+# dos próprios fontes), então editar qualquer módulo da análise invalida todas
+# as entradas automaticamente. O diretório é limitado por tamanho e as
+# entradas menos usadas recentemente (mtime) são removidas primeiro.
+
+DIRETORIO_CACHE = ".cache_analise"
+LIMITE_CACHE_BYTES = 2 * 1024**3
+VERSAO_CACHE = 1
+
+# Módulos cujo código afeta os parciais; o hash deles compõe a chave
+ARQUIVOS_ANALISE = ['dataProcessing.py', 'agregados.py', 'fluxos.py', 'handshake.py',
+                    'retransmissoes.py', 'leitorPcap.py', 'colunar.py', 'quantis.py',
+                    'tempo.py', 'cache.py']
+
+_TAMANHO_LEITURA = 1 << 20
+
+
+@functools.lru_cache(maxsize=None)
+def versao_codigo():
+    h = hashlib.blake2b(str(VERSAO_CACHE).encode(), digest_size=16)
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    for nome in ARQUIVOS_ANALISE:
+        with open(os.path.join(pasta, nome), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def hash_conteudo(caminho):
+    """Hash do conteúdo de um arquivo, ou de todos os arquivos de um diretório (.colunas)"""
+    h = hashlib.blake2b(digest_size=16)
+    if os.path.isdir(caminho):
+        arquivos = sorted(os.path.join(caminho, nome) for nome in os.listdir(caminho))
+    else:
+        arquivos = [caminho]
+    for arquivo in arquivos:
+        h.update(os.path.basename(arquivo).encode())
+        with open(arquivo, 'rb') as f:
+            for bloco in iter(lambda: f.read(_TAMANHO_LEITURA), b''):
+                h.update(bloco)
+    return h.hexdigest()
+
+
+def chave_cache(caminho):
+    return hashlib.blake2b((hash_conteudo(caminho) + versao_codigo()).encode(), digest_size=16).hexdigest()
+
+
+def _arquivo_entrada(diretorio, chave):
+    return os.path.join(diretorio, chave + ".pkl")
+
+
+def ler_cache(diretorio, chave):
+    """Devolve a entrada guardada sob `chave` ou None; um acerto atualiza o mtime (LRU)"""
+    caminho = _arquivo_entrada(diretorio, chave)
+    try:
+        entrada = pd.read_pickle(caminho)
+    except (FileNotFoundError, EOFError, OSError):
+        return None
+    os.utime(caminho)
+    return entrada
+
+
+def gravar_cache(diretorio, chave, entrada, limite_bytes=LIMITE_CACHE_BYTES):
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = _arquivo_entrada(diretorio, chave)
+    temporario = caminho + ".tmp"
+    pd.to_pickle(entrada, temporario)
+    os.replace(temporario, caminho)
+    despejar_cache(diretorio, limite_bytes)
+
+
+def despejar_cache(diretorio, limite_bytes=LIMITE_CACHE_BYTES):
+    """Remove as entradas usadas há mais tempo até o diretório caber em `limite_bytes`"""
+    if not os.path.isdir(diretorio):
+        return
+    entradas = []
+    for nome in os.listdir(diretorio):
+        if nome.endswith(".pkl"):
+            info = os.stat(os.path.join(diretorio, nome))
+            entradas.append((info.st_mtime_ns, info.st_size, nome))
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, nome in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        os.remove(os.path.join(diretorio, nome))
+        total -= tamanho
+
+
+def limpar_cache(diretorio=DIRETORIO_CACHE):
+    """Invalida o cache inteiro"""
+    shutil.rmtree(diretorio, ignore_errors=True)
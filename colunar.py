@@ -0,0 +1,143 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from leitorPcap import COLUNAS_PCAP, ler_pcap, ips_para_texto, flags_para_texto, texto_para_ips, texto_para_flags
+
+# Formato colunar intermediário: um diretório (ex.: data.colunas/) com um .npy
+# por campo, nos tipos de COLUNAS_PCAP (IPs uint32, portas uint16, seq/ack
+# uint32, flags como máscara uint8 e timestamp em nanossegundos int64).
+# Carregar é um mmap por coluna, sem parsing de texto.
+
+EXTENSAO_COLUNAR = '.colunas'
+CABECALHO_CSV = "timestamp,src_ip,src_port,dst_ip,dst_port,protocol,length,flags,seq,ack,window,segmento_tcp_len,mss\n"
+TAMANHO_CABECALHO_NPY = 128
+
+
+def eh_colunar(caminho):
+    caminho = str(caminho)
+    return caminho.endswith(EXTENSAO_COLUNAR) or os.path.isfile(os.path.join(caminho, 'timestamp_ns.npy'))
+
+
+def _cabecalho_npy(tipo, n):
+    """Cabeçalho .npy v1.0 com tamanho fixo, para poder ser reescrito depois de gravar os dados"""
+    dicionario = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (
+        np.lib.format.dtype_to_descr(np.dtype(tipo)), n)
+    tamanho_dict = TAMANHO_CABECALHO_NPY - 10
+    return (b'\x93NUMPY\x01\x00' + tamanho_dict.to_bytes(2, 'little')
+            + dicionario.ljust(tamanho_dict - 1).encode('latin1') + b'\n')
+
+
+class EscritorColunar:
+    """
+    Grava o formato colunar em blocos: cada chamada de adicionar() acrescenta
+    as linhas no fim dos .npy, então a memória usada é a de um bloco.
+    """
+
+    def __init__(self, diretorio):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.total = 0
+        self.arquivos = {}
+        for nome, tipo in COLUNAS_PCAP.items():
+            f = open(os.path.join(diretorio, f"{nome}.npy"), 'wb')
+            f.write(_cabecalho_npy(tipo, 0))
+            self.arquivos[nome] = f
+
+    def adicionar(self, colunas):
+        n = len(colunas['timestamp_ns'])
+        for nome, tipo in COLUNAS_PCAP.items():
+            self.arquivos[nome].write(np.ascontiguousarray(colunas[nome], dtype=tipo).tobytes())
+        self.total += n
+
+    def fechar(self):
+        for nome, f in self.arquivos.items():
+            f.seek(0)
+            f.write(_cabecalho_npy(COLUNAS_PCAP[nome], self.total))
+            f.close()
+        self.arquivos = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def salvar_colunar(colunas, diretorio):
+    with EscritorColunar(diretorio) as escritor:
+        escritor.adicionar(colunas)
+
+
+def carregar_colunar(diretorio, colunas=None, mmap=True):
+    """Carrega as colunas pedidas (todas por padrão) como arrays mapeados em memória"""
+    nomes = list(COLUNAS_PCAP) if colunas is None else list(colunas)
+    modo = 'r' if mmap else None
+    return {nome: np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode=modo) for nome in nomes}
+
+
+def dataframe_para_colunas(df):
+    """Converte um bloco lido do data.csv (texto) para as colunas tipadas"""
+    def inteiro(col, padrao=0):
+        return pd.to_numeric(df[col], errors='coerce').fillna(padrao).to_numpy()
+
+    # O extrator grava o timestamp com 6 casas decimais, então arredondar para
+    # microssegundos recupera o valor exato antes de passar para nanossegundos
+    timestamp = pd.to_numeric(df['timestamp'], errors='coerce').to_numpy(dtype=np.float64)
+    return {
+        'timestamp_ns': np.round(np.nan_to_num(timestamp) * 1e6).astype(np.int64) * 1000,
+        'src_ip': texto_para_ips(df['src_ip']),
+        'src_port': inteiro('src_port').astype(np.uint16),
+        'dst_ip': texto_para_ips(df['dst_ip']),
+        'dst_port': inteiro('dst_port').astype(np.uint16),
+        'length': inteiro('length').astype(np.uint32),
+        'flags': texto_para_flags(df['flags']),
+        'seq': inteiro('seq').astype(np.uint32),
+        'ack': inteiro('ack').astype(np.uint32),
+        'window': inteiro('window').astype(np.uint16),
+        'segmento_tcp_len': inteiro('segmento_tcp_len').astype(np.uint32),
+        'mss': inteiro('mss', -1).astype(np.int32),
+    }
+
+
+def csv_para_colunar(caminho_csv, diretorio, tamanho_bloco=1_000_000):
+    """Converte o data.csv para o formato colunar lendo em blocos de tamanho fixo"""
+    with EscritorColunar(diretorio) as escritor:
+        for bloco in pd.read_csv(caminho_csv, dtype=str, chunksize=tamanho_bloco):
+            bloco = bloco.dropna(subset=['timestamp'])
+            escritor.adicionar(dataframe_para_colunas(bloco))
+    print(f"[OK] {escritor.total} pacotes salvos em formato colunar: {diretorio}")
+    return escritor.total
+
+
+def pcap_para_colunar(caminhos, diretorio):
+    """Decodifica um ou mais .pcap direto para o formato colunar, um arquivo por vez"""
+    with EscritorColunar(diretorio) as escritor:
+        for caminho in caminhos:
+            escritor.adicionar(ler_pcap(caminho))
+    print(f"[OK] {escritor.total} pacotes salvos em formato colunar: {diretorio}")
+    return escritor.total
+
+
+def colunas_para_csv(colunas, arquivo, inicio=0, fim=None):
+    """Escreve as linhas [inicio, fim) das colunas no formato de texto do extrator.c"""
+    fatia = {nome: np.asarray(col[inicio:fim]) for nome, col in colunas.items()}
+    ns = fatia['timestamp_ns']
+    bloco = pd.DataFrame({
+        'timestamp': [f"{s}.{u:06d}" for s, u in zip((ns // 1_000_000_000).tolist(),
+                                                     (ns % 1_000_000_000 // 1000).tolist())],
+        'src_ip': ips_para_texto(fatia['src_ip']),
+        'src_port': fatia['src_port'],
+        'dst_ip': ips_para_texto(fatia['dst_ip']),
+        'dst_port': fatia['dst_port'],
+        'protocol': 'TCP',
+        'length': fatia['length'],
+        'flags': flags_para_texto(fatia['flags']),
+        'seq': fatia['seq'],
+        'ack': fatia['ack'],
+        'window': fatia['window'],
+        'segmento_tcp_len': fatia['segmento_tcp_len'],
+        'mss': fatia['mss'],
+    })
+    bloco.to_csv(arquivo, index=False, header=False, lineterminator='\n')
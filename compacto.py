@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from leitorPcap import texto_para_ips, texto_para_flags
+from tempo import segundos_para_ns
+
+# Carregamento dos pacotes com tipos compactos, usado pela análise em memória.
+# O data.csv lido com os tipos de COL_TYPES guarda IPs, protocolo e flags como
+# strings (objetos Python de ~60 bytes cada) e portas, seq, ack, janela e MSS
+# como float64; aqui cada coluna vai para o menor tipo que a representa:
+#   - IPs em uint32 e flags em máscara de bits uint8 (bits de
+#     leitorPcap.FLAGS_TCP), convertidos a partir das categorias do read_csv,
+#     então cada texto distinto é interpretado uma vez só
+#   - portas e janela em uint16, seq e ack em uint32, MSS em int32 (a opção
+#     tem 16 bits sem sinal, ex.: 65495 no loopback, e -1 marca a ausência,
+#     como em leitorPcap.COLUNAS_PCAP)
+#   - protocolo como category
+# Valores ausentes viram 0 (IPs, portas, seq, ack, janela, flags) ou -1 (MSS):
+# IP 0 e porta 0 são tratados como ausentes pela análise. length e
+# segmento_tcp_len continuam float64, pois entram em somas e médias que vão
+# para os jsons. As flags viram testes de bits (ver adicionar_flags).
+
+TIPOS_COMPACTOS = {
+    'timestamp_ns': np.int64,
+    'src_ip': np.uint32,
+    'src_port': np.uint16,
+    'dst_ip': np.uint32,
+    'dst_port': np.uint16,
+    'protocol': 'category',
+    'length': np.float64,
+    'flags': np.uint8,
+    'seq': np.uint32,
+    'ack': np.uint32,
+    'window': np.uint16,
+    'segmento_tcp_len': np.float64,
+    'mss': np.int32,
+}
+
+# Tipos pedidos ao read_csv: texto repetido como category, números como float64
+_TIPOS_LEITURA = {
+    'timestamp': np.float64,
+    'src_ip': 'category',
+    'src_port': np.float64,
+    'dst_ip': 'category',
+    'dst_port': np.float64,
+    'protocol': 'category',
+    'length': np.float64,
+    'flags': 'category',
+    'seq': np.float64,
+    'ack': np.float64,
+    'window': np.float64,
+    'segmento_tcp_len': np.float64,
+    'mss': np.float64,
+}
+
+
+def _categorias(coluna, converter, tipo):
+    """Converte só as categorias distintas e expande pelos códigos (-1 = ausente -> 0)"""
+    valores = np.zeros(len(coluna.cat.categories) + 1, dtype=tipo)
+    valores[:-1] = converter(coluna.cat.categories.astype(object))
+    return valores[coluna.cat.codes.to_numpy()]
+
+
+def _inteiro(coluna, tipo, ausente=0):
+    return np.nan_to_num(coluna.to_numpy(dtype=np.float64), nan=ausente).astype(np.int64).astype(tipo)
+
+
+def compactar_csv(df):
+    """Bloco lido com _TIPOS_LEITURA -> DataFrame com TIPOS_COMPACTOS (mesmas colunas)"""
+    colunas = {}
+    for nome in df.columns:
+        coluna = df[nome]
+        if nome in ('src_ip', 'dst_ip'):
+            colunas[nome] = _categorias(coluna, texto_para_ips, np.uint32)
+        elif nome == 'flags':
+            colunas[nome] = _categorias(coluna, texto_para_flags, np.uint8)
+        elif nome == 'mss':
+            colunas[nome] = _inteiro(coluna, np.int32, -1)
+        elif TIPOS_COMPACTOS[nome] in (np.uint16, np.uint32):
+            colunas[nome] = _inteiro(coluna, TIPOS_COMPACTOS[nome])
+        else:
+            colunas[nome] = coluna.to_numpy()
+    return pd.DataFrame(colunas, index=df.index)
+
+
+def ler_csv_compacto(caminho, colunas=None, **kwargs):
+    """
+    Mesmo que dataProcessing.ler_csv (gera DataFrames, com timestamp_ns e sem
+    as linhas de timestamp inválido), mas com TIPOS_COMPACTOS. `colunas`
+    restringe as colunas lidas (nomes do DataFrame).
+    """
+    if colunas is not None:
+        kwargs['usecols'] = ['timestamp' if nome == 'timestamp_ns' else nome
+                             for nome in TIPOS_COMPACTOS if nome in colunas]
+    leitor = pd.read_csv(caminho, dtype=_TIPOS_LEITURA, low_memory=False, **kwargs)
+    for df in ([leitor] if isinstance(leitor, pd.DataFrame) else leitor):
+        ns, validos = segundos_para_ns(df.pop('timestamp'))
+        if not validos.all():
+            df, ns = df[validos], ns[validos]
+        df = compactar_csv(df)
+        df.insert(0, 'timestamp_ns', ns)
+        yield df
+
+
+def colunas_para_compacto(colunas, nomes=None):
+    """Colunas do leitorPcap/colunar (já inteiras) -> DataFrame com TIPOS_COMPACTOS"""
+    n = len(colunas['timestamp_ns'])
+    dados = {}
+    for nome, tipo in TIPOS_COMPACTOS.items():
+        if nomes is not None and nome not in nomes:
+            continue
+        if nome == 'protocol':
+            dados[nome] = pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), ['TCP'])
+        else:
+            dados[nome] = np.asarray(colunas[nome]).astype(tipo)
+    return pd.DataFrame(dados, index=pd.RangeIndex(n))
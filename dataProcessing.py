@@ -1,231 +1,619 @@
 import pandas as pd
 import numpy as np
-import json
-from collections import defaultdict
-
-def calcular_janela_congestionamento(group):
-    group_sorted = group.sort_values('timestamp')
-    group_sorted['delta'] = group_sorted['timestamp'].diff().dt.total_seconds().fillna(0)
-    janela_estimada = group_sorted['delta'].rolling(window=10, min_periods=1).mean().fillna(0)
-    return list(zip(group_sorted['timestamp'].astype(str), janela_estimada))
-
-
-def calcular_janela_congestionamento(group):
-    group_sorted = group.sort_values('timestamp')
-    group_sorted['delta'] = group_sorted['timestamp'].diff().dt.total_seconds().fillna(0)
-    janela_estimada = group_sorted['delta'].rolling(window=10, min_periods=1).mean().fillna(0)
-    return list(zip(group_sorted['timestamp'].astype(str), janela_estimada))
-
-
-def normalize_conn(row):
-    # Converte IPs para string e trata NaNs
-    src_ip = str(row['src_ip']) if pd.notna(row['src_ip']) else ''
-    dst_ip = str(row['dst_ip']) if pd.notna(row['dst_ip']) else ''
-    
-    if src_ip == '' or dst_ip == '':
-        return 'incomplete_connection'
-
-    # Converte portas para inteiro (ou zero se inválido)
-    try:
-        src_port = int(float(row['src_port']))
-    except:
-        src_port = 0
-    try:
-        dst_port = int(float(row['dst_port']))
-    except:
-        dst_port = 0
-
-    ips = sorted([src_ip, dst_ip])
-    ports = sorted([str(src_port), str(dst_port)])
-
-    return f"{ips[0]}:{ports[0]} <-> {ips[1]}:{ports[1]}"
-
-def calcular_distribuicao_tamanhos(tamanhos_lista):
-    """Calcula estatísticas descritivas da distribuição de tamanhos"""
-    if not tamanhos_lista:
-        return {}
-    
-    tamanhos_array = np.array(tamanhos_lista)
-    return {
-        'min': float(np.min(tamanhos_array)),
-        'max': float(np.max(tamanhos_array)),
-        'media': float(np.mean(tamanhos_array)),
-        'mediana': float(np.median(tamanhos_array)),
-        'desvio_padrao': float(np.std(tamanhos_array)),
-        'percentil_25': float(np.percentile(tamanhos_array, 25)),
-        'percentil_75': float(np.percentile(tamanhos_array, 75)),
-        'percentil_90': float(np.percentile(tamanhos_array, 90)),
-        'percentil_95': float(np.percentile(tamanhos_array, 95)),
-        'percentil_99': float(np.percentile(tamanhos_array, 99)),
-        'total_segmentos': len(tamanhos_lista)
-    }
-
-def analisar_estatisticas(arquivo_csv):
-    col_types = {
-        'timestamp': float,
-        'src_ip': str,
-        'src_port': float,
-        'dst_ip': str,
-        'dst_port': float,
-        'protocol': str,
-        'length': float,
-        'flags': str,
-        'seq': float,
-        'ack': float,
-        'window': float,
-        'segmento_tcp_len': float,  
-        'mss': float                # <-- aqui está o MSS real
-    }
-
-
-    df = pd.read_csv(arquivo_csv, dtype=col_types, low_memory=False)
-
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from fluxos import chavear_fluxos
+from leitorPcap import ler_pcap_em_blocos, ler_pcaps, pcap_para_dataframe, ips_para_texto, COLUNAS_PCAP, FLAGS_TCP
+from agregados import (agregar_bloco, combinar_parciais, finalizar_parciais, parcial_vazio,
+                       estado_retransmissoes, estado_seq, deslocar_posicoes, contar_em_ordem, ranking)
+from retransmissoes import classificar_segmentos, RETRANSMISSAO
+from colunar import eh_colunar, carregar_colunar
+from quantis import distribuicao
+from microbursts import RESOLUCOES, RESOLUCAO_PADRAO, resumo_microbursts
+from tempo import NS_POR_SEGUNDO, NS_POR_MINUTO, segundos_para_ns, piso, para_datas, com_datas
+from escritorJson import salvar_json, BACKENDS as BACKENDS_JSON
+from anexos import Janelas, resolucao_texto, separar_anexos, embutir_anexos
+from perfil import Perfil, PERFIL_DESLIGADO, caminho_perfil
+from registroMetricas import METRICAS, Contexto, dependencia, metrica, resolver, calcular
+from compacto import ler_csv_compacto, colunas_para_compacto
+from tabelaFluxos import (TabelaFluxos, secoes_duracao, secoes_throughput, secoes_elefantes, secoes_handshake,
+                          secoes_mss, secoes_retransmissoes)
+from cache import DIRETORIO_CACHE, LIMITE_CACHE_BYTES, chave_cache, ler_cache, gravar_cache, limpar_cache
+
+def calcular_janelas_congestionamento(df, rotulos):
+    """
+    Estima a janela de congestionamento de todas as conexões em uma passada:
+    ordena por (flow_id, timestamp), calcula o intervalo entre pacotes
+    consecutivos de cada fluxo e a média móvel de 10 intervalos por fluxo.
+    Devolve anexos.Janelas (arrays por fluxo, na ordem dos flow_id).
+    """
+    flow = df['flow_id'].to_numpy()
+    ns = df['timestamp_ns'].to_numpy()
+    ordem = np.lexsort((ns, flow))
+    flow, ns = flow[ordem], ns[ordem]
+
+    inicio_fluxo = np.ones(len(flow), dtype=bool)
+    inicio_fluxo[1:] = flow[1:] != flow[:-1]
+    delta = np.zeros(len(ns), dtype=np.float64)
+    delta[1:] = np.diff(ns) / 1e9
+    delta[inicio_fluxo] = 0
+
+    # Média móvel segmentada: o rolling por grupo reinicia o acumulador em cada
+    # fluxo, dando os mesmos valores que o rolling aplicado a cada conexão
+    janela = (pd.Series(delta).groupby(flow, sort=False)
+              .rolling(window=10, min_periods=1).mean().fillna(0).to_numpy())
+
+    # O texto de cada timestamp (gerado só com --embutir) usa a resolução
+    # exigida pelo próprio fluxo
+    limites = np.flatnonzero(inicio_fluxo)
+    nivel = np.maximum.reduceat(resolucao_texto(ns), limites) if len(ns) else np.empty(0, dtype=np.int8)
+    return Janelas(rotulos[flow[limites]], np.append(limites, len(ns)), ns, nivel, janela)
+
+
+def calcular_distribuicao_tamanhos(tamanhos):
+    """
+    Estatísticas descritivas da distribuição de tamanhos. Os percentis vêm do
+    esboço de quantis (erro relativo <= quantis.ALFA_PADRAO, ver quantis.py);
+    min, max, média e desvio padrão são exatos.
+    """
+    return distribuicao(tamanhos, chave_total='total_segmentos')
+
+COL_TYPES = {
+    'timestamp': float,
+    'src_ip': str,
+    'src_port': float,
+    'dst_ip': str,
+    'dst_port': float,
+    'protocol': str,
+    'length': float,
+    'flags': str,
+    'seq': float,
+    'ack': float,
+    'window': float,
+    'segmento_tcp_len': float,  
+    'mss': float                # <-- aqui está o MSS real
+}
+
+# Nomes das colunas no DataFrame (o timestamp vira timestamp_ns na leitura)
+COL_TYPES_DF = ['timestamp_ns' if nome == 'timestamp' else nome for nome in COL_TYPES]
+
+BITS_FLAGS = dict(FLAGS_TCP)
+
+def eh_pcap(caminho):
+    return str(caminho).lower().endswith(('.pcap', '.cap'))
+
+def normalizar_pacotes(df):
     # Converter portas para int
-    df['src_port'] = df['src_port'].astype('Int64')
-    df['dst_port'] = df['dst_port'].astype('Int64')
-
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s', errors='coerce')
-    df.dropna(subset=['timestamp'], inplace=True)
-    df = df[df['protocol'] == 'TCP']
-
-    # Normalizar conexões bidirecionais
-    df['connection_id'] = df.apply(normalize_conn, axis=1)
-
-    # Flags detalhadas
-    df['flag_S'] = df['flags'].str.contains('S', na=False)
-    df['flag_A'] = df['flags'].str.contains('A', na=False)
+    for coluna in ('src_port', 'dst_port'):
+        if coluna in df:
+            df[coluna] = df[coluna].astype('Int64')
+    return df[df['protocol'] == 'TCP']
+
+def ler_csv(caminho, **kwargs):
+    leitor = pd.read_csv(caminho, dtype=COL_TYPES, low_memory=False, **kwargs)
+    for df in ([leitor] if isinstance(leitor, pd.DataFrame) else leitor):
+        # Tempo em ns (int64) desde a leitura; linhas sem timestamp válido são descartadas
+        ns, validos = segundos_para_ns(df.pop('timestamp'))
+        if not validos.all():
+            df, ns = df[validos], ns[validos]
+        df.insert(0, 'timestamp_ns', ns)
+        yield df
+
+def carregar_pacotes(entrada, colunas=None, compacto=False):
+    """
+    Carrega os pacotes a partir do data.csv gerado pelo extrator.c, do formato
+    colunar (diretório .colunas, ver colunar.py) ou direto de um ou mais
+    arquivos .pcap (lidos por leitorPcap, sem o CSV intermediário). Com
+    `colunas` (nomes do DataFrame, ex.: {'timestamp_ns', 'protocol',
+    'dst_port'}) só essas colunas são lidas do csv ou do .colunas e
+    convertidas. Com compacto=True as colunas vêm com os tipos de
+    compacto.TIPOS_COMPACTOS (IPs uint32, flags em bits, ...) em vez dos do csv.
+    """
+    if isinstance(entrada, (list, tuple)) or eh_pcap(entrada):
+        caminhos = [entrada] if isinstance(entrada, str) else list(entrada)
+        if compacto:
+            return colunas_para_compacto(ler_pcaps(caminhos), colunas)
+        df = pcap_para_dataframe(ler_pcaps(caminhos), colunas)
+    elif eh_colunar(entrada):
+        brutas = None if colunas is None else [nome for nome in COLUNAS_PCAP if nome in colunas]
+        if compacto:
+            return colunas_para_compacto(carregar_colunar(entrada, brutas), colunas)
+        df = pcap_para_dataframe(carregar_colunar(entrada, brutas), colunas)
+    elif compacto:
+        df = next(ler_csv_compacto(entrada, colunas))
+        return df[df['protocol'] == 'TCP']
+    elif colunas is None:
+        df = next(ler_csv(entrada))
+    else:
+        usecols = ['timestamp' if nome == 'timestamp_ns' else nome for nome in COL_TYPES_DF if nome in colunas]
+        df = next(ler_csv(entrada, usecols=usecols))
+    return normalizar_pacotes(df)
+
+def carregar_em_blocos(entrada, tamanho_bloco=1_000_000):
+    """Mesmo que carregar_pacotes, mas gerando blocos de até `tamanho_bloco` pacotes"""
+    if isinstance(entrada, (list, tuple)) or eh_pcap(entrada):
+        caminhos = [entrada] if isinstance(entrada, str) else list(entrada)
+        for caminho in caminhos:
+            # Decodifica no máximo tamanho_bloco registros por vez (o pcap não é lido inteiro)
+            for colunas in ler_pcap_em_blocos(caminho, tamanho_bloco):
+                yield normalizar_pacotes(pcap_para_dataframe(colunas))
+    elif eh_colunar(entrada):
+        colunas = carregar_colunar(entrada)
+        for inicio in range(0, len(colunas['timestamp_ns']), tamanho_bloco):
+            fatia = {nome: col[inicio:inicio + tamanho_bloco] for nome, col in colunas.items()}
+            yield normalizar_pacotes(pcap_para_dataframe(fatia))
+    else:
+        for df in ler_csv(entrada, chunksize=tamanho_bloco):
+            yield normalizar_pacotes(df)
+
+def preparar_pacotes(df, rotulos=None):
+    """
+    Adiciona o flow_id, o sentido e as flags detalhadas; devolve (df, rotulos).
+    Se `rotulos` for passado, o df já vem com flow_id e sentido (ex.: fatias do
+    modo paralelo) e o chaveamento é pulado.
+    """
+    # Normalizar conexões bidirecionais: id inteiro por fluxo + tabela de rótulos
+    if rotulos is None:
+        df['flow_id'], rotulos, df['sentido'] = chavear_fluxos(df['src_ip'], df['dst_ip'], df['src_port'],
+                                                               df['dst_port'], com_sentido=True)
+
+    return adicionar_flags(df), rotulos
+
+def adicionar_flags(df):
+    """Flags detalhadas usadas pelo handshake e pelo detector de retransmissões"""
+    if df['flags'].dtype == np.uint8:
+        # Carregamento compacto: máscara de bits (leitorPcap.FLAGS_TCP)
+        bits = df['flags'].to_numpy()
+        df['flag_S'] = (bits & BITS_FLAGS['S']) != 0
+        df['flag_A'] = (bits & BITS_FLAGS['A']) != 0
+        df['flag_F'] = (bits & BITS_FLAGS['F']) != 0
+    else:
+        df['flag_S'] = df['flags'].str.contains('S', na=False)
+        df['flag_A'] = df['flags'].str.contains('A', na=False)
+        df['flag_F'] = df['flags'].str.contains('F', na=False)
     df['flag_SYN_only'] = df['flag_S'] & ~df['flag_A']
     df['flag_SYN_ACK'] = df['flag_S'] & df['flag_A']
     df['flag_ACK_only'] = ~df['flag_S'] & df['flag_A']
-
-    # Grupos de conexões
-    grupos_conexoes = dict(tuple(df.groupby('connection_id')))
-
-    # Janela de congestionamento
-    stats = {}
-    stats['janela_congestionamento'] = {k: calcular_janela_congestionamento(g) for k, g in grupos_conexoes.items()}
-
-    # Duracao e throughput (vetorizados)
-    grouped = df.groupby('connection_id')
-    min_time = grouped['timestamp'].min()
-    max_time = grouped['timestamp'].max()
-    duration = (max_time - min_time).dt.total_seconds()
-    stats['duracao_conexoes'] = duration.to_dict()
-
-    throughput = grouped['length'].sum() / duration.replace(0, np.nan)
-    throughput = throughput.fillna(0)
-    stats['throughput_por_conexao'] = throughput.to_dict()
-
+    return df
+
+def classificar_retransmissoes(df, estado=None):
+    """Roda o detector de retransmissoes.py com a chave (flow_id, sentido) do DataFrame"""
+    return classificar_segmentos(df['flow_id'].to_numpy() * 2 + df['sentido'].to_numpy(),
+                                 df['timestamp_ns'].to_numpy(),
+                                 df['seq'], df['segmento_tcp_len'], df['flag_S'], df['flag_F'],
+                                 estado=estado)
+
+# Passos compartilhados entre as métricas (ver registroMetricas.py)
+
+@dependencia('tabela_fluxos', colunas=('src_ip', 'dst_ip', 'src_port', 'dst_port'))
+def _tabela_fluxos(ctx):
+    """
+    Uma passada pela TabelaFluxos com as colunas carregadas: acumuladores por
+    fluxo, flow_id e sentido de cada pacote e, com seq e flags, a classe do
+    detector de retransmissões
+    """
+    df = ctx['pacotes']
+    tabela = TabelaFluxos()
+    posicao, df['sentido'], classes = tabela.atualizar(df)
+    _, id_por_posicao = tabela.rotulos()
+    df['flow_id'] = id_por_posicao[posicao]
+    if classes is not None:
+        df['classe_segmento'] = classes
+    return tabela
+
+@dependencia('fluxos', depende=('tabela_fluxos',))
+def _fluxos(ctx):
+    """Rótulos dos fluxos, indexados pelo flow_id"""
+    return ctx['tabela_fluxos'].rotulos()[0]
+
+@dependencia('por_fluxo', depende=('tabela_fluxos',))
+def _por_fluxo(ctx):
+    """Duração, bytes, handshake, MSS e retransmissões por fluxo, indexados pelo rótulo"""
+    return ctx['tabela_fluxos'].por_fluxo()
+
+@dependencia('handshake', colunas=('flags',), depende=('por_fluxo',))
+def _handshake(ctx):
+    """Primeiro SYN, SYN-ACK e ACK puro de cada fluxo (da tabela) -> seções de RTT e estabelecimento"""
+    return secoes_handshake(ctx['por_fluxo'])
+
+@dependencia('classe_segmento', colunas=('seq', 'segmento_tcp_len', 'flags'), depende=('tabela_fluxos',))
+def _retransmissoes(ctx):
+    """Retransmissões por fluxo e sentido no espaço de sequência (classificadas pela tabela)"""
+    df = ctx['pacotes']
+    df['retransmissao'] = df['classe_segmento'] == RETRANSMISSAO
+    return True
+
+@dependencia('por_segundo')
+def _por_segundo(ctx):
+    """Contagens por segundo agrupadas pelo ns arredondado"""
+    return ctx['pacotes'].groupby(piso(ctx['pacotes']['timestamp_ns'], NS_POR_SEGUNDO)).size()
+
+@dependencia('minuto')
+def _minuto(ctx):
+    ctx['pacotes']['minuto'] = piso(ctx['pacotes']['timestamp_ns'], NS_POR_MINUTO)
+    return True
+
+# Métricas: cada uma devolve as suas seções do stats_completo.json. Só as
+# chaves emitidas viram pd.Timestamp. Os pacotes vêm do carregamento compacto
+# (compacto.py): IP 0 e porta 0 são ausentes e os IPs voltam a texto só nas
+# chaves emitidas.
+
+@metrica('janela', ['janela_congestionamento'], depende=('fluxos',))
+def _janela(ctx):
+    return {'janela_congestionamento': calcular_janelas_congestionamento(ctx['pacotes'], ctx['fluxos'])}
+
+@metrica('duracao', ['duracao_conexoes', 'distribuicao_duracao_conexoes'], depende=('por_fluxo',))
+def _duracao(ctx):
+    return secoes_duracao(ctx['por_fluxo'])
+
+@metrica('throughput', ['throughput_por_conexao', 'distribuicao_throughput'], colunas=('length',),
+         depende=('por_fluxo',))
+def _throughput(ctx):
+    return secoes_throughput(ctx['por_fluxo'])
+
+@metrica('rtt', ['rtt_por_conexao', 'distribuicao_rtt'], depende=('handshake',))
+def _rtt(ctx):
     # RTT estimado (entre SYN e SYN-ACK)
-    rtt_por_conexao = {}
-    for conn_id, group in grupos_conexoes.items():
-        syn_pkt = group[group['flag_SYN_only']]
-        syn_ack_pkt = group[group['flag_SYN_ACK']]
-        if not syn_pkt.empty and not syn_ack_pkt.empty:
-            syn_time = syn_pkt['timestamp'].min()
-            syn_ack_time = syn_ack_pkt['timestamp'].min()
-            if syn_ack_time >= syn_time:
-                rtt_por_conexao[conn_id] = (syn_ack_time - syn_time).total_seconds()
-    stats['rtt_por_conexao'] = rtt_por_conexao
+    return {secao: ctx['handshake'][secao] for secao in ('rtt_por_conexao', 'distribuicao_rtt')}
 
+@metrica('estabelecimento', ['tempos_estabelecimento'], depende=('handshake',))
+def _estabelecimento(ctx):
     # Tempo de estabelecimento: entre SYN e ACK final
-    tempos_estabelecimento = []
-    for conn_id, group in grupos_conexoes.items():
-        syn_time = group[group['flag_SYN_only']]['timestamp'].min()
-        ack_time = group[group['flag_ACK_only']]['timestamp'].min()
-        if pd.notna(syn_time) and pd.notna(ack_time):
-            delta = (ack_time - syn_time).total_seconds()
-            if delta >= 0:
-                tempos_estabelecimento.append(delta)
-    stats['tempos_estabelecimento'] = tempos_estabelecimento
-
-    # Detectar retransmissões (duplicados em src_ip, dst_ip, seq, length)
-    df['retransmissao'] = df.duplicated(subset=['src_ip', 'dst_ip', 'seq'], keep=False)
-
-    # Taxa de retransmissões por src_ip
-    total_por_ip = df['src_ip'].value_counts()
-    retrans_por_ip = df[df['retransmissao']]['src_ip'].value_counts()
+    return {'tempos_estabelecimento': ctx['handshake']['tempos_estabelecimento']}
+
+@metrica('retransmissoes', ['taxa_retransmissoes', 'taxa_retransmissoes_por_conexao'], colunas=('src_ip',),
+         depende=('classe_segmento', 'por_fluxo'))
+def _taxas_retransmissoes(ctx):
+    df = ctx['pacotes']
+    # Taxa de retransmissões por src_ip (sobre todos os pacotes enviados pelo IP)
+    com_ip = df[df['src_ip'] != 0]
+    total_por_ip = com_ip['src_ip'].value_counts()
+    retrans_por_ip = com_ip[com_ip['retransmissao']]['src_ip'].value_counts()
     taxa_retransmissoes = (retrans_por_ip / total_por_ip).fillna(0)
-    stats['taxa_retransmissoes'] = taxa_retransmissoes.to_dict()
-
-    # Tamanhos dos segmentos e distribuição
-    stats['tamanhos_segmentos'] = df['length'].dropna().tolist()
-    stats['distribuicao_tamanhos_segmentos'] = calcular_distribuicao_tamanhos(stats['tamanhos_segmentos'])
-    
+    taxa_retransmissoes.index = ips_para_texto(taxa_retransmissoes.index)
+    taxa_retransmissoes = taxa_retransmissoes.sort_index()
+    # Taxa de retransmissões por conexão (sobre os segmentos que ocupam sequência)
+    return {'taxa_retransmissoes': taxa_retransmissoes.to_dict(), **secoes_retransmissoes(ctx['por_fluxo'])}
+
+@metrica('tamanhos', ['tamanhos_segmentos', 'distribuicao_tamanhos_segmentos'], colunas=('length',))
+def _tamanhos(ctx):
+    tamanhos = ctx['pacotes']['length']
+    return {'tamanhos_segmentos': tamanhos.dropna().tolist(),
+            'distribuicao_tamanhos_segmentos': calcular_distribuicao_tamanhos(tamanhos)}
+
+@metrica('mss', ['mss_por_conexao'], colunas=('mss',), depende=('por_fluxo',))
+def _mss(ctx):
     # MSS real por conexão (onde mss != -1)
-    df['conexao_normalizada'] = df.apply(normalize_conn, axis=1)
-    df_valid_mss = df[df['mss'] != -1]
-
-    mss_por_conexao = df_valid_mss.groupby('conexao_normalizada')['mss'].min()
-    stats['mss_por_conexao'] = mss_por_conexao.to_dict()
+    return secoes_mss(ctx['por_fluxo'])
 
-    volume_por_conexao = grouped['length'].sum()
-    stats['fluxos_elefantes'] = volume_por_conexao.sort_values(ascending=False).head(10).to_dict()
+@metrica('elefantes', ['fluxos_elefantes'], colunas=('length',), depende=('por_fluxo',))
+def _elefantes(ctx):
+    return secoes_elefantes(ctx['por_fluxo'])
 
-    df['timestamp_rounded'] = df['timestamp'].dt.floor('s')
-    pacotes_por_tempo = df.groupby('timestamp_rounded').size()
-    stats['microbursts'] = pacotes_por_tempo.sort_values(ascending=False).head(10).to_dict()
-    stats['top_aplicacoes_portas'] = df['dst_port'].value_counts().head(10).to_dict()
-    stats['top_ips_destino'] = dict(df['dst_ip'].value_counts().head(10))
-
-    contagem_tempo = df.groupby(df['timestamp'].dt.floor('s')).size()
-    stats['pacotes_por_tempo'] = contagem_tempo.reset_index(name='count').to_dict(orient='records')
-    stats['trafego_por_minuto'] = df.groupby(df['timestamp'].dt.floor('min'))['length'].sum().to_dict()
+@metrica('microbursts', ['microbursts', 'pacotes_por_tempo'], depende=('por_segundo',))
+def _microbursts(ctx):
+    pacotes_por_tempo = ctx['por_segundo']
+    return {
+        'microbursts': com_datas(pacotes_por_tempo.sort_values(ascending=False).head(10)).to_dict(),
+        'pacotes_por_tempo': pd.DataFrame({'timestamp': para_datas(pacotes_por_tempo.index),
+                                           'count': pacotes_por_tempo.to_numpy()}).to_dict(orient='records'),
+    }
 
-    df['minuto'] = df['timestamp'].dt.floor('min')
-    top_ips = df['src_ip'].value_counts().head(10).index.tolist()
-    heatmap_df = df[df['src_ip'].isin(top_ips)]
+@metrica('microbursts_subsegundo', ['microbursts_subsegundo'], colunas=('length',), depende=('fluxos',))
+def _microbursts_subsegundo(ctx):
+    return {'microbursts_subsegundo': resumo_microbursts(ctx['pacotes'], ctx['fluxos'],
+                                                         ctx['resolucao_microbursts'])}
+
+@metrica('top_portas', ['top_aplicacoes_portas'], colunas=('dst_port',))
+def _top_portas(ctx):
+    portas = ctx['pacotes']['dst_port']
+    return {'top_aplicacoes_portas': ranking(contar_em_ordem(portas[portas != 0])).to_dict()}
+
+@metrica('top_ips', ['top_ips_destino'], colunas=('dst_ip',))
+def _top_ips(ctx):
+    ips = ctx['pacotes']['dst_ip']
+    top = ranking(contar_em_ordem(ips[ips != 0]))
+    return {'top_ips_destino': dict(zip(ips_para_texto(top.index), top))}
+
+@metrica('trafego', ['trafego_por_minuto'], colunas=('length',), depende=('minuto',))
+def _trafego(ctx):
+    df = ctx['pacotes']
+    return {'trafego_por_minuto': com_datas(df.groupby('minuto')['length'].sum()).to_dict()}
+
+@metrica('heatmap', ['heatmap_ips_tempo'], colunas=('src_ip',), depende=('minuto',))
+def _heatmap(ctx):
+    df = ctx['pacotes']
+    ips = df['src_ip']
+    top_ips = ranking(contar_em_ordem(ips[ips != 0])).index
+    selecionados = ips.isin(top_ips).to_numpy()
+    heatmap_df = pd.DataFrame({'src_ip': ips_para_texto(ips.to_numpy()[selecionados]),
+                               'minuto': df['minuto'].to_numpy()[selecionados]})
     heatmap_data = heatmap_df.groupby(['src_ip', 'minuto']).size().unstack(fill_value=0)
-    stats['heatmap_ips_tempo'] = {
+    heatmap_data.columns = para_datas(heatmap_data.columns)
+    return {'heatmap_ips_tempo': {
         'matriz': heatmap_data.to_dict(),
         'ips': heatmap_data.index.tolist(),
         'tempos': heatmap_data.columns.astype(str).tolist()
-    }
-
-    resumo_metricas = {
-        "janela_congestionamento": stats['janela_congestionamento'],
-        "rtt_por_conexao": stats['rtt_por_conexao'],
-        "tempos_estabelecimento": stats['tempos_estabelecimento'],
-        "taxa_retransmissoes": stats['taxa_retransmissoes'],
-        "duracao_conexoes": stats['duracao_conexoes'],
-        "throughput_por_conexao": stats['throughput_por_conexao'],
-        "distribuicao_tamanhos_segmentos": stats['distribuicao_tamanhos_segmentos'],
-        "mss_por_conexao": stats['mss_por_conexao'],
-        "fluxos_elefantes": stats['fluxos_elefantes'],
-        "microbursts": stats['microbursts'],
-        "top_aplicacoes_portas": stats['top_aplicacoes_portas'],
-        "top_ips_destino": stats['top_ips_destino']
-    }
-
-    return stats, resumo_metricas
-
-def salvar_estatisticas(stats, caminho="estatisticas.json"):
-    def tornar_json_friendly(obj):
-        if isinstance(obj, (defaultdict, dict)):
-            return {str(k): tornar_json_friendly(v) for k, v in obj.items()}
-        elif isinstance(obj, (list, tuple, set)):
-            return [tornar_json_friendly(i) for i in obj]
-        elif isinstance(obj, (pd.Timestamp, np.datetime64)):
-            return str(obj)
-        elif isinstance(obj, (np.integer, np.floating)):
-            return obj.item()
+    }}
+
+def analisar_estatisticas(entrada, resolucao_microbursts=RESOLUCAO_PADRAO, perfil=PERFIL_DESLIGADO,
+                          metricas=None):
+    """
+    Aceita o caminho do data.csv, de um diretório .colunas ou de arquivo(s) .pcap.
+    `metricas` (nomes do registro, ex.: ['rtt', 'top_portas']) restringe as
+    seções calculadas e as colunas lidas; o padrão calcula todas. `perfil`
+    (perfil.Perfil) mede cada etapa; o padrão não mede nada.
+    """
+    nomes, colunas = resolver(metricas)
+    with perfil.etapa('carregar_pacotes', colunas=len(colunas)) as etapa:
+        df = carregar_pacotes(entrada, colunas, compacto=True)
+        etapa['linhas'] = len(df)
+    contexto = Contexto(perfil, pacotes=df, resolucao_microbursts=resolucao_microbursts)
+    stats = calcular(nomes, contexto)
+    stats = {secao: stats[secao] for secao in ORDEM_SECOES if secao in stats}
+    return stats, montar_resumo(stats)
+
+# Ordem das seções em stats_completo.json
+ORDEM_SECOES = [
+    "janela_congestionamento",
+    "duracao_conexoes",
+    "throughput_por_conexao",
+    "rtt_por_conexao",
+    "tempos_estabelecimento",
+    "taxa_retransmissoes",
+    "taxa_retransmissoes_por_conexao",
+    "tamanhos_segmentos",
+    "distribuicao_tamanhos_segmentos",
+    "distribuicao_duracao_conexoes",
+    "distribuicao_throughput",
+    "distribuicao_rtt",
+    "mss_por_conexao",
+    "fluxos_elefantes",
+    "microbursts",
+    "microbursts_subsegundo",
+    "top_aplicacoes_portas",
+    "top_ips_destino",
+    "pacotes_por_tempo",
+    "trafego_por_minuto",
+    "heatmap_ips_tempo"
+]
+
+SECOES_RESUMO = [
+    "janela_congestionamento",
+    "rtt_por_conexao",
+    "tempos_estabelecimento",
+    "taxa_retransmissoes",
+    "taxa_retransmissoes_por_conexao",
+    "duracao_conexoes",
+    "throughput_por_conexao",
+    "distribuicao_tamanhos_segmentos",
+    "distribuicao_duracao_conexoes",
+    "distribuicao_throughput",
+    "distribuicao_rtt",
+    "mss_por_conexao",
+    "fluxos_elefantes",
+    "microbursts",
+    "microbursts_subsegundo",
+    "top_aplicacoes_portas",
+    "top_ips_destino"
+]
+
+def montar_resumo(stats):
+    """Subconjunto de stats salvo em stats_metricas.json (seções ausentes são puladas)"""
+    return {secao: stats[secao] for secao in SECOES_RESUMO if secao in stats}
+
+def acumular_blocos(entrada, tamanho_bloco=1_000_000, parcial=None, lidos=0, estado_inicial=None,
+                    perfil=PERFIL_DESLIGADO):
+    """
+    Lê a entrada em blocos e acumula os agregados parciais sobre `parcial`
+    (ver agregados.py). `lidos` é o número de pacotes já acumulados antes,
+    usado como posição global dos novos pacotes. `estado_inicial` é um parcial
+    de onde só o estado do detector de retransmissões é aproveitado (sem ser
+    mesclado ao resultado). Devolve (parcial, lidos).
+    """
+    with perfil.etapa('acumular_blocos') as etapa:
+        inicio, blocos = lidos, 0
+        for bloco in carregar_em_blocos(entrada, tamanho_bloco):
+            df, rotulos = preparar_pacotes(bloco)
+            df['posicao'] = np.arange(lidos, lidos + len(df))
+            lidos += len(df)
+            blocos += 1
+            estado = estado_retransmissoes(parcial, rotulos, estado_inicial)
+            df['classe_segmento'], estado = classificar_retransmissoes(df, estado)
+            parcial = combinar_parciais(parcial, agregar_bloco(df, rotulos, estado))
+        etapa['linhas'], etapa['blocos'] = lidos - inicio, blocos
+    return parcial, lidos
+
+def acumular_arquivos(caminhos, tamanho_bloco=1_000_000, diretorio_cache=DIRETORIO_CACHE,
+                      limite_cache=LIMITE_CACHE_BYTES):
+    """
+    Acumula vários arquivos usando o cache de parciais por arquivo (cache.py).
+    Cada parcial é calculado a partir da posição 0 e com o estado de
+    retransmissões herdado dos arquivos anteriores; a entrada do cache guarda
+    esse estado herdado (restrito aos sentidos que o arquivo usa) e só é
+    reaproveitada se ele for o mesmo, de modo que o resultado é idêntico ao
+    de acumular_blocos sobre todos os arquivos em sequência.
+    """
+    parcial, lidos = None, 0
+    for caminho in caminhos:
+        chave = chave_cache(caminho)
+        entrada = ler_cache(diretorio_cache, chave)
+        herdado = estado_seq(parcial)
+        if entrada is not None and not _mesmo_estado(herdado, entrada['estado_herdado']):
+            entrada = None
+        if entrada is None:
+            parcial_arquivo, pacotes = acumular_blocos(caminho, tamanho_bloco, estado_inicial=parcial)
+            if parcial_arquivo is None:
+                parcial_arquivo = parcial_vazio()
+            sentidos = parcial_arquivo['seq_fim'].index
+            entrada = {'parcial': parcial_arquivo, 'pacotes': pacotes,
+                       'estado_herdado': _restringir_estado(herdado, sentidos)}
+            gravar_cache(diretorio_cache, chave, entrada, limite_cache)
+            print(f"[cache] {caminho}: calculado")
         else:
-            return obj
-
-    stats_friendly = tornar_json_friendly(stats)
-    with open(caminho, 'w') as f:
-        json.dump(stats_friendly, f, indent=4)
-
-
+            print(f"[cache] {caminho}: reaproveitado")
+        parcial = combinar_parciais(parcial, deslocar_posicoes(entrada['parcial'], lidos))
+        lidos += entrada['pacotes']
+    return parcial, lidos
+
+def _restringir_estado(estado, sentidos):
+    if estado is None:
+        return (pd.Series(np.nan, index=sentidos), pd.Series(np.nan, index=sentidos))
+    return tuple(serie.reindex(sentidos) for serie in estado)
+
+def _mesmo_estado(herdado, guardado):
+    atual = _restringir_estado(herdado, guardado[0].index)
+    return all(a.astype(float).equals(b.astype(float)) for a, b in zip(atual, guardado))
+
+def estatisticas_de_parcial(parcial, perfil=PERFIL_DESLIGADO):
+    with perfil.etapa('finalizar_parciais') as etapa:
+        stats = finalizar_parciais(parcial if parcial is not None else parcial_vazio())
+        stats = {secao: stats[secao] for secao in ORDEM_SECOES if secao in stats}
+        etapa['fluxos'] = len(stats.get('duracao_conexoes', {}))
+    return stats, montar_resumo(stats)
+
+def analisar_estatisticas_em_blocos(entrada, tamanho_bloco=1_000_000, perfil=PERFIL_DESLIGADO):
+    """
+    Modo out-of-core: lê a entrada em blocos de tamanho fixo e mantém só os
+    agregados parciais (ver agregados.py), então a memória não cresce com o
+    tamanho do arquivo. As seções com um valor por pacote
+    (janela_congestionamento, tamanhos_segmentos) não são geradas. O detector
+    de retransmissões leva de um bloco para o outro só o maior fim de
+    sequência de cada sentido, o que assume a entrada em ordem de tempo.
+    """
+    parcial, _ = acumular_blocos(entrada, tamanho_bloco, perfil=perfil)
+    return estatisticas_de_parcial(parcial, perfil)
+
+def fatias_por_fluxo(rotulos, workers):
+    """Fatia de cada fluxo: hash estável (crc32) do rótulo canônico módulo o número de workers"""
+    return np.array([zlib.crc32(r.encode()) % workers for r in rotulos], dtype=np.int64)
+
+def _analisar_fatia(df, rotulos):
+    """Executado em cada processo: métricas por fluxo e agregados parciais de uma fatia"""
+    ids, df['flow_id'] = np.unique(df['flow_id'].to_numpy(), return_inverse=True)
+    rotulos = rotulos[ids]
+    df, _ = preparar_pacotes(df, rotulos)
+    df['classe_segmento'], estado = classificar_retransmissoes(df)
+    return calcular_janelas_congestionamento(df, rotulos), agregar_bloco(df, rotulos, estado)
+
+def analisar_estatisticas_paralelo(entrada, workers, resolucao_microbursts=RESOLUCAO_PADRAO,
+                                  perfil=PERFIL_DESLIGADO):
+    """
+    Divide os pacotes em `workers` fatias pelo hash do fluxo canônico, de modo
+    que cada conexão fica inteira em uma fatia, e calcula as métricas por
+    fluxo de cada fatia em um pool de processos. Os agregados globais (top
+    portas/IPs, contagens por segundo, heatmap) voltam como parciais e são
+    mesclados aqui. O resultado é igual ao de analisar_estatisticas (o
+    desvio padrão de distribuicao_tamanhos_segmentos pode diferir no último
+    algarismo, pois os momentos das fatias são mesclados).
+    """
+    with perfil.etapa('carregar_pacotes') as etapa:
+        df = carregar_pacotes(entrada).reset_index(drop=True)
+        etapa['linhas'] = len(df)
+    with perfil.etapa('chavear_fluxos', linhas=len(df)) as etapa:
+        df['flow_id'], rotulos, df['sentido'] = chavear_fluxos(df['src_ip'], df['dst_ip'], df['src_port'],
+                                                               df['dst_port'], com_sentido=True)
+        df['posicao'] = np.arange(len(df))
+        fatia = fatias_por_fluxo(rotulos, workers)[df['flow_id'].to_numpy()]
+        etapa['fluxos'] = len(rotulos)
+
+    with perfil.etapa('fatias', linhas=len(df), fluxos=len(rotulos), workers=workers):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tarefas = [pool.submit(_analisar_fatia, df[fatia == i].copy(), rotulos)
+                       for i in range(workers) if (fatia == i).any()]
+            resultados = [t.result() for t in tarefas]
+
+    with perfil.etapa('mesclar_parciais', fluxos=len(rotulos)):
+        parcial = None
+        for _, parcial_fatia in resultados:
+            parcial = combinar_parciais(parcial, parcial_fatia)
+        stats = finalizar_parciais(parcial if parcial is not None else parcial_vazio())
+
+        stats['janela_congestionamento'] = Janelas.juntar(janela for janela, _ in resultados)
+        stats['tamanhos_segmentos'] = df['length'].dropna().tolist()
+    with perfil.etapa('microbursts_subsegundo', linhas=len(df)):
+        stats['microbursts_subsegundo'] = resumo_microbursts(df, rotulos, resolucao_microbursts)
+    stats = {secao: stats[secao] for secao in ORDEM_SECOES if secao in stats}
+    return stats, montar_resumo(stats)
+
+def salvar_estatisticas(stats, caminho="estatisticas.json", compacto=False, backend='json', anexar=True):
+    """
+    Grava as estatísticas em json sem copiar a árvore (ver escritorJson.py).
+    Com anexar=True as seções com um valor por pacote vão para arquivos .npz
+    ao lado do json (ver anexos.py). Devolve as estatísticas como gravadas:
+    o resumo montado delas reaproveita os mesmos anexos.
+    """
+    stats = separar_anexos(stats, caminho) if anexar else embutir_anexos(stats)
+    salvar_json(stats, caminho, compacto, backend)
+    return stats
+
+
+import argparse
 import time
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Processa os pacotes e salva stats_completo.json e stats_metricas.json")
+    # ex.: python dataProcessing.py batches/parte_00*.pcap
+    parser.add_argument("entrada", nargs="*", default=["data.csv"],
+                        help="data.csv, diretório .colunas ou um ou mais arquivos .pcap")
+    parser.add_argument("--blocos", type=int, metavar="N",
+                        help="modo out-of-core: processa N pacotes por vez com memória constante")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="divide os fluxos entre N processos (o resultado é o mesmo de 1 processo)")
+    parser.add_argument("--cache", nargs="?", const=DIRETORIO_CACHE, metavar="DIR",
+                        help="modo em blocos reaproveitando os parciais de arquivos inalterados")
+    parser.add_argument("--limite-cache", type=int, default=LIMITE_CACHE_BYTES // 1024**2, metavar="MB",
+                        help="tamanho máximo do cache; as entradas menos usadas são removidas")
+    parser.add_argument("--limpar-cache", action="store_true", help="invalida o cache antes de rodar")
+    parser.add_argument("--resolucao-microbursts", choices=list(RESOLUCOES), default=RESOLUCAO_PADRAO,
+                        help="largura dos intervalos na detecção de microbursts (microbursts_subsegundo)")
+    parser.add_argument("--compacto", action="store_true", help="grava os jsons sem indentação (bem menores)")
+    parser.add_argument("--backend-json", choices=BACKENDS_JSON, default="json",
+                        help="orjson (se instalado) formata mais rápido no modo compacto")
+    parser.add_argument("--embutir", action="store_true",
+                        help="mantém janela_congestionamento e tamanhos_segmentos dentro do json, sem os .npz")
+    parser.add_argument("--metricas", type=lambda texto: texto.split(','), metavar="LISTA",
+                        help="calcula só estas métricas, lendo só as colunas delas "
+                             f"(modo em memória; disponíveis: {','.join(METRICAS)})")
+    parser.add_argument("--perfil", action="store_true",
+                        help="mede tempo, CPU, memória e linhas/fluxos de cada etapa em stats_completo.perfil.json")
+    args = parser.parse_args()
+
     inicio = time.time()
+    entrada = args.entrada
+    if len(entrada) == 1 and not eh_pcap(entrada[0]):
+        entrada = entrada[0]
     # stats, resumo = analisar_estatisticas("data_200k.csv")
-    stats, resumo = analisar_estatisticas("data.csv")
-    salvar_estatisticas(stats, "stats_completo.json")
-    salvar_estatisticas(resumo, "stats_metricas.json")
+    if args.metricas and (args.cache or args.blocos or args.workers > 1):
+        parser.error("--metricas só vale para o modo em memória (sem --cache, --blocos ou --workers)")
+    if args.metricas:
+        try:
+            resolver(args.metricas)
+        except ValueError as erro:
+            parser.error(str(erro))
+    perfil = Perfil() if args.perfil else PERFIL_DESLIGADO
+    if args.limpar_cache:
+        limpar_cache(args.cache or DIRETORIO_CACHE)
+    if args.cache:
+        caminhos = [entrada] if isinstance(entrada, str) else entrada
+        with perfil.etapa('acumular_arquivos'):
+            parcial, _ = acumular_arquivos(caminhos, args.blocos or 1_000_000, args.cache,
+                                           args.limite_cache * 1024**2)
+        stats, _ = estatisticas_de_parcial(parcial, perfil)
+    elif args.blocos:
+        stats, _ = analisar_estatisticas_em_blocos(entrada, args.blocos, perfil)
+    elif args.workers > 1:
+        stats, _ = analisar_estatisticas_paralelo(entrada, args.workers, args.resolucao_microbursts, perfil)
+    else:
+        stats, _ = analisar_estatisticas(entrada, args.resolucao_microbursts, perfil, args.metricas)
+    with perfil.etapa('salvar_estatisticas'):
+        stats = salvar_estatisticas(stats, "stats_completo.json", args.compacto, args.backend_json, not args.embutir)
+        salvar_estatisticas(montar_resumo(stats), "stats_metricas.json", args.compacto, args.backend_json,
+                            not args.embutir)
+    if args.perfil:
+        perfil.salvar(caminho_perfil("stats_completo.json"))
+        print(f"Perfil das etapas salvo em {caminho_perfil('stats_completo.json')}")
     
     fim = time.time()
     duracao = fim - inicio
-    print(f"Tempo total de execução: {duracao:.2f} segundos")
\ No newline at end of file
+    print(f"Tempo total de execução: {duracao:.2f} segundos")
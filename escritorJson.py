@@ -0,0 +1,230 @@
+import datetime
+import json
+import math
+from json.encoder import encode_basestring_ascii
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Escrita dos jsons de estatísticas sem a cópia da árvore inteira que o
+# tornar_json_friendly fazia. Cada valor é formatado direto na saída:
+# inteiros/floats do numpy, Timestamps e datetime64 são convertidos na hora e
+# listas de escalares (a janela de congestionamento, os tamanhos de segmento)
+# saem com uma junção de strings a cada LOTE_LISTA itens. O texto vai para o disco em
+# pedaços de ~1 MB, seção por seção, então nunca existe o json inteiro em
+# memória. Com indent=4 a saída é idêntica à do json.dump antigo. O modo
+# compacto (sem indentação nem espaços) formata cada valor com o codificador
+# em C do json, ou com o orjson se instalado e pedido (backend="orjson"; nele
+# NaN e infinito viram null).
+
+TAMANHO_PEDACO = 1 << 20
+LOTE_LISTA = 10_000
+BACKENDS = ('json', 'orjson')
+
+_TIPOS_DATA = (pd.Timestamp, np.datetime64, datetime.datetime, datetime.date)
+
+
+def _float(valor):
+    """Mesma grafia do json.dump: repr do float, NaN e Infinity sem aspas"""
+    valor = float(valor)
+    if valor != valor:
+        return 'NaN'
+    if math.isinf(valor):
+        return 'Infinity' if valor > 0 else '-Infinity'
+    return float.__repr__(valor)
+
+
+def _escalar(valor):
+    """Texto json de um valor que não é contêiner, ou None se for contêiner"""
+    if isinstance(valor, str):
+        return encode_basestring_ascii(valor)
+    if valor is None:
+        return 'null'
+    if valor is True or valor is False or isinstance(valor, np.bool_):
+        return 'true' if valor else 'false'
+    if isinstance(valor, (int, np.integer)):
+        return int.__repr__(int(valor))
+    if isinstance(valor, (float, np.floating)):
+        return _float(valor)
+    if isinstance(valor, _TIPOS_DATA):
+        return encode_basestring_ascii(str(valor))
+    return None
+
+
+def _eh_contener(valor):
+    return isinstance(valor, (dict, list, tuple, set, np.ndarray)) or hasattr(valor, '__next__')
+
+
+class _Saida:
+    """Acumula pedaços de texto e grava no arquivo a cada ~TAMANHO_PEDACO caracteres"""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.pedacos = []
+        self.tamanho = 0
+
+    def escrever(self, texto):
+        self.pedacos.append(texto)
+        self.tamanho += len(texto)
+        if self.tamanho >= TAMANHO_PEDACO:
+            self.descarregar()
+
+    def descarregar(self):
+        self.arquivo.write(''.join(self.pedacos))
+        self.pedacos = []
+        self.tamanho = 0
+
+
+class _Formatador:
+    def __init__(self, indent):
+        # Mesmos separadores do json.dump: com indent só a chave leva espaço
+        self.indent = indent
+        self.separador_item = ','
+        self.separador_chave = ':' if indent is None else ': '
+
+    def _quebra(self, nivel):
+        return '' if self.indent is None else '\n' + ' ' * (self.indent * nivel)
+
+    def _lista_simples(self, item, nivel):
+        """Texto de uma lista não vazia só de escalares no nível dado; None se não for"""
+        if not isinstance(item, (list, tuple)) or not item:
+            return None
+        internos = [_escalar(v) for v in item]
+        if None in internos:
+            return None
+        interno = self._quebra(nivel + 1)
+        return '[' + interno + (self.separador_item + interno).join(internos) + self._quebra(nivel) + ']'
+
+    def escrever(self, valor, saida, nivel=0):
+        texto = _escalar(valor)
+        if texto is not None:
+            saida.escrever(texto)
+        elif isinstance(valor, dict):
+            self._escrever_dict(valor, saida, nivel)
+        elif _eh_contener(valor):
+            self._escrever_lista(valor, saida, nivel)
+        else:
+            raise TypeError(f"Object of type {type(valor).__name__} is not JSON serializable")
+
+    def _escrever_dict(self, valor, saida, nivel):
+        if not valor:
+            saida.escrever('{}')
+            return
+        dentro = self._quebra(nivel + 1)
+        saida.escrever('{')
+        primeiro = True
+        for chave, item in valor.items():
+            saida.escrever(('' if primeiro else self.separador_item) + dentro
+                           + encode_basestring_ascii(str(chave)) + self.separador_chave)
+            self.escrever(item, saida, nivel + 1)
+            primeiro = False
+        saida.escrever(self._quebra(nivel) + '}')
+
+    def _escrever_lista(self, valor, saida, nivel):
+        if isinstance(valor, np.ndarray):
+            valor = valor.tolist()
+        elif not isinstance(valor, (list, tuple)):
+            valor = list(valor)
+        if not valor:
+            saida.escrever('[]')
+            return
+        dentro = self._quebra(nivel + 1)
+        separador = self.separador_item + dentro
+        saida.escrever('[' + dentro)
+        # Escalares e listas só de escalares (a janela de congestionamento, os
+        # tamanhos de segmento) são juntados em lotes de LOTE_LISTA itens
+        lote, escritos = [], 0
+        for item in valor:
+            texto = _escalar(item)
+            if texto is None:
+                texto = self._lista_simples(item, nivel + 1)
+            if texto is not None:
+                lote.append(texto)
+                if len(lote) < LOTE_LISTA:
+                    continue
+            if lote:
+                saida.escrever(('' if escritos == 0 else separador) + separador.join(lote))
+                escritos += len(lote)
+                lote = []
+            if texto is None:
+                saida.escrever('' if escritos == 0 else separador)
+                self.escrever(item, saida, nivel + 1)
+                escritos += 1
+        if lote:
+            saida.escrever(('' if escritos == 0 else separador) + separador.join(lote))
+        saida.escrever(self._quebra(nivel) + ']')
+
+
+def _padrao(valor):
+    """Tipos que os codificadores em C (json/orjson) não conhecem"""
+    if isinstance(valor, _TIPOS_DATA):
+        return str(valor)
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, (set, tuple)) or hasattr(valor, '__next__'):
+        return list(valor)
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"Object of type {type(valor).__name__} is not JSON serializable")
+
+
+def _chaves_em_texto(valor):
+    """Os codificadores em C só aceitam chaves str (ou int/float): converte as chaves dos dicts"""
+    if isinstance(valor, dict):
+        return {str(k): _chaves_em_texto(v) for k, v in valor.items()}
+    if isinstance(valor, list) and valor and isinstance(valor[0], dict):
+        return [_chaves_em_texto(v) for v in valor]
+    return valor
+
+
+def _escrever_em_partes(valor, saida, codificar, nivel=0):
+    """
+    Modo compacto: os dois primeiros níveis de dicts são percorridos aqui e
+    cada valor abaixo deles é formatado de uma vez por `codificar` (json ou
+    orjson em C). Listas longas vão em lotes de LOTE_LISTA itens.
+    """
+    if isinstance(valor, dict) and nivel < 2:
+        saida.escrever('{')
+        for i, (chave, item) in enumerate(valor.items()):
+            saida.escrever(('' if i == 0 else ',') + encode_basestring_ascii(str(chave)) + ':')
+            _escrever_em_partes(item, saida, codificar, nivel + 1)
+        saida.escrever('}')
+    elif isinstance(valor, (list, tuple, np.ndarray)) and len(valor) > LOTE_LISTA:
+        saida.escrever('[')
+        for inicio in range(0, len(valor), LOTE_LISTA):
+            lote = valor[inicio:inicio + LOTE_LISTA]
+            lote = lote.tolist() if isinstance(lote, np.ndarray) else list(lote)
+            saida.escrever(('' if inicio == 0 else ',') + codificar(_chaves_em_texto(lote))[1:-1])
+        saida.escrever(']')
+    else:
+        saida.escrever(codificar(_chaves_em_texto(valor)))
+
+
+def salvar_json(dados, caminho, compacto=False, backend='json'):
+    """
+    Grava `dados` (dict de seções) em `caminho`. Seções podem ser dicts,
+    listas, arrays numpy ou geradores, que são consumidos à medida que a
+    saída é escrita.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"backend deve ser um de {BACKENDS}")
+    if backend == 'orjson' and orjson is None:
+        raise ImportError("backend 'orjson' pedido, mas o pacote orjson não está instalado")
+    if backend == 'orjson' and not compacto:
+        raise ValueError("o backend 'orjson' só é usado no modo compacto")
+
+    with open(caminho, 'w') as f:
+        saida = _Saida(f)
+        if not compacto:
+            _Formatador(4).escrever(dados, saida)
+        elif backend == 'orjson':
+            opcoes = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+            _escrever_em_partes(dados, saida, lambda v: orjson.dumps(v, default=_padrao, option=opcoes).decode())
+        else:
+            _escrever_em_partes(dados, saida, json.JSONEncoder(separators=(',', ':'), default=_padrao).encode)
+        saida.descarregar()
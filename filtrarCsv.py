@@ -1,48 +1,151 @@
+import argparse
+import io
+import numpy as np
 import pandas as pd
-from datetime import datetime, timezone
 
-def limpar_csv_arquivo(caminho_original, caminho_corrigido):
-    linhas_validas = []
-    num_colunas_esperado = None
+from colunar import (eh_colunar, carregar_colunar, salvar_colunar, dataframe_para_colunas,
+                     colunas_para_csv, csv_para_colunar, EscritorColunar, CABECALHO_CSV)
 
-    with open(caminho_original, "r", encoding="utf-8") as origem:
-        for i, linha in enumerate(origem):
-            campos = linha.strip().split(',')
+# Janela de tempo padrão dos pacotes mantidos: o ano de 2025 (UTC)
+JANELA_PADRAO = ('2025-01-01', '2026-01-01')
+BYTES_POR_BLOCO = 64 * 1024**2
 
-            if i == 0:
-                num_colunas_esperado = len(campos)
-                linhas_validas.append(','.join(campos) + '\n')
-                continue
+MOTIVOS_REJEICAO = ('numero_de_colunas', 'timestamp_invalido', 'fora_da_janela')
 
-            if len(campos) != num_colunas_esperado:
-                continue
 
-            try:
-                timestamp = campos[0]
-                # Keep as float, do not round!
-                ts_float = float(timestamp)
-                data = datetime.fromtimestamp(ts_float, timezone.utc)
-                if data.year != 2025:
-                    continue  # Mantém só pacotes do ano 2025
+def _segundos_epoch(instante):
+    """Aceita segundos desde a época ou qualquer data que o pd.Timestamp entenda (UTC)"""
+    if isinstance(instante, (int, float)):
+        return float(instante)
+    ts = pd.Timestamp(instante)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return ts.value / 1e9
 
-                campos[0] = str(ts_float)
-                linhas_validas.append(','.join(campos) + '\n')
 
-            except (ValueError, IndexError, OverflowError, OSError):
-                continue
-
-    with open(caminho_corrigido, "w", encoding="utf-8") as destino:
-        destino.writelines(linhas_validas)
-
-    print(f"[OK] Arquivo filtrado e corrigido salvo em: {caminho_corrigido}")
+def _timestamps(campos):
+    """
+    Timestamps em float, com o mesmo valor que float(texto) (NaN onde não é
+    número). O to_numeric só separa os válidos: ele não arredonda
+    corretamente decimais longos, então o valor vem do astype(float), que usa
+    a conversão do Python; os poucos textos que o to_numeric recusa e o float()
+    aceita (ex.: "1_000") passam por float() um a um.
+    """
+    validos = pd.to_numeric(campos, errors='coerce').notna().to_numpy()
+    ts = np.full(len(campos), np.nan)
+    ts[validos] = campos[validos].astype(np.float64).to_numpy()
+    for i in np.flatnonzero(~validos).tolist():
+        try:
+            ts[i] = float(campos.iat[i])
+        except ValueError:
+            pass
+    return ts
+
+
+def _filtrar_bloco(bloco, num_colunas, inicio, fim, rejeitadas):
+    """
+    Valida de uma vez um bloco de linhas completas (bytes terminados em '\\n'),
+    como o filtro antigo linha a linha: cada linha sem os espaços das pontas,
+    mesmo número de colunas do cabeçalho (vírgulas contadas em bloco),
+    timestamp numérico dentro da janela [inicio, fim) e reescrito como
+    str(float(timestamp)). Devolve (texto de saída, número de linhas mantidas).
+    """
+    linhas = pd.Series(bloco.decode('utf-8').split('\n')[:-1], dtype=object).str.strip()
+    colunas_ok = (linhas.str.count(',') + 1 == num_colunas).to_numpy()
+    rejeitadas['numero_de_colunas'] += int((~colunas_ok).sum())
+
+    # partes[0] é o timestamp e partes[1] + partes[2] o resto da linha (",..." ou vazio)
+    partes = linhas[colunas_ok].str.partition(',')
+    ts = _timestamps(partes[0])
+    numerico = np.isfinite(ts)
+    rejeitadas['timestamp_invalido'] += int((~numerico).sum())
+    na_janela = numerico & (ts >= inicio) & (ts < fim)
+    rejeitadas['fora_da_janela'] += int((numerico & ~na_janela).sum())
+
+    mantidas = partes[na_janela]
+    texto = pd.Series(ts[na_janela], index=mantidas.index).astype(str) + mantidas[1] + mantidas[2]
+    return ''.join(linha + '\n' for linha in texto.tolist()), len(texto)
+
+
+def _blocos_de_linhas(arquivo, bytes_por_bloco):
+    """Lê blocos de ~bytes_por_bloco que terminam sempre em uma linha completa"""
+    sobra = b''
+    while True:
+        dados = arquivo.read(bytes_por_bloco)
+        if not dados:
+            break
+        dados = sobra + dados
+        corte = dados.rfind(b'\n') + 1
+        sobra = dados[corte:]
+        if corte:
+            yield dados[:corte]
+    if sobra:
+        yield sobra + b'\n'
+
+
+def limpar_csv_arquivo(caminho_original, caminho_corrigido, janela=JANELA_PADRAO,
+                       bytes_por_bloco=BYTES_POR_BLOCO):
+    """
+    Filtra o CSV do extrator em blocos de ~`bytes_por_bloco`, gravando a saída
+    (CSV ou colunar) à medida que lê, então a memória usada é a de um bloco.
+    Mantém as linhas com o mesmo número de colunas do cabeçalho e timestamp
+    dentro de `janela` = (inicio, fim), em segundos ou datas UTC.
+    Devolve a contagem de linhas rejeitadas por motivo.
+    """
+    inicio, fim = (_segundos_epoch(instante) for instante in janela)
+    rejeitadas = dict.fromkeys(MOTIVOS_REJEICAO, 0)
+    mantidas = 0
+
+    with open(caminho_original, "rb") as origem:
+        cabecalho = origem.readline().strip() + b'\n'
+        num_colunas = cabecalho.count(b',') + 1
+        colunar = eh_colunar(caminho_corrigido)
+        destino = EscritorColunar(caminho_corrigido) if colunar else open(caminho_corrigido, "wb")
+        try:
+            if not colunar:
+                destino.write(cabecalho)
+            for bloco in _blocos_de_linhas(origem, bytes_por_bloco):
+                validas, n = _filtrar_bloco(bloco, num_colunas, inicio, fim, rejeitadas)
+                mantidas += n
+                if colunar:
+                    df = pd.read_csv(io.StringIO(cabecalho.decode('utf-8') + validas), dtype=str)
+                    destino.adicionar(dataframe_para_colunas(df))
+                else:
+                    destino.write(validas.encode('utf-8'))
+        finally:
+            if colunar:
+                destino.fechar()
+            else:
+                destino.close()
+
+    print(f"[OK] Arquivo filtrado e corrigido salvo em: {caminho_corrigido} ({mantidas} linhas)")
+    for motivo, quantidade in rejeitadas.items():
+        print(f"    rejeitadas por {motivo}: {quantidade}")
+    return rejeitadas
 
 def pegar_primeiras_linhas(caminho_entrada, caminho_saida, n_linhas=200_000):
     """
     Lê as primeiras `n_linhas` do CSV e salva em novo arquivo,
-    preservando o cabeçalho.
+    preservando o cabeçalho. Entrada e saída podem estar no formato colunar.
     """
+    if eh_colunar(caminho_entrada):
+        colunas = carregar_colunar(caminho_entrada)
+        if eh_colunar(caminho_saida):
+            salvar_colunar({nome: col[:n_linhas] for nome, col in colunas.items()}, caminho_saida)
+        else:
+            with open(caminho_saida, "w", encoding="utf-8") as f:
+                f.write(CABECALHO_CSV)
+                colunas_para_csv(colunas, f, 0, n_linhas)
+        print(f"[OK] {n_linhas} linhas salvas em: {caminho_saida}")
+        return
+
     df = pd.read_csv(caminho_entrada, nrows=n_linhas, low_memory=False)
 
+    if eh_colunar(caminho_saida):
+        salvar_colunar(dataframe_para_colunas(df), caminho_saida)
+        print(f"[OK] {n_linhas} linhas salvas em: {caminho_saida}")
+        return
+
     cabecalho_padrao = ",".join(df.columns.tolist()) + "\n"
 
     with open(caminho_saida, "w", encoding="utf-8") as f:
@@ -53,11 +156,22 @@ def pegar_primeiras_linhas(caminho_entrada, caminho_saida, n_linhas=200_000):
 
 # === Execução ===
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filtra o data.csv e gera as versões reduzida e colunar")
+    parser.add_argument("--inicio", default=JANELA_PADRAO[0],
+                        help="início da janela de tempo (segundos ou data UTC, inclusivo)")
+    parser.add_argument("--fim", default=JANELA_PADRAO[1],
+                        help="fim da janela de tempo (segundos ou data UTC, exclusivo)")
+    args = parser.parse_args()
+
     caminho_entrada = "data.csv"
     caminho_filtrado = "data_filtrado.csv"
     caminho_saida = "data_200k.csv"
+    # Versão colunar do CSV filtrado, lida quase instantaneamente pelo dataProcessing.py
+    caminho_colunar = "data_filtrado.colunas"
 
-    limpar_csv_arquivo(caminho_entrada, caminho_filtrado)
+    janela = tuple(float(v) if v.replace('.', '', 1).isdigit() else v for v in (args.inicio, args.fim))
+    limpar_csv_arquivo(caminho_entrada, caminho_filtrado, janela)
     pegar_primeiras_linhas(caminho_filtrado, caminho_saida)
+    csv_para_colunar(caminho_filtrado, caminho_colunar)
 
 
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+from leitorPcap import ips_para_texto
+
+CONEXAO_INCOMPLETA = 'incomplete_connection'
+
+# Posição de cada porta (0..65535) quando as portas são ordenadas como texto,
+# reproduzindo o sorted([str(p1), str(p2)]) do antigo normalize_conn.
+_ORDEM_TEXTO_PORTAS = np.empty(65536, dtype=np.int64)
+_ORDEM_TEXTO_PORTAS[np.array(sorted(range(65536), key=str))] = np.arange(65536)
+
+
+def _portas_inteiras(coluna):
+    """Converte uma coluna de portas para int64 (inválidas viram 0, como no normalize_conn)"""
+    portas = pd.to_numeric(pd.Series(coluna), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    portas = np.where(np.isfinite(portas), portas, 0).astype(np.int64)
+    return np.where((portas >= 0) & (portas <= 65535), portas, 0)
+
+
+def _codigos_ips_inteiros(src_ip, dst_ip):
+    """
+    Mesmos códigos do caminho em texto para IPs uint32 (carregamento
+    compacto, 0 = ausente): só os IPs distintos são formatados e ordenados
+    como texto. Devolve (códigos, ips em texto, máscara dos incompletos).
+    """
+    src_ip = np.asarray(src_ip, dtype=np.uint32)
+    dst_ip = np.asarray(dst_ip, dtype=np.uint32)
+    codigos, unicos = pd.factorize(np.concatenate((src_ip, dst_ip)))
+    texto = ips_para_texto(unicos).astype(str)
+    ordem = np.argsort(texto, kind='stable')
+    posicao = np.empty(len(ordem), dtype=np.int64)
+    posicao[ordem] = np.arange(len(ordem))
+    return posicao[codigos], texto[ordem], (src_ip == 0) | (dst_ip == 0)
+
+
+def chavear_fluxos(src_ip, dst_ip, src_port, dst_port, com_sentido=False):
+    """
+    Calcula a chave bidirecional canônica de cada pacote de forma vetorizada.
+
+    Retorna (flow_id, rotulos): flow_id é um array int64 com o id compacto do
+    fluxo de cada pacote e rotulos[flow_id] é o rótulo legível
+    "ip_a:porta_a <-> ip_b:porta_b", idêntico ao gerado pelo antigo
+    normalize_conn. Os ids seguem a ordem alfabética dos rótulos, de modo que
+    agrupar por flow_id produz a mesma ordem que agrupar pelo rótulo.
+
+    Com com_sentido=True retorna também o sentido de cada pacote dentro do
+    fluxo: 0 quando a origem é o IP menor (ou, com IPs iguais, a porta menor)
+    e 1 no sentido contrário.
+    """
+    n = len(src_ip)
+    if np.issubdtype(np.asarray(src_ip).dtype, np.unsignedinteger):
+        codigos_ip, ips, incompleto = _codigos_ips_inteiros(src_ip, dst_ip)
+    else:
+        src_ip = pd.Series(src_ip, dtype=object).reset_index(drop=True)
+        dst_ip = pd.Series(dst_ip, dtype=object).reset_index(drop=True)
+        src_ip = src_ip.where(src_ip.notna(), '').astype(str)
+        dst_ip = dst_ip.where(dst_ip.notna(), '').astype(str)
+        incompleto = ((src_ip == '') | (dst_ip == '')).to_numpy()
+
+        # Códigos de IP compartilhados entre origem e destino, na ordem do texto
+        codigos_ip, ips = pd.factorize(pd.concat([src_ip, dst_ip], ignore_index=True), sort=True)
+    cod_src, cod_dst = codigos_ip[:n].astype(np.int64), codigos_ip[n:].astype(np.int64)
+    ip_menor = np.minimum(cod_src, cod_dst)
+    ip_maior = np.maximum(cod_src, cod_dst)
+
+    porta_src = _portas_inteiras(src_port)
+    porta_dst = _portas_inteiras(dst_port)
+    troca = _ORDEM_TEXTO_PORTAS[porta_src] > _ORDEM_TEXTO_PORTAS[porta_dst]
+    porta_menor = np.where(troca, porta_dst, porta_src)
+    porta_maior = np.where(troca, porta_src, porta_dst)
+
+    # Fatoriza o par de IPs antes de juntar com as portas para não estourar int64
+    codigos_par, _ = pd.factorize(ip_menor * len(ips) + ip_maior)
+    chave = (codigos_par.astype(np.int64) << 32) | (porta_menor << 16) | porta_maior
+    chave[incompleto] = -1
+
+    codigos, chaves_unicas = pd.factorize(chave)
+    rotulos = np.empty(len(chaves_unicas), dtype=object)
+    if len(chaves_unicas):
+        primeiro = np.empty(len(chaves_unicas), dtype=np.int64)
+        primeiro[codigos[::-1]] = np.arange(n - 1, -1, -1)
+        ips = np.asarray(ips, dtype=object)
+        for i, p in enumerate(primeiro):
+            if chaves_unicas[i] == -1:
+                rotulos[i] = CONEXAO_INCOMPLETA
+            else:
+                rotulos[i] = (f"{ips[ip_menor[p]]}:{porta_menor[p]} <-> "
+                              f"{ips[ip_maior[p]]}:{porta_maior[p]}")
+
+    # Renumera os ids para seguirem a ordem alfabética dos rótulos
+    ordem = np.argsort(rotulos.astype(str), kind='stable')
+    novo_id = np.empty(len(ordem), dtype=np.int64)
+    novo_id[ordem] = np.arange(len(ordem))
+    if com_sentido:
+        sentido = ((cod_src > cod_dst) | ((cod_src == cod_dst) & (porta_src > porta_dst))).astype(np.int8)
+        return novo_id[codigos], rotulos[ordem], sentido
+    return novo_id[codigos], rotulos[ordem]
+
+
+def rotulos_inteiros(ip_a, ip_b, porta_a, porta_b, incompleto):
+    """
+    Rótulos "ip_a:porta_a <-> ip_b:porta_b" de chaves com IPs uint32 e portas
+    inteiras, com IPs e portas na ordem de texto, como em chavear_fluxos; as
+    chaves marcadas em `incompleto` viram CONEXAO_INCOMPLETA.
+    """
+    texto_a, texto_b = ips_para_texto(ip_a), ips_para_texto(ip_b)
+    troca_ip = (texto_a > texto_b).astype(bool)
+    porta_a = np.asarray(porta_a, dtype=np.int64)
+    porta_b = np.asarray(porta_b, dtype=np.int64)
+    troca_porta = _ORDEM_TEXTO_PORTAS[porta_a] > _ORDEM_TEXTO_PORTAS[porta_b]
+    rotulos = np.array([f"{a}:{p} <-> {b}:{q}" for a, b, p, q in zip(
+        np.where(troca_ip, texto_b, texto_a).tolist(), np.where(troca_ip, texto_a, texto_b).tolist(),
+        np.where(troca_porta, porta_b, porta_a).tolist(), np.where(troca_porta, porta_a, porta_b).tolist())],
+        dtype=object)
+    rotulos[np.asarray(incompleto, dtype=bool)] = CONEXAO_INCOMPLETA
+    return rotulos
+
+
+def rotular(serie, rotulos):
+    """Troca o índice de flow_id de uma Series agregada pelos rótulos legíveis"""
+    return pd.Series(serie.to_numpy(), index=rotulos[serie.index.to_numpy()], name=serie.name)
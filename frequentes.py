@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# Resumo de itens frequentes (Space-Saving) para as tabelas de top N da
+# análise ao vivo (top portas do intervalo e do total) com memória fixa: no
+# máximo `capacidade` contadores, em qualquer duração de captura. Os modos em
+# blocos, paralelo e incremental guardam as contagens exatas no parcial (ver
+# agregados.py), pois têm de dar o mesmo resultado da análise em memória. O
+# resumo é um DataFrame indexado pela chave com as colunas:
+#   - contagem: estimativa por cima (pacotes ou bytes)
+#   - erro: quanto a contagem pode exceder o valor real
+#   - ordem: posição da primeira ocorrência conhecida, que decide os empates
+# Garantia: para cada chave guardada, contagem - erro <= real <= contagem, e
+# toda chave com valor real acima de N / capacidade (N = soma de todos os
+# pesos vistos) está no resumo.
+# A mesclagem (Agarwal et al., "Mergeable summaries") soma os contadores; uma
+# chave ausente de um lado recebe o piso daquele lado (o menor contador, se
+# ele estiver cheio) na contagem e no erro, e o resultado é cortado de novo em
+# `capacidade`. Assim blocos, fatias e batches podem ser mesclados em qualquer
+# ordem. O piso só serve ao limite superior: o valor informado
+# (mais_frequentes) é contagem - erro, a soma exata do que cada lado viu da
+# chave, então chaves que um lado não viu não são infladas. Enquanto nenhum
+# lado descarta chaves ele é a contagem exata, com os mesmos desempates do
+# value_counts sobre a captura inteira.
+
+CAPACIDADE_PADRAO = 4096
+COLUNAS = ['contagem', 'erro', 'ordem']
+
+
+def resumo_vazio():
+    return pd.DataFrame({'contagem': pd.Series(dtype=np.float64), 'erro': pd.Series(dtype=np.float64),
+                         'ordem': pd.Series(dtype=np.float64)})
+
+
+def _cortar(resumo, capacidade):
+    """Mantém as `capacidade` maiores contagens (empates pela ordem de primeira ocorrência)"""
+    if len(resumo) <= capacidade:
+        return resumo
+    return resumo.sort_values('ordem', kind='stable').sort_values('contagem', ascending=False,
+                                                                  kind='stable').head(capacidade)
+
+
+def _piso(resumo, capacidade):
+    """Maior valor possível de uma chave ausente do resumo: 0 enquanto ele não está cheio"""
+    return resumo['contagem'].min() if len(resumo) >= capacidade else 0
+
+
+def resumir_frequentes(chaves, pesos=None, posicoes=None, capacidade=CAPACIDADE_PADRAO):
+    """
+    Resumo de um bloco: contagens exatas das chaves (ou soma de `pesos` por
+    chave), cortadas em `capacidade`. `posicoes` (posição global de cada
+    linha) alimenta a coluna ordem; sem ela vale a posição dentro do bloco.
+    """
+    chaves = pd.Series(chaves).reset_index(drop=True)
+    if posicoes is None:
+        posicoes = np.arange(len(chaves))
+    posicoes = pd.Series(np.asarray(posicoes, dtype=np.float64))
+    if pesos is None:
+        contagem = chaves.value_counts(sort=False)
+    else:
+        contagem = pd.Series(np.asarray(pesos)).groupby(chaves, sort=False).sum()
+    return resumo_de_contagens(contagem, posicoes.groupby(chaves, sort=False).min(), capacidade)
+
+
+def resumo_de_contagens(contagem, ordem, capacidade=CAPACIDADE_PADRAO):
+    """Resumo a partir de contagens exatas já agregadas por chave e da primeira posição de cada chave"""
+    resumo = pd.DataFrame({'contagem': contagem.astype(np.float64), 'erro': 0.0,
+                           'ordem': ordem.reindex(contagem.index).astype(np.float64)})
+    return _cortar(resumo, capacidade)
+
+
+def combinar_frequentes(a, b, capacidade=CAPACIDADE_PADRAO):
+    if a.empty:
+        return _cortar(b, capacidade)
+    if b.empty:
+        return _cortar(a, capacidade)
+    piso_a, piso_b = _piso(a, capacidade), _piso(b, capacidade)
+    chaves = a.index.union(b.index, sort=False)
+    a, b = a.reindex(chaves), b.reindex(chaves)
+    resumo = pd.DataFrame({
+        'contagem': a['contagem'].fillna(piso_a) + b['contagem'].fillna(piso_b),
+        'erro': a['erro'].fillna(piso_a) + b['erro'].fillna(piso_b),
+        'ordem': np.fmin(a['ordem'], b['ordem']),
+    })
+    return _cortar(resumo, capacidade)
+
+
+def deslocar_ordem(resumo, deslocamento):
+    resumo = resumo.copy()
+    resumo['ordem'] += deslocamento
+    return resumo
+
+
+def mais_frequentes(resumo, n=10):
+    """
+    Top n pelo valor garantido (contagem - erro), empates na ordem de
+    primeira ocorrência (como agregados.ranking)
+    """
+    resumo = resumo.sort_values('ordem', kind='stable')
+    vistos = (resumo['contagem'] - resumo['erro']).rename('contagem')
+    return vistos.sort_values(ascending=False, kind='stable').head(n)
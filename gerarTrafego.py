@@ -0,0 +1,246 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from leitorPcap import COLUNAS_PCAP, FLAGS_TCP, ips_para_texto, flags_para_texto
+
+# Gerador determinístico de tráfego TCP sintético para os benchmarks: a mesma
+# semente e os mesmos parâmetros geram sempre os mesmos pacotes, em data.csv
+# (mesmo formato do extrator.c) ou em .pcap (Ethernet/IPv4/TCP, gravado só com
+# os cabeçalhos: o tamanho original vai no registro, como em uma captura com
+# snaplen pequeno). A geração é vetorizada (20M de pacotes em segundos; o que
+# domina o tempo é a escrita do csv). Cada fluxo tem:
+#   - handshake SYN / SYN-ACK / ACK (com MSS) em uma fração dos fluxos
+#   - pacotes de dados nos dois sentidos, com chegadas exponenciais, tamanhos
+#     de payload sorteados de `mix_tamanhos` e números de sequência coerentes
+#   - retransmissões: cópias de segmentos com dados RTO_S segundos depois
+#   - FIN no fim de parte dos fluxos
+# Os pacotes se distribuem entre os fluxos por uma lei de potência (alguns
+# fluxos elefantes) e `rajadas` fluxos extras mandam `pacotes_por_rajada`
+# pacotes em poucos milissegundos (microbursts).
+
+INICIO_CAPTURA = 1736564000.0   # 2025-01-11 02:53:20
+PORTAS_SERVIDOR = (80, 443, 22, 8080, 53, 3306)
+MIX_PADRAO = {0: 0.35, 1460: 0.35, 512: 0.1, 300: 0.1, 100: 0.1}
+MSS_SERVIDOR = (1460, 1400, 536)
+RTO_S = 0.2
+CHEGADA_MEDIA_S = 0.02
+CHEGADA_RAJADA_S = 1e-5
+FRACAO_FIN = 0.7
+CABECALHOS = 14 + 20 + 24      # Ethernet + IPv4 + TCP com 4 bytes de opções
+BITS = dict(FLAGS_TCP)
+SYN, ACK, PSH, FIN = BITS['S'], BITS['A'], BITS['P'], BITS['F']
+
+
+def _ip(base, deslocamento):
+    return (np.uint32(base) + np.asarray(deslocamento, dtype=np.uint32)).astype(np.uint32)
+
+
+def _soma_exclusiva(valores, grupos):
+    """Soma acumulada exclusiva de `valores` dentro de cada grupo (grupos já contíguos)"""
+    acumulado = np.cumsum(valores)
+    inicio = np.concatenate(([True], grupos[1:] != grupos[:-1]))
+    base = (acumulado - valores)[inicio]
+    return acumulado - valores - np.repeat(base, np.diff(np.append(np.flatnonzero(inicio), len(valores))))
+
+
+def gerar_colunas(pacotes, fluxos=None, fracao_handshake=0.8, taxa_retransmissao=0.02, rajadas=20,
+                  pacotes_por_rajada=200, mix_tamanhos=MIX_PADRAO, duracao=300.0, semente=1):
+    """
+    Colunas no formato do leitorPcap (COLUNAS_PCAP), em ordem de tempo, com
+    aproximadamente `pacotes` pacotes. `fluxos` padrão: um a cada 40 pacotes.
+    """
+    rng = np.random.default_rng(semente)
+    fluxos = fluxos or max(pacotes // 40, 1)
+    total = fluxos + rajadas
+    cliente_ip = _ip(0x0A000000, rng.integers(1, 1 << 16, total))
+    servidor_ip = _ip(0xC0A80100, rng.integers(1, 51, total))
+    cliente_porta = rng.integers(1024, 65536, total)
+    servidor_porta = rng.choice(PORTAS_SERVIDOR, total)
+    inicio = INICIO_CAPTURA + rng.uniform(0, duracao, total)
+    rtt = rng.uniform(0.001, 0.2, total)
+    handshake = rng.random(total) < fracao_handshake
+    fin = rng.random(total) < FRACAO_FIN
+    isn = rng.integers(0, 1 << 32, (total, 2))
+
+    # Orçamento: handshakes, FINs e rajadas são fixos; o resto vira dados e retransmissões
+    dados = pacotes - 3 * int(handshake.sum()) - int(fin.sum()) - rajadas * pacotes_por_rajada
+    dados = int(dados / (1 + taxa_retransmissao))
+    if dados <= 0:
+        raise ValueError("pacotes insuficientes para os handshakes, FINs e rajadas pedidos")
+    pesos = rng.pareto(1.2, fluxos) + 1
+    por_fluxo = np.concatenate((rng.multinomial(dados, pesos / pesos.sum()),
+                                np.full(rajadas, pacotes_por_rajada)))
+    fluxo = np.repeat(np.arange(total), por_fluxo)
+    n = len(fluxo)
+
+    # Chegadas: soma acumulada dos intervalos exponenciais dentro de cada fluxo
+    escala = np.where(np.arange(total) < fluxos, CHEGADA_MEDIA_S, CHEGADA_RAJADA_S)
+    intervalos = rng.exponential(1.0, n) * escala[fluxo]
+    tempo = inicio[fluxo] + 2 * rtt[fluxo] + _soma_exclusiva(intervalos, fluxo) + intervalos
+    sentido = (rng.random(n) < 0.5).astype(np.int64)
+    tamanhos = np.array(list(mix_tamanhos), dtype=np.int64)
+    probabilidades = np.array(list(mix_tamanhos.values()), dtype=np.float64)
+    payload = rng.choice(tamanhos, n, p=probabilidades / probabilidades.sum())
+
+    # Sequência por (fluxo, sentido): ISN (+1 depois do SYN) + bytes já enviados
+    chave = fluxo * 2 + sentido
+    ordem = np.argsort(chave, kind='stable')
+    enviados = np.empty(n, dtype=np.int64)
+    enviados[ordem] = _soma_exclusiva(payload[ordem], chave[ordem])
+    seq = isn[fluxo, sentido] + handshake[fluxo] + enviados
+    ack = isn[fluxo, 1 - sentido] + handshake[fluxo]
+    flags = np.where(payload > 0, PSH | ACK, ACK)
+
+    partes = [{
+        'tempo': tempo, 'fluxo': fluxo, 'sentido': sentido, 'flags': flags,
+        'seq': seq, 'ack': ack, 'payload': payload, 'mss': np.full(n, -1),
+    }]
+
+    # Retransmissões: cópias de segmentos com dados, RTO_S depois
+    com_dados = np.flatnonzero(payload > 0)
+    escolhidos = np.sort(rng.choice(com_dados, min(int(dados * taxa_retransmissao), len(com_dados)),
+                                    replace=False))
+    partes.append({campo: valores[escolhidos] for campo, valores in partes[0].items()})
+    partes[-1]['tempo'] = partes[-1]['tempo'] + RTO_S
+
+    # Handshakes: SYN do cliente, SYN-ACK do servidor, ACK do cliente
+    h = np.flatnonzero(handshake)
+    k = len(h)
+    partes.append({
+        'tempo': np.concatenate((inicio[h], inicio[h] + rtt[h], inicio[h] + 1.5 * rtt[h])),
+        'fluxo': np.tile(h, 3),
+        'sentido': np.concatenate((np.zeros(k), np.ones(k), np.zeros(k))).astype(np.int64),
+        'flags': np.repeat([SYN, SYN | ACK, ACK], k),
+        'seq': np.concatenate((isn[h, 0], isn[h, 1], isn[h, 0] + 1)),
+        'ack': np.concatenate((np.zeros(k, dtype=np.int64), isn[h, 0] + 1, isn[h, 1] + 1)),
+        'payload': np.zeros(3 * k, dtype=np.int64),
+        'mss': np.concatenate((np.full(k, 1460), rng.choice(MSS_SERVIDOR, k), np.full(k, -1))),
+    })
+
+    # FIN do cliente logo depois do último pacote de dados do fluxo
+    f = np.flatnonzero(fin)
+    ultimo = inicio + 2 * rtt
+    np.maximum.at(ultimo, fluxo, tempo)
+    bytes_cliente = np.bincount(fluxo, weights=payload * (sentido == 0), minlength=total).astype(np.int64)
+    partes.append({
+        'tempo': ultimo[f] + 0.01, 'fluxo': f, 'sentido': np.zeros(len(f), dtype=np.int64),
+        'flags': np.full(len(f), FIN | ACK), 'seq': isn[f, 0] + handshake[f] + bytes_cliente[f],
+        'ack': isn[f, 1] + handshake[f], 'payload': np.zeros(len(f), dtype=np.int64),
+        'mss': np.full(len(f), -1),
+    })
+
+    juntos = {campo: np.concatenate([p[campo] for p in partes]) for campo in partes[0]}
+    # Microssegundos, como no pcap e no data.csv; desempate estável pela ordem de geração
+    us = np.round(juntos['tempo'] * 1e6).astype(np.int64)
+    ordem = np.argsort(us, kind='stable')
+    fluxo, sentido = juntos['fluxo'][ordem], juntos['sentido'][ordem]
+    origem_cliente = sentido == 0
+    payload = juntos['payload'][ordem]
+    colunas = {
+        'timestamp_ns': us[ordem] * 1000,
+        'src_ip': np.where(origem_cliente, cliente_ip[fluxo], servidor_ip[fluxo]),
+        'src_port': np.where(origem_cliente, cliente_porta[fluxo], servidor_porta[fluxo]),
+        'dst_ip': np.where(origem_cliente, servidor_ip[fluxo], cliente_ip[fluxo]),
+        'dst_port': np.where(origem_cliente, servidor_porta[fluxo], cliente_porta[fluxo]),
+        'length': payload + CABECALHOS,
+        'flags': juntos['flags'][ordem],
+        'seq': juntos['seq'][ordem] % (1 << 32),
+        'ack': juntos['ack'][ordem] % (1 << 32),
+        'window': rng.integers(1000, 65536, len(ordem)),
+        'segmento_tcp_len': payload,
+        'mss': juntos['mss'][ordem],
+    }
+    return {nome: colunas[nome].astype(tipo) for nome, tipo in COLUNAS_PCAP.items()}
+
+
+def salvar_csv(colunas, caminho, linhas_por_escrita=1_000_000):
+    """Grava no formato do data.csv gerado pelo extrator.c"""
+    n = len(colunas['timestamp_ns'])
+    with open(caminho, 'w', newline='') as f:
+        for inicio in range(0, max(n, 1), linhas_por_escrita):
+            fatia = {nome: col[inicio:inicio + linhas_por_escrita] for nome, col in colunas.items()}
+            pd.DataFrame({
+                'timestamp': (fatia['timestamp_ns'] // 1000) / 1e6,
+                'src_ip': ips_para_texto(fatia['src_ip']),
+                'src_port': fatia['src_port'],
+                'dst_ip': ips_para_texto(fatia['dst_ip']),
+                'dst_port': fatia['dst_port'],
+                'protocol': 'TCP',
+                'length': fatia['length'],
+                'flags': flags_para_texto(fatia['flags']),
+                'seq': fatia['seq'],
+                'ack': fatia['ack'],
+                'window': fatia['window'],
+                'segmento_tcp_len': fatia['segmento_tcp_len'],
+                'mss': fatia['mss'],
+            }).to_csv(f, index=False, header=inicio == 0, float_format='%.6f')
+
+
+# Registro do pcap: cabeçalho do registro (little-endian) + Ethernet + IPv4 +
+# TCP com 4 bytes de opções (MSS nos SYN, NOPs nos demais), em big-endian
+REGISTRO_PCAP = np.dtype([
+    ('ts_sec', '<u4'), ('ts_usec', '<u4'), ('caplen', '<u4'), ('origlen', '<u4'),
+    ('eth_destino', 'V6'), ('eth_origem', 'V6'), ('ethertype', '>u2'),
+    ('versao_ihl', 'u1'), ('tos', 'u1'), ('ip_total', '>u2'), ('ip_id', '>u2'), ('frag', '>u2'),
+    ('ttl', 'u1'), ('protocolo', 'u1'), ('ip_checksum', '>u2'), ('ip_origem', '>u4'), ('ip_destino', '>u4'),
+    ('porta_origem', '>u2'), ('porta_destino', '>u2'), ('seq', '>u4'), ('ack', '>u4'),
+    ('offset', 'u1'), ('flags', 'u1'), ('janela', '>u2'), ('tcp_checksum', '>u2'), ('urgente', '>u2'),
+    ('opcao', '>u2'), ('opcao_valor', '>u2'),
+])
+CABECALHO_PCAP = np.array([0xA1B2C3D4, 0x00040002, 0, 0, 65535, 1], dtype='<u4').tobytes()
+
+
+def salvar_pcap(colunas, caminho, registros_por_escrita=1_000_000):
+    """Grava um pcap clássico (microssegundos, Ethernet) com os cabeçalhos de cada pacote"""
+    n = len(colunas['timestamp_ns'])
+    with open(caminho, 'wb') as f:
+        f.write(CABECALHO_PCAP)
+        for inicio in range(0, n, registros_por_escrita):
+            fatia = {nome: col[inicio:inicio + registros_por_escrita] for nome, col in colunas.items()}
+            registros = np.zeros(len(fatia['timestamp_ns']), dtype=REGISTRO_PCAP)
+            us = fatia['timestamp_ns'] // 1000
+            registros['ts_sec'], registros['ts_usec'] = us // 10**6, us % 10**6
+            registros['caplen'] = CABECALHOS
+            registros['origlen'] = fatia['length']
+            registros['ethertype'] = 0x0800
+            registros['versao_ihl'] = 0x45
+            registros['ip_total'] = fatia['length'] - 14
+            registros['ttl'] = 64
+            registros['protocolo'] = 6
+            registros['ip_origem'], registros['ip_destino'] = fatia['src_ip'], fatia['dst_ip']
+            registros['porta_origem'], registros['porta_destino'] = fatia['src_port'], fatia['dst_port']
+            registros['seq'], registros['ack'] = fatia['seq'], fatia['ack']
+            registros['offset'] = 6 << 4
+            registros['flags'] = fatia['flags']
+            registros['janela'] = fatia['window']
+            com_mss = fatia['mss'] >= 0
+            registros['opcao'] = np.where(com_mss, 0x0204, 0x0101)
+            registros['opcao_valor'] = np.where(com_mss, fatia['mss'], 0x0101)
+            f.write(registros.tobytes())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera tráfego TCP sintético determinístico em csv ou pcap")
+    parser.add_argument("saida", help="arquivo de saída (.csv ou .pcap)")
+    parser.add_argument("--pacotes", type=int, default=200_000)
+    parser.add_argument("--fluxos", type=int, help="padrão: um fluxo a cada 40 pacotes")
+    parser.add_argument("--handshakes", type=float, default=0.8, help="fração dos fluxos com handshake")
+    parser.add_argument("--retransmissoes", type=float, default=0.02, help="fração dos pacotes de dados retransmitidos")
+    parser.add_argument("--rajadas", type=int, default=20, help="número de microbursts")
+    parser.add_argument("--pacotes-por-rajada", type=int, default=200)
+    parser.add_argument("--mix", default=",".join(f"{t}:{p}" for t, p in MIX_PADRAO.items()),
+                        help="tamanhos de payload e pesos, ex.: 0:0.4,1460:0.6")
+    parser.add_argument("--duracao", type=float, default=300.0, help="janela de início dos fluxos, em segundos")
+    parser.add_argument("--semente", type=int, default=1)
+    args = parser.parse_args()
+
+    mix = {int(t): float(p) for t, p in (item.split(':') for item in args.mix.split(','))}
+    colunas = gerar_colunas(args.pacotes, args.fluxos, args.handshakes, args.retransmissoes, args.rajadas,
+                            args.pacotes_por_rajada, mix, args.duracao, args.semente)
+    if args.saida.lower().endswith('.pcap'):
+        salvar_pcap(colunas, args.saida)
+    else:
+        salvar_csv(colunas, args.saida)
+    print(f"[+] {len(colunas['timestamp_ns'])} pacotes gravados em {args.saida}")
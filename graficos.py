@@ -1,11 +1,12 @@
 import os
-import json
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib import dates as mdates
 
+from anexos import carregar_estatisticas
+
 plt.style.use('seaborn-v0_8-darkgrid')
 
 PASTA_GRAFICOS = "graficos_opcionais"
@@ -258,8 +259,8 @@ if __name__ == "__main__":
         print(f"Arquivo {caminho_stats} não encontrado. Gere os dados completos primeiro.")
         exit(1)
 
-    with open(caminho_stats, "r") as f:
-        stats = json.load(f)
+    # As seções grandes ficam em .npz e só são lidas quando um gráfico as usa
+    stats = carregar_estatisticas(caminho_stats)
 
     # Converter conexoes_tcp em dict de DataFrames
     if "conexoes_tcp" in stats:
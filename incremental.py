@@ -0,0 +1,84 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from dataProcessing import acumular_blocos, estatisticas_de_parcial, salvar_estatisticas
+
+# Modo incremental: mantém em disco os agregados parciais da análise (tabela
+# de fluxos, contadores, séries por segundo/minuto e o estado do detector de
+# retransmissões) e incorpora só os batches novos gerados pelo editcap
+# (batches/parte_00*.pcap). Como os parciais por fluxo são indexados pelo
+# rótulo canônico da conexão, um fluxo que atravessa dois batches é costurado
+# naturalmente (início = mínimo, fim = máximo, bytes somados etc.).
+
+CAMINHO_ESTADO = "analise.estado"
+VERSAO_ESTADO = 6
+
+
+def estado_vazio():
+    return {'versao': VERSAO_ESTADO, 'parcial': None, 'pacotes': 0, 'arquivos': {}}
+
+
+def carregar_estado(caminho=CAMINHO_ESTADO):
+    if not os.path.exists(caminho):
+        return estado_vazio()
+    estado = pd.read_pickle(caminho)
+    if estado.get('versao') != VERSAO_ESTADO:
+        raise ValueError(f"{caminho} foi gerado por outra versão da análise; apague-o e reprocesse os batches")
+    return estado
+
+
+def salvar_estado(estado, caminho=CAMINHO_ESTADO):
+    """Grava em um arquivo temporário e renomeia, para nunca deixar um estado pela metade"""
+    temporario = caminho + ".tmp"
+    pd.to_pickle(estado, temporario)
+    os.replace(temporario, caminho)
+
+
+def _identidade(caminho):
+    info = os.stat(caminho)
+    return info.st_size, info.st_mtime_ns
+
+
+def adicionar_lotes(estado, caminhos, tamanho_bloco=1_000_000):
+    """
+    Incorpora ao estado os arquivos (pcap, csv ou .colunas) ainda não vistos,
+    na ordem dada. Arquivos já incorporados e inalterados são pulados; um
+    arquivo incorporado que mudou depois não pode ser desfeito e gera erro.
+    """
+    novos = 0
+    for caminho in caminhos:
+        chave = os.path.abspath(caminho)
+        identidade = _identidade(caminho)
+        if chave in estado['arquivos']:
+            if tuple(estado['arquivos'][chave]) != identidade:
+                raise ValueError(f"{caminho} mudou depois de incorporado; apague o estado e reprocesse")
+            print(f"[=] {caminho} já incorporado, pulando")
+            continue
+        estado['parcial'], estado['pacotes'] = acumular_blocos(caminho, tamanho_bloco,
+                                                               estado['parcial'], estado['pacotes'])
+        estado['arquivos'][chave] = identidade
+        novos += 1
+        print(f"[+] {caminho} incorporado ({estado['pacotes']} pacotes no total)")
+    return novos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incorpora batches novos ao estado salvo e regenera os jsons")
+    # ex.: python incremental.py batches/parte_00*.pcap
+    parser.add_argument("entrada", nargs="*", help="batches a incorporar (.pcap, .csv ou .colunas)")
+    parser.add_argument("--estado", default=CAMINHO_ESTADO, help="arquivo com o estado da análise")
+    parser.add_argument("--blocos", type=int, default=1_000_000, metavar="N", help="pacotes lidos por vez")
+    args = parser.parse_args()
+
+    inicio = time.time()
+    estado = carregar_estado(args.estado)
+    if adicionar_lotes(estado, args.entrada, args.blocos):
+        salvar_estado(estado, args.estado)
+
+    stats, resumo = estatisticas_de_parcial(estado['parcial'])
+    salvar_estatisticas(stats, "stats_completo.json")
+    salvar_estatisticas(resumo, "stats_metricas.json")
+    print(f"Tempo total de execução: {time.time() - inicio:.2f} segundos")
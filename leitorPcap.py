@@ -0,0 +1,326 @@
+import mmap
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+
+# Leitura direta de arquivos .pcap (formato libpcap clássico) para colunas NumPy,
+# sem passar pelo extrator.c e pelo data.csv.
+
+MAGICOS = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1_000),   # little-endian, microssegundos
+    b'\xa1\xb2\xc3\xd4': ('>', 1_000),   # big-endian, microssegundos
+    b'\x4d\x3c\xb2\xa1': ('<', 1),       # little-endian, nanossegundos
+    b'\xa1\xb2\x3c\x4d': ('>', 1),       # big-endian, nanossegundos
+}
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = 0x8100
+
+# Bits das flags TCP, na mesma ordem usada pelo tcp_flags_to_str do extrator.c
+FLAGS_TCP = (('F', 0x01), ('S', 0x02), ('R', 0x04), ('P', 0x08), ('A', 0x10), ('U', 0x20))
+
+COLUNAS_PCAP = {
+    'timestamp_ns': np.int64,
+    'src_ip': np.uint32,
+    'src_port': np.uint16,
+    'dst_ip': np.uint32,
+    'dst_port': np.uint16,
+    'length': np.uint32,
+    'flags': np.uint8,
+    'seq': np.uint32,
+    'ack': np.uint32,
+    'window': np.uint16,
+    'segmento_tcp_len': np.uint32,
+    'mss': np.int32,
+}
+
+
+def _colunas_vazias():
+    return {nome: np.empty(0, dtype=tipo) for nome, tipo in COLUNAS_PCAP.items()}
+
+
+def _u8(dados, pos):
+    return dados[np.minimum(pos, len(dados) - 1)].astype(np.uint32)
+
+
+def _u16(dados, pos, ordem='>'):
+    a, b = _u8(dados, pos), _u8(dados, pos + 1)
+    return (a << 8) | b if ordem == '>' else (b << 8) | a
+
+
+def _u32(dados, pos, ordem='>'):
+    a, b = _u16(dados, pos, ordem), _u16(dados, pos + 2, ordem)
+    return (a << 16) | b if ordem == '>' else (b << 16) | a
+
+
+def _offsets_registros(mm, ordem, inicio=24, limite=None):
+    """
+    Percorre os cabeçalhos de registro (a partir de `inicio`) e devolve o
+    offset de cada um; com `limite` para depois de `limite` registros.
+    """
+    cabecalho = struct.Struct(ordem + 'I')
+    offsets = []
+    pos, fim = inicio, len(mm)
+    while pos + 16 <= fim and (limite is None or len(offsets) < limite):
+        caplen, = cabecalho.unpack_from(mm, pos + 8)
+        if pos + 16 + caplen > fim:
+            break  # último registro truncado
+        offsets.append(pos)
+        pos += 16 + caplen
+    return np.array(offsets, dtype=np.int64)
+
+
+def _extrair_mss(dados, inicio_opcoes, fim_opcoes):
+    """Procura a opção MSS (kind 2, len 4) nas opções TCP de cada pacote SYN"""
+    mss = np.full(len(inicio_opcoes), -1, dtype=np.int32)
+    for j, (i, fim) in enumerate(zip(inicio_opcoes.tolist(), fim_opcoes.tolist())):
+        while i < fim:
+            kind = int(dados[i])
+            if kind == 0:
+                break
+            if kind == 1:
+                i += 1
+                continue
+            if i + 1 >= fim:
+                break
+            tam = int(dados[i + 1])
+            if tam < 2 or i + tam > fim:
+                break
+            if kind == 2 and tam == 4:
+                mss[j] = (int(dados[i + 2]) << 8) | int(dados[i + 3])
+                break
+            i += tam
+    return mss
+
+
+def _decodificar(dados, offsets, ordem, divisor_ns, linktype):
+    ts_sec = _u32(dados, offsets, ordem).astype(np.int64)
+    ts_frac = _u32(dados, offsets + 4, ordem).astype(np.int64)
+    caplen = _u32(dados, offsets + 8, ordem).astype(np.int64)
+    origlen = _u32(dados, offsets + 12, ordem).astype(np.int64)
+    pacote = offsets + 16
+
+    if linktype == LINKTYPE_ETHERNET:
+        ethertype = _u16(dados, pacote + 12)
+        vlan = ethertype == ETHERTYPE_VLAN
+        ethertype = np.where(vlan, _u16(dados, pacote + 16), ethertype)
+        enlace = np.where(vlan, 18, 14).astype(np.int64)
+        valido = (ethertype == ETHERTYPE_IPV4) & (caplen >= enlace + 20)
+    else:
+        enlace = np.zeros(len(offsets), dtype=np.int64)
+        valido = caplen >= 20
+
+    ip = pacote + enlace
+    versao_ihl = _u8(dados, ip)
+    ihl = (versao_ihl & 0x0F).astype(np.int64) * 4
+    valido &= ((versao_ihl >> 4) == 4) & (ihl >= 20) & (_u8(dados, ip + 9) == 6)
+    tcp = ip + ihl
+    valido &= caplen >= enlace + ihl + 20
+
+    doff = (_u8(dados, tcp + 12) >> 4).astype(np.int64) * 4
+    flags = _u8(dados, tcp + 13) & 0x3F
+    cabecalhos = enlace + ihl + doff
+    segmento = np.where(origlen >= cabecalhos, origlen - cabecalhos, 0)
+
+    # MSS só é procurado nos SYN, que são poucos; o resto da captura é vetorizado
+    mss = np.full(len(offsets), -1, dtype=np.int32)
+    syn = valido & ((flags & 0x02) != 0) & (doff > 20)
+    if syn.any():
+        fim_opcoes = np.minimum(tcp[syn] + doff[syn], pacote[syn] + caplen[syn])
+        mss[syn] = _extrair_mss(dados, tcp[syn] + 20, fim_opcoes)
+
+    colunas = {
+        'timestamp_ns': ts_sec * 1_000_000_000 + ts_frac * divisor_ns,
+        'src_ip': _u32(dados, ip + 12),
+        'src_port': _u16(dados, tcp),
+        'dst_ip': _u32(dados, ip + 16),
+        'dst_port': _u16(dados, tcp + 2),
+        'length': origlen,
+        'flags': flags,
+        'seq': _u32(dados, tcp + 4),
+        'ack': _u32(dados, tcp + 8),
+        'window': _u16(dados, tcp + 14),
+        'segmento_tcp_len': segmento,
+        'mss': mss,
+    }
+    return {nome: col[valido].astype(COLUNAS_PCAP[nome]) for nome, col in colunas.items()}
+
+
+def ler_pcap(caminho):
+    """
+    Lê um arquivo .pcap via mmap e decodifica Ethernet/IPv4/TCP direto em
+    arrays NumPy com os tipos de COLUNAS_PCAP. Pacotes que não são TCP sobre
+    IPv4 são descartados.
+    """
+    with open(caminho, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return _colunas_vazias()  # arquivo vazio
+
+    try:
+        ordem, divisor_ns, linktype = _cabecalho_global(mm[:24], caminho)
+
+        offsets = _offsets_registros(mm, ordem)
+        if len(offsets) == 0:
+            return _colunas_vazias()
+        dados = np.frombuffer(mm, dtype=np.uint8)
+        try:
+            return _decodificar(dados, offsets, ordem, divisor_ns, linktype)
+        finally:
+            del dados
+    finally:
+        mm.close()
+
+
+def ler_pcap_em_blocos(caminho, registros_por_bloco=1_000_000):
+    """
+    Mesmo que ler_pcap, mas gerando as colunas de até `registros_por_bloco`
+    registros por vez: os offsets e as colunas decodificadas de um bloco só
+    existem enquanto ele é processado, e o arquivo fica no mmap (páginas do
+    próprio arquivo, liberáveis pelo sistema).
+    """
+    with open(caminho, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # arquivo vazio
+
+    try:
+        ordem, divisor_ns, linktype = _cabecalho_global(mm[:24], caminho)
+        dados = np.frombuffer(mm, dtype=np.uint8)
+        try:
+            inicio = 24
+            while True:
+                offsets = _offsets_registros(mm, ordem, inicio, registros_por_bloco)
+                if not len(offsets):
+                    break
+                ultimo = int(offsets[-1])
+                inicio = ultimo + 16 + struct.unpack_from(ordem + 'I', mm, ultimo + 8)[0]
+                yield _decodificar(dados, offsets, ordem, divisor_ns, linktype)
+        finally:
+            del dados
+    finally:
+        mm.close()
+
+
+def _cabecalho_global(cabecalho, origem):
+    """(ordem dos bytes, divisor para ns, linktype) do cabeçalho global de 24 bytes"""
+    if len(cabecalho) < 24 or bytes(cabecalho[:4]) not in MAGICOS:
+        raise ValueError(f"{origem} não é um arquivo pcap clássico")
+    ordem, divisor_ns = MAGICOS[bytes(cabecalho[:4])]
+    linktype = struct.unpack_from(ordem + 'I', cabecalho, 20)[0] & 0x0FFFFFFF
+    if linktype not in (LINKTYPE_ETHERNET, LINKTYPE_RAW):
+        raise ValueError(f"{origem}: tipo de enlace {linktype} não suportado")
+    return ordem, divisor_ns, linktype
+
+
+def ler_pcap_continuo(arquivo, seguir=False, espera=0.2, bytes_por_leitura=1 << 20):
+    """
+    Lê um pcap que ainda está sendo gerado (um arquivo aberto em 'rb' ou o
+    sys.stdin.buffer de um "tcpdump -w -") e gera blocos de colunas como os de
+    ler_pcap, com os registros completos que já chegaram. Um registro cortado
+    no fim da leitura fica no buffer até o resto chegar. Com seguir=True o
+    fim do arquivo não encerra a leitura: espera `espera` segundos e tenta de
+    novo (tail -f).
+    """
+    ler = getattr(arquivo, 'read1', arquivo.read)
+    buffer = bytearray()
+    formato = None
+    while True:
+        dados = ler(bytes_por_leitura)
+        if not dados:
+            if not seguir:
+                return
+            time.sleep(espera)
+            continue
+        buffer += dados
+        if formato is None:
+            if len(buffer) < 24:
+                continue
+            formato = _cabecalho_global(buffer, getattr(arquivo, 'name', 'entrada'))
+            del buffer[:24]
+        ordem, divisor_ns, linktype = formato
+        offsets = _offsets_registros(buffer, ordem, inicio=0)
+        if not len(offsets):
+            continue
+        ultimo = int(offsets[-1])
+        consumido = ultimo + 16 + struct.unpack_from(ordem + 'I', buffer, ultimo + 8)[0]
+        bloco = np.frombuffer(bytes(buffer[:consumido]), dtype=np.uint8)
+        del buffer[:consumido]
+        yield _decodificar(bloco, offsets, ordem, divisor_ns, linktype)
+
+
+def ler_pcaps(caminhos):
+    """Lê vários .pcap (ex.: batches/parte_00*.pcap) e concatena as colunas"""
+    partes = [ler_pcap(c) for c in caminhos]
+    if not partes:
+        return _colunas_vazias()
+    return {nome: np.concatenate([p[nome] for p in partes]) for nome in COLUNAS_PCAP}
+
+
+def ips_para_texto(ips):
+    """Converte IPs uint32 para a notação pontuada, formatando só os valores distintos"""
+    unicos, inverso = np.unique(np.asarray(ips, dtype=np.uint32), return_inverse=True)
+    texto = np.array([f"{ip >> 24}.{(ip >> 16) & 255}.{(ip >> 8) & 255}.{ip & 255}"
+                      for ip in unicos.tolist()], dtype=object)
+    return texto[inverso.reshape(-1)]
+
+
+def texto_para_ips(ips):
+    """Inverso de ips_para_texto: notação pontuada -> uint32 (vazios/inválidos viram 0)"""
+    codigos, unicos = pd.factorize(pd.Series(ips, dtype=object), use_na_sentinel=False)
+    valores = np.zeros(len(unicos), dtype=np.uint32)
+    for i, ip in enumerate(unicos):
+        partes = str(ip).split('.')
+        if len(partes) == 4 and all(p.isdigit() and int(p) < 256 for p in partes):
+            a, b, c, d = map(int, partes)
+            valores[i] = (a << 24) | (b << 16) | (c << 8) | d
+    return valores[codigos]
+
+
+TABELA_FLAGS = np.array([''.join(letra for letra, bit in FLAGS_TCP if b & bit) for b in range(256)],
+                        dtype=object)
+
+
+def flags_para_texto(flags):
+    """Converte a máscara de bits das flags para o texto gerado pelo extrator.c (ex.: 'SA')"""
+    return TABELA_FLAGS[np.asarray(flags, dtype=np.uint8)]
+
+
+def texto_para_flags(flags):
+    """Inverso de flags_para_texto: texto de flags (ex.: 'PA') -> máscara uint8"""
+    bits = dict(FLAGS_TCP)
+    codigos, unicos = pd.factorize(pd.Series(flags, dtype=object), use_na_sentinel=False)
+    valores = np.array([sum(bits.get(letra, 0) for letra in set(f)) if isinstance(f, str) else 0
+                        for f in unicos], dtype=np.uint8)
+    return valores[codigos]
+
+
+def pcap_para_dataframe(colunas, nomes=None):
+    """
+    Monta um DataFrame com as mesmas colunas e tipos lidos do data.csv (tempo
+    em timestamp_ns). Com `nomes` só essas colunas são convertidas.
+    """
+    conversoes = {
+        'timestamp_ns': lambda: np.asarray(colunas['timestamp_ns'], dtype=np.int64),
+        'src_ip': lambda: ips_para_texto(colunas['src_ip']),
+        'src_port': lambda: colunas['src_port'].astype(float),
+        'dst_ip': lambda: ips_para_texto(colunas['dst_ip']),
+        'dst_port': lambda: colunas['dst_port'].astype(float),
+        'protocol': lambda: 'TCP',
+        'length': lambda: colunas['length'].astype(float),
+        'flags': lambda: flags_para_texto(colunas['flags']),
+        'seq': lambda: colunas['seq'].astype(float),
+        'ack': lambda: colunas['ack'].astype(float),
+        'window': lambda: colunas['window'].astype(float),
+        'segmento_tcp_len': lambda: colunas['segmento_tcp_len'].astype(float),
+        'mss': lambda: colunas['mss'].astype(float),
+    }
+    return pd.DataFrame({nome: converter() for nome, converter in conversoes.items()
+                         if nomes is None or nome in nomes},
+                        index=pd.RangeIndex(len(colunas['timestamp_ns'])))
@@ -1,10 +1,11 @@
-import json
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 import pandas as pd
 import matplotlib.dates as mdates
 
+from anexos import carregar_estatisticas
+
 plt.rcParams.update({'axes.grid': True})
 os.makedirs("graficos_metricas", exist_ok=True)
 
@@ -770,7 +771,7 @@ def plotar_graficos(dados):
             salvar_figura("duracao_conexoes.png")
 
 if __name__ == "__main__":
-    with open("stats_metricas.json", "r") as f:
-        dados = json.load(f)
+    # As seções grandes ficam em .npz e só são lidas quando um gráfico as usa
+    dados = carregar_estatisticas("stats_metricas.json")
     plotar_graficos(dados)
     print("Gráficos de métricas gerados com sucesso.")
\ No newline at end of file
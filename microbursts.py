@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+from tempo import para_datas
+
+# Detecção de microbursts abaixo de 1 segundo. Os timestamps (inteiros em ns)
+# são divididos em intervalos de largura fixa (RESOLUCOES) e contados com
+# np.bincount, em pacotes e em bytes. Só os intervalos ocupados são
+# guardados, então o custo é linear no número de pacotes mesmo em 100 us sobre
+# uma captura de dias. Um intervalo está em rajada quando tem pelo menos
+# `minimo_pacotes` e passa de `fator` vezes a média da janela deslizante de
+# `janela_ns` centrada nele (contando os intervalos vazios). Intervalos
+# seguidos em rajada formam uma única rajada, que é reportada com início,
+# duração, pico de pacotes/s e bytes/s e os fluxos que mais contribuíram.
+
+RESOLUCOES = {'100us': 100_000, '1ms': 1_000_000, '10ms': 10_000_000, '1s': 1_000_000_000}
+RESOLUCAO_PADRAO = '1ms'
+JANELA_PADRAO_NS = 1_000_000_000
+FATOR_PADRAO = 3.0
+MINIMO_PACOTES = 5
+MAX_RAJADAS = 50
+FLUXOS_POR_RAJADA = 5
+
+
+def contar_intervalos(ns, tamanhos, largura_ns):
+    """
+    Intervalos ocupados (número do intervalo = ns // largura_ns) com as
+    contagens de pacotes e bytes, e o índice do intervalo de cada pacote.
+    """
+    intervalos = ns // largura_ns
+    if len(intervalos) and (np.diff(intervalos) >= 0).all():
+        # Entrada em ordem de tempo (o normal): intervalos únicos em uma passada
+        novo = np.empty(len(intervalos), dtype=bool)
+        novo[:1] = True
+        np.not_equal(intervalos[1:], intervalos[:-1], out=novo[1:])
+        ocupados = intervalos[novo]
+        inverso = np.cumsum(novo) - 1
+    else:
+        ocupados, inverso = np.unique(intervalos, return_inverse=True)
+    pacotes = np.bincount(inverso, minlength=len(ocupados))
+    bytes_ = np.bincount(inverso, weights=tamanhos, minlength=len(ocupados))
+    return ocupados, pacotes, bytes_, inverso
+
+
+def _media_janela(ocupados, pacotes, largura_ns, janela_ns):
+    """Média de pacotes por intervalo na janela centrada em cada intervalo ocupado"""
+    meia = max(janela_ns // largura_ns // 2, 1)
+    acumulado = np.concatenate(([0], np.cumsum(pacotes)))
+    inicio = np.searchsorted(ocupados, ocupados - meia, side='left')
+    fim = np.searchsorted(ocupados, ocupados + meia, side='right')
+    return (acumulado[fim] - acumulado[inicio]) / (2 * meia + 1)
+
+
+def detectar_microbursts(ns, tamanhos, flow_id, rotulos, resolucao=RESOLUCAO_PADRAO,
+                         janela_ns=JANELA_PADRAO_NS, fator=FATOR_PADRAO, minimo_pacotes=MINIMO_PACOTES):
+    """
+    DataFrame com uma linha por rajada: inicio_ns, duracao_s, pacotes, bytes,
+    pico_pacotes_por_s, pico_bytes_por_s e fluxos ({rótulo: pacotes} dos
+    FLUXOS_POR_RAJADA fluxos com mais pacotes na rajada).
+    """
+    largura_ns = RESOLUCOES[resolucao]
+    ns = np.asarray(ns, dtype=np.int64)
+    ocupados, pacotes, bytes_, inverso = contar_intervalos(ns, np.asarray(tamanhos, dtype=np.float64), largura_ns)
+    media = _media_janela(ocupados, pacotes, largura_ns, janela_ns)
+    em_rajada = (pacotes >= minimo_pacotes) & (pacotes > fator * media)
+
+    # Rajadas = sequências de intervalos consecutivos em rajada
+    indices = np.flatnonzero(em_rajada)
+    if not len(indices):
+        return pd.DataFrame(columns=['inicio_ns', 'duracao_s', 'pacotes', 'bytes', 'pico_pacotes_por_s',
+                                     'pico_bytes_por_s', 'fluxos'])
+    quebra = np.concatenate(([True], np.diff(ocupados[indices]) != 1))
+    rajada = np.cumsum(quebra) - 1
+    primeiro = indices[quebra]
+    ultimo = indices[np.concatenate((quebra[1:], [True]))]
+    largura_s = largura_ns / 1e9
+    tabela = pd.DataFrame({
+        'inicio_ns': ocupados[primeiro] * largura_ns,
+        'duracao_s': (ocupados[ultimo] - ocupados[primeiro] + 1) * largura_s,
+        'pacotes': np.bincount(rajada, weights=pacotes[indices]).astype(np.int64),
+        'bytes': np.bincount(rajada, weights=bytes_[indices]),
+        'pico_pacotes_por_s': np.maximum.reduceat(pacotes[indices], np.flatnonzero(quebra)) / largura_s,
+        'pico_bytes_por_s': np.maximum.reduceat(bytes_[indices], np.flatnonzero(quebra)) / largura_s,
+    })
+
+    # Fluxos de cada rajada: pacotes por (rajada, fluxo) só dos pacotes em rajada
+    rajada_do_intervalo = np.full(len(ocupados), -1, dtype=np.int64)
+    rajada_do_intervalo[indices] = rajada
+    rajada_do_pacote = rajada_do_intervalo[inverso]
+    dentro = rajada_do_pacote >= 0
+    por_fluxo = pd.Series(1, index=pd.MultiIndex.from_arrays(
+        [rajada_do_pacote[dentro], np.asarray(flow_id)[dentro]])).groupby(level=[0, 1]).sum()
+    por_fluxo = por_fluxo.sort_values(ascending=False, kind='stable').groupby(level=0).head(FLUXOS_POR_RAJADA)
+    fluxos = [{} for _ in range(len(tabela))]
+    for (r, flow), n in por_fluxo.items():
+        fluxos[r][str(rotulos[flow])] = int(n)
+    tabela['fluxos'] = fluxos
+    return tabela
+
+
+def resumo_microbursts(df, rotulos, resolucao=RESOLUCAO_PADRAO, max_rajadas=MAX_RAJADAS, **opcoes):
+    """
+    Seção microbursts_subsegundo do stats: parâmetros da detecção e as
+    `max_rajadas` rajadas de maior pico (em ordem de início).
+    """
+    tabela = detectar_microbursts(df['timestamp_ns'].to_numpy(), df['length'].fillna(0).to_numpy(),
+                                  df['flow_id'].to_numpy(), rotulos, resolucao, **opcoes)
+    total = len(tabela)
+    tabela = tabela.sort_values('pico_pacotes_por_s', ascending=False, kind='stable').head(max_rajadas)
+    tabela = tabela.sort_values('inicio_ns', kind='stable')
+    tabela['inicio'] = para_datas(tabela['inicio_ns']).astype(str)
+    colunas = ['inicio', 'duracao_s', 'pacotes', 'bytes', 'pico_pacotes_por_s', 'pico_bytes_por_s', 'fluxos']
+    return {
+        'resolucao': resolucao,
+        'janela_s': opcoes.get('janela_ns', JANELA_PADRAO_NS) / 1e9,
+        'fator': opcoes.get('fator', FATOR_PADRAO),
+        'minimo_pacotes': opcoes.get('minimo_pacotes', MINIMO_PACOTES),
+        'total_rajadas': total,
+        'rajadas': tabela[colunas].to_dict(orient='records'),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from dataProcessing import carregar_pacotes
+    from fluxos import chavear_fluxos
+
+    parser = argparse.ArgumentParser(description="Detecta microbursts abaixo de 1 segundo")
+    parser.add_argument("entrada", nargs="+", help="data.csv, diretório .colunas ou arquivo(s) .pcap")
+    parser.add_argument("--resolucao", choices=list(RESOLUCOES), default=RESOLUCAO_PADRAO,
+                        help="largura dos intervalos")
+    parser.add_argument("--janela", type=float, default=JANELA_PADRAO_NS / 1e9,
+                        help="janela deslizante da média, em segundos")
+    parser.add_argument("--fator", type=float, default=FATOR_PADRAO,
+                        help="rajada = intervalo acima de fator x média da janela")
+    parser.add_argument("--minimo", type=int, default=MINIMO_PACOTES, help="pacotes mínimos no intervalo")
+    args = parser.parse_args()
+
+    entrada = args.entrada[0] if len(args.entrada) == 1 else args.entrada
+    df = carregar_pacotes(entrada)
+    df['flow_id'], rotulos = chavear_fluxos(df['src_ip'], df['dst_ip'], df['src_port'], df['dst_port'])
+    resumo = resumo_microbursts(df, rotulos, args.resolucao, janela_ns=int(args.janela * 1e9),
+                                fator=args.fator, minimo_pacotes=args.minimo)
+    print(json.dumps(resumo, indent=4))
@@ -0,0 +1,124 @@
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+# Medição de etapas nomeadas: tempo de relógio, tempo de CPU do processo (não
+# inclui os workers do modo paralelo) e
+# pico de memória residente (RSS) acima do RSS do início da etapa. O pico é
+# obtido por uma thread que lê /proc/self/statm a cada `intervalo` segundos
+# enquanto houver etapa aberta (fora do Linux cai no ru_maxrss, que só cresce).
+# Etapas podem ser aninhadas; cada uma guarda também contagens livres
+# (linhas, fluxos...) preenchidas pelo código medido no dict devolvido, e o
+# nível de aninhamento (o total do relatório soma só as de nível 0).
+# Com a medição desligada o código instrumentado recebe PERFIL_DESLIGADO, cujo
+# etapa() só devolve um dict descartável: nenhuma leitura de relógio ou de
+# memória e nenhuma thread.
+
+INTERVALO_PADRAO = 0.01
+_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_atual():
+    """Memória residente do processo em bytes"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGINA
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def caminho_perfil(caminho_json):
+    """Relatório gravado ao lado do json de estatísticas (stats_completo.perfil.json)"""
+    return f"{os.path.splitext(caminho_json)[0]}.perfil.json"
+
+
+class Perfil:
+    """Acumula os registros das etapas medidas, na ordem em que terminam"""
+
+    def __init__(self, intervalo=INTERVALO_PADRAO):
+        self.intervalo = intervalo
+        self.etapas = []
+        self._abertas = []
+        self._trava = threading.Lock()
+        self._amostrador = None
+        self._parar = threading.Event()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self._atualizar_picos()
+
+    def _atualizar_picos(self):
+        rss = rss_atual()
+        with self._trava:
+            for aberta in self._abertas:
+                if rss > aberta['_pico']:
+                    aberta['_pico'] = rss
+
+    @contextmanager
+    def etapa(self, nome, **contagens):
+        rss = rss_atual()
+        registro = {'etapa': nome, 'nivel': len(self._abertas), **contagens, '_rss': rss, '_pico': rss}
+        with self._trava:
+            self._abertas.append(registro)
+            if self._amostrador is None:
+                self._parar.clear()
+                self._amostrador = threading.Thread(target=self._amostrar, daemon=True)
+                self._amostrador.start()
+        relogio, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield registro
+        finally:
+            registro['tempo_s'] = time.perf_counter() - relogio
+            registro['cpu_s'] = time.process_time() - cpu
+            self._atualizar_picos()
+            with self._trava:
+                self._abertas.remove(registro)
+                if not self._abertas:
+                    self._parar.set()
+                    amostrador, self._amostrador = self._amostrador, None
+                else:
+                    amostrador = None
+            if amostrador is not None:
+                amostrador.join()
+            inicial, pico = registro.pop('_rss'), registro.pop('_pico')
+            registro['rss_inicial_mb'] = inicial / 2**20
+            registro['pico_rss_delta_mb'] = (pico - inicial) / 2**20
+            self.etapas.append(registro)
+
+    def pular(self, nome, motivo):
+        """Registra uma etapa que não pôde ser medida"""
+        self.etapas.append({'etapa': nome, 'nivel': len(self._abertas), 'erro': motivo})
+
+    def relatorio(self):
+        return {'etapas': self.etapas,
+                'total_s': sum(e.get('tempo_s', 0.0) for e in self.etapas if e['nivel'] == 0),
+                'pico_rss_mb': max((e['rss_inicial_mb'] + e['pico_rss_delta_mb'] for e in self.etapas
+                                    if 'tempo_s' in e), default=0.0)}
+
+    def salvar(self, caminho):
+        with open(caminho, 'w') as f:
+            json.dump(self.relatorio(), f, indent=4)
+
+
+class _EtapaDesligada:
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *excecao):
+        return False
+
+
+class PerfilDesligado:
+    _etapa = _EtapaDesligada()
+
+    def etapa(self, nome, **contagens):
+        return self._etapa
+
+    def pular(self, nome, motivo):
+        pass
+
+
+PERFIL_DESLIGADO = PerfilDesligado()
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+# Esboço de quantis no estilo DDSketch, para distribuições grandes demais para
+# guardar cada valor (tamanhos de segmento, RTT, duração e throughput).
+# Um valor x > 0 cai no balde k = ceil(log_gama(x)), com gama = (1 + alfa) /
+# (1 - alfa); zeros têm um balde próprio (BALDE_ZERO). O esboço é só uma
+# Series balde -> contagem, então mesclar dois esboços é somar as Series (o
+# 'sum' do AGREGACOES em agregados.py), em qualquer ordem, entre blocos,
+# batches ou fatias.
+#
+# Garantia de erro: o quantil q devolvido fica a no máximo alfa (erro
+# relativo) do valor de posição floor(q * (n - 1)) na amostra ordenada, o
+# mesmo valor que o np.percentile usa como base da interpolação. Com
+# ALFA_PADRAO = 1% bastam ~555 baldes para valores entre 1 e 65535 (os
+# tamanhos de segmento) e ~1150 para cada 10 ordens de grandeza. Acima de
+# max_baldes os baldes mais baixos são fundidos, e só os quantis que caem
+# nessa cauda baixa perdem a garantia. Mínimo, máximo, média e desvio padrão
+# são exatos: saem dos momentos (n, soma e M2, mesclados por
+# combinar_momentos) e dos extremos guardados ao lado do esboço.
+
+ALFA_PADRAO = 0.01
+MAX_BALDES = 2048
+BALDE_ZERO = -(1 << 62)
+PERCENTIS = (25, 75, 90, 95, 99)
+
+
+def _gama(alfa):
+    return (1 + alfa) / (1 - alfa)
+
+
+def baldes(valores, alfa=ALFA_PADRAO):
+    """Balde de cada valor (sem NaN, não negativo)"""
+    valores = np.asarray(valores, dtype=np.float64)
+    if (valores < 0).any():
+        raise ValueError("o esboço de quantis só aceita valores não negativos")
+    resultado = np.full(len(valores), BALDE_ZERO, dtype=np.int64)
+    positivos = valores > 0
+    resultado[positivos] = np.ceil(np.log(valores[positivos]) / np.log(_gama(alfa))).astype(np.int64)
+    return resultado
+
+
+def esbocar(valores, alfa=ALFA_PADRAO, max_baldes=MAX_BALDES):
+    """Esboço (Series balde -> contagem) de valores não negativos; NaN é ignorado"""
+    valores = np.asarray(valores, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    return limitar(pd.Series(baldes(valores, alfa)).value_counts(sort=False), max_baldes)
+
+
+def limitar(esboco, max_baldes=MAX_BALDES):
+    """Funde os baldes mais baixos no menor balde mantido até sobrarem max_baldes"""
+    esboco = esboco[esboco > 0].sort_index()
+    positivos = np.flatnonzero(esboco.index != BALDE_ZERO)
+    if len(positivos) <= max_baldes:
+        return esboco
+    fundidos = esboco.index[positivos[:len(positivos) - max_baldes]]
+    destino = esboco.index[positivos[len(positivos) - max_baldes]]
+    massa = esboco[fundidos].sum()
+    esboco = esboco.drop(fundidos)
+    esboco[destino] += massa
+    return esboco
+
+
+def combinar_esbocos(a, b, max_baldes=MAX_BALDES):
+    return limitar(a.add(b, fill_value=0).astype(np.int64), max_baldes)
+
+
+def quantis(esboco, qs, alfa=ALFA_PADRAO):
+    """Quantis qs (entre 0 e 1) estimados pelo esboço, com erro relativo <= alfa"""
+    esboco = esboco[esboco > 0].sort_index()
+    acumulado = np.cumsum(esboco.to_numpy(dtype=np.int64))
+    n = acumulado[-1]
+    gama = _gama(alfa)
+    baldes = esboco.index.to_numpy(dtype=np.int64)
+    estimativas = np.where(baldes == BALDE_ZERO, 0.0,
+                           2 * np.power(gama, np.where(baldes == BALDE_ZERO, 0, baldes)) / (gama + 1))
+    posicao = np.floor(np.asarray(qs, dtype=np.float64) * (n - 1))
+    return estimativas[np.searchsorted(acumulado, posicao, side='right')]
+
+
+def momentos(valores):
+    """Contagem, soma e soma dos quadrados dos desvios à média (M2); NaN é ignorado"""
+    valores = np.asarray(valores, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    soma = valores.sum()
+    media = soma / len(valores) if len(valores) else 0.0
+    return pd.Series({'n': float(len(valores)), 'soma': soma, 'm2': np.square(valores - media).sum()})
+
+
+def combinar_momentos(n, soma, m2):
+    """
+    Momentos do conjunto a partir dos (n, soma, M2) de cada parte, pela
+    fórmula paralela de Chan et al. estendida a k partes:
+    M2 = soma(M2_i) + soma(n_i * (media_i - media)^2). Ao contrário de
+    soma_quad / n - media^2, não há cancelamento com valores grandes (bytes,
+    timestamps em ns). A soma é guardada no lugar da média porque com valores
+    inteiros (os tamanhos) ela é exata, e a média sai igual à do conjunto
+    inteiro em qualquer divisão em partes.
+    """
+    n, soma, m2 = (np.asarray(v, dtype=np.float64) for v in (n, soma, m2))
+    total = n.sum()
+    if total == 0:
+        return momentos([])
+    cheias = n > 0
+    media = soma.sum() / total
+    desvios = soma[cheias] / n[cheias] - media
+    return pd.Series({'n': total, 'soma': soma.sum(), 'm2': m2.sum() + (n[cheias] * np.square(desvios)).sum()})
+
+
+def resumir(esboco, momentos_, minimo, maximo, alfa=ALFA_PADRAO, chave_total='total'):
+    """
+    Dict de estatísticas descritivas (mesmas chaves do antigo
+    calcular_distribuicao_tamanhos) a partir do esboço, dos momentos e dos
+    extremos exatos. Os quantis são limitados a [minimo, maximo].
+    """
+    n = int(momentos_['n']) if len(momentos_) else 0
+    if n == 0:
+        return {}
+    media = momentos_['soma'] / n
+    variancia = momentos_['m2'] / n
+    mediana, *percentis = np.clip(quantis(esboco, (0.5,) + tuple(p / 100 for p in PERCENTIS), alfa),
+                                  minimo, maximo)
+    resumo = {
+        'min': float(minimo),
+        'max': float(maximo),
+        'media': float(media),
+        'mediana': float(mediana),
+        'desvio_padrao': float(np.sqrt(variancia)),
+    }
+    resumo.update({f'percentil_{p}': float(v) for p, v in zip(PERCENTIS, percentis)})
+    resumo[chave_total] = n
+    return resumo
+
+
+def distribuicao(valores, alfa=ALFA_PADRAO, chave_total='total'):
+    """Atalho: esboço + momentos + extremos de um array e o resumo deles"""
+    valores = np.asarray(valores, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    if not len(valores):
+        return {}
+    return resumir(esbocar(valores, alfa), momentos(valores), valores.min(), valores.max(), alfa, chave_total)
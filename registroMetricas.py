@@ -0,0 +1,103 @@
+from perfil import PERFIL_DESLIGADO
+
+# Registro das métricas da análise em memória. Cada métrica declara as seções
+# do stats que produz, as colunas do data.csv que lê e as dependências
+# (passos compartilhados como o chaveamento de fluxos, as flags ou o detector
+# de retransmissões). Pedir só algumas métricas (python dataProcessing.py
+# --metricas rtt,top_portas) carrega só as colunas necessárias e roda só os
+# passos que elas usam, cada dependência uma única vez, guardada no Contexto.
+# As métricas e dependências são registradas com os decoradores abaixo (ver
+# dataProcessing.py); a função recebe o Contexto e devolve o valor da
+# dependência ou o dict {seção: valor} da métrica.
+
+# Colunas sempre lidas: o tempo e o protocolo (o filtro de TCP)
+COLUNAS_BASE = ('timestamp_ns', 'protocol')
+# Dependência com a tabela de fluxos: as etapas do perfil que usam ela
+# registram também o número de fluxos
+TABELA_FLUXOS = 'tabela_fluxos'
+
+DEPENDENCIAS = {}
+METRICAS = {}
+
+
+def dependencia(nome, colunas=(), depende=()):
+    def registrar(funcao):
+        DEPENDENCIAS[nome] = {'funcao': funcao, 'colunas': tuple(colunas), 'depende': tuple(depende)}
+        return funcao
+    return registrar
+
+
+def metrica(nome, secoes, colunas=(), depende=()):
+    def registrar(funcao):
+        METRICAS[nome] = {'funcao': funcao, 'secoes': tuple(secoes), 'colunas': tuple(colunas),
+                          'depende': tuple(depende)}
+        return funcao
+    return registrar
+
+
+def _colunas(item, vistos):
+    colunas = set(item['colunas'])
+    for nome in item['depende']:
+        if nome not in vistos:
+            vistos.add(nome)
+            colunas |= _colunas(DEPENDENCIAS[nome], vistos)
+    return colunas
+
+
+def _usa_fluxos(item):
+    return any(nome == TABELA_FLUXOS or _usa_fluxos(DEPENDENCIAS[nome]) for nome in item['depende'])
+
+
+def resolver(nomes=None):
+    """
+    Métricas pedidas (todas quando `nomes` é None), na ordem do registro, e o
+    conjunto de colunas que elas leem, incluindo as das dependências.
+    """
+    if nomes is None:
+        nomes = list(METRICAS)
+    desconhecidas = [nome for nome in nomes if nome not in METRICAS]
+    if desconhecidas:
+        raise ValueError(f"métrica(s) desconhecida(s): {', '.join(desconhecidas)}; "
+                         f"disponíveis: {', '.join(METRICAS)}")
+    pedidas = [nome for nome in METRICAS if nome in nomes]
+    colunas = set(COLUNAS_BASE)
+    for nome in pedidas:
+        colunas |= _colunas(METRICAS[nome], set())
+    return pedidas, colunas
+
+
+class Contexto(dict):
+    """
+    Valores compartilhados da análise: 'pacotes' (o DataFrame), as opções e as
+    dependências já calculadas. obter() calcula a dependência (e as dela) na
+    primeira vez e devolve o valor guardado nas seguintes.
+    """
+
+    def __init__(self, perfil=PERFIL_DESLIGADO, **valores):
+        super().__init__(valores)
+        self.perfil = perfil
+
+    def obter(self, nome):
+        if nome not in self:
+            dependencia_ = DEPENDENCIAS[nome]
+            for anterior in dependencia_['depende']:
+                self.obter(anterior)
+            with self.perfil.etapa(nome, linhas=len(self['pacotes'])) as registro:
+                self[nome] = dependencia_['funcao'](self)
+                if nome == TABELA_FLUXOS or _usa_fluxos(dependencia_):
+                    registro['fluxos'] = len(self[TABELA_FLUXOS])
+        return self[nome]
+
+
+def calcular(nomes, contexto):
+    """Roda as métricas `nomes` (já resolvidas) e junta as seções produzidas"""
+    stats = {}
+    for nome in nomes:
+        metrica_ = METRICAS[nome]
+        for anterior in metrica_['depende']:
+            contexto.obter(anterior)
+        with contexto.perfil.etapa(nome, linhas=len(contexto['pacotes'])) as registro:
+            stats.update(metrica_['funcao'](contexto))
+            if _usa_fluxos(metrica_):
+                registro['fluxos'] = len(contexto[TABELA_FLUXOS])
+    return stats
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Detector de retransmissões no espaço de sequência, por fluxo e por sentido.
+# Cada segmento que ocupa espaço de sequência (payload > 0, SYN ou FIN) é
+# comparado com o maior fim de sequência já enviado naquele sentido:
+#   - começa no maior fim já visto ou depois dele -> novo
+#   - começa antes e chega até LIMIAR_FORA_DE_ORDEM_NS depois do segmento que
+#     levou a sequência ao máximo -> fora de ordem (reordenação na rede)
+#   - começa antes e chega mais tarde -> retransmissão
+# ACKs puros não ocupam sequência e não são classificados.
+
+NAO_SEGMENTO = -1
+NOVO = 0
+RETRANSMISSAO = 1
+FORA_DE_ORDEM = 2
+
+LIMIAR_FORA_DE_ORDEM_NS = 3_000_000   # 3 ms, mesmo critério do Wireshark
+
+_MODULO_SEQ = 1 << 32
+
+
+def _sem_sinal_32(valores):
+    return np.asarray(valores, dtype=np.int64) % _MODULO_SEQ
+
+
+def classificar_segmentos(direcao, timestamp_ns, seq, tamanho, flags_syn, flags_fin,
+                          limiar_ns=LIMIAR_FORA_DE_ORDEM_NS, estado=None):
+    """
+    Classifica cada pacote como NOVO, RETRANSMISSAO, FORA_DE_ORDEM ou
+    NAO_SEGMENTO em uma passada linear: ordenação por (direcao, tempo),
+    desdobramento da sequência de 32 bits e máximo acumulado segmentado.
+
+    `direcao` é uma chave inteira por fluxo e sentido. `estado` (opcional) é o
+    DataFrame devolvido por uma chamada anterior, indexado pela mesma chave,
+    com o maior fim de sequência ('seq_fim') e o instante em que ele foi
+    atingido ('t_seq_fim'); isso permite processar a captura em blocos.
+
+    Retorna (classes, novo_estado).
+    """
+    direcao = np.asarray(direcao, dtype=np.int64)
+    timestamp_ns = np.asarray(timestamp_ns, dtype=np.int64)
+    ocupa = (np.nan_to_num(np.asarray(tamanho, dtype=np.float64)).astype(np.int64)
+             + np.asarray(flags_syn, dtype=np.int64) + np.asarray(flags_fin, dtype=np.int64))
+    classes = np.full(len(direcao), NAO_SEGMENTO, dtype=np.int8)
+
+    linhas = np.flatnonzero(ocupa > 0)
+    chave = direcao[linhas]
+    tempo = timestamp_ns[linhas]
+    inicio_seq = _sem_sinal_32(np.nan_to_num(np.asarray(seq, dtype=np.float64)[linhas]))
+    ocupa = ocupa[linhas]
+    real = np.ones(len(linhas), dtype=bool)
+
+    # O estado anterior entra como um segmento sintético de tamanho zero que
+    # termina no maior fim já visto, ordenado antes dos pacotes reais
+    if estado is not None and len(estado):
+        n_estado = len(estado)
+        chave = np.concatenate([estado.index.to_numpy(dtype=np.int64), chave])
+        tempo = np.concatenate([estado['t_seq_fim'].to_numpy(dtype=np.int64), tempo])
+        inicio_seq = np.concatenate([_sem_sinal_32(estado['seq_fim'].to_numpy()), inicio_seq])
+        ocupa = np.concatenate([np.zeros(n_estado, dtype=np.int64), ocupa])
+        real = np.concatenate([np.zeros(n_estado, dtype=bool), real])
+        linhas = np.concatenate([np.full(n_estado, -1, dtype=np.int64), linhas])
+
+    ordem = np.lexsort((tempo, real, chave))
+    chave, tempo, inicio_seq, ocupa, real, linhas = (
+        chave[ordem], tempo[ordem], inicio_seq[ordem], ocupa[ordem], real[ordem], linhas[ordem])
+
+    n = len(chave)
+    primeiro = np.ones(n, dtype=bool)
+    primeiro[1:] = chave[1:] != chave[:-1]
+    segmento_id = np.cumsum(primeiro) - 1
+
+    # Desdobra a sequência: cada passo é interpretado como um inteiro de 32 bits
+    # com sinal, então a volta do contador (wraparound) não quebra a ordem
+    passo = np.zeros(n, dtype=np.int64)
+    passo[1:] = (inicio_seq[1:] - inicio_seq[:-1] + (1 << 31)) % _MODULO_SEQ - (1 << 31)
+    passo[primeiro] = 0
+    acumulado = np.cumsum(passo)
+    relativo = acumulado - acumulado[np.flatnonzero(primeiro)][segmento_id]
+    fim = relativo + ocupa
+
+    maximo = pd.Series(fim).groupby(segmento_id).cummax().to_numpy()
+    maximo_anterior = np.empty(n, dtype=np.int64)
+    maximo_anterior[1:] = maximo[:-1]
+
+    # Instante do pacote que levou o máximo ao valor atual
+    subiu = primeiro.copy()
+    subiu[1:] |= fim[1:] > maximo[:-1]
+    ultimo_que_subiu = np.maximum.accumulate(np.where(subiu, np.arange(n), 0)) if n else np.empty(0, dtype=np.int64)
+    tempo_maximo_anterior = np.empty(n, dtype=np.int64)
+    tempo_maximo_anterior[1:] = tempo[ultimo_que_subiu[:-1]]
+
+    classe = np.full(n, NOVO, dtype=np.int8)
+    abaixo = ~primeiro & (relativo < maximo_anterior)
+    classe[abaixo] = np.where(tempo[abaixo] - tempo_maximo_anterior[abaixo] < limiar_ns,
+                              FORA_DE_ORDEM, RETRANSMISSAO)
+    classes[linhas[real]] = classe[real]
+
+    ultimo = np.append(np.flatnonzero(primeiro)[1:] - 1, n - 1) if n else np.empty(0, dtype=np.int64)
+    base = inicio_seq[np.flatnonzero(primeiro)]
+    novo_estado = pd.DataFrame({
+        'seq_fim': (base + maximo[ultimo]) % _MODULO_SEQ,
+        't_seq_fim': tempo[ultimo_que_subiu[ultimo]],
+    }, index=pd.Index(chave[ultimo], name='direcao'))
+    return classes, novo_estado
+
+
+def taxas_retransmissao(df, chave):
+    """Retransmissões sobre segmentos com sequência, agrupadas por `chave`"""
+    segmentos = (df['classe_segmento'] != NAO_SEGMENTO).groupby(df[chave]).sum()
+    retransmitidos = (df['classe_segmento'] == RETRANSMISSAO).groupby(df[chave]).sum()
+    segmentos = segmentos[segmentos > 0]
+    return retransmitidos.reindex(segmentos.index) / segmentos
@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import json
+import os
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from anexos import carregar_estatisticas, eh_referencia, timestamps_para_texto
+from dataProcessing import carregar_em_blocos, preparar_pacotes, eh_pcap
+from handshake import extrair_handshakes, tempos_handshake
+from quantis import ALFA_PADRAO, baldes, limitar, combinar_momentos, resumir
+from tempo import NS_POR_MINUTO, NS_POR_SEGUNDO, piso, para_datas
+
+# Serviço HTTP/JSON local (asyncio) sobre o resultado da análise, para a GUI e
+# dashboards consultarem as métricas sem ler os PNGs. O stats_completo.json é
+# carregado uma única vez (as seções anexas .npz só quando pedidas, ver
+# anexos.py) e recarregado em segundo plano quando o arquivo muda; as
+# requisições nunca esperam pela leitura do json.
+#
+# Consultas por intervalo de tempo usam um índice pré-calculado por minuto
+# (indice_metricas.npz, gerado com "python servicoMetricas.py indexar"):
+#   - pacotes por (minuto, porta de destino)
+#   - esboço de quantis do RTT do handshake por minuto do SYN (quantis.py),
+#     com contagem, soma, M2 (soma dos quadrados dos desvios), mínimo e máximo
+# Responder a um intervalo [inicio, fim) é juntar as linhas dos minutos dentro
+# dele, sem tocar nos pacotes. Rotas (todas GET, resposta em json):
+#   /secoes                                  seções disponíveis no stats
+#   /secao?nome=rtt_por_conexao              uma seção inteira do stats
+#   /top_portas?inicio=..&fim=..&n=10        portas de destino com mais pacotes
+#   /rtt?inicio=..&fim=..                    percentis do RTT do handshake
+#   /trafego?inicio=..&fim=..                bytes por minuto (trafego_por_minuto)
+#   /janela?conexao=<rótulo>&inicio=..&fim=..  série da janela de uma conexão
+# inicio e fim aceitam segundos desde a época ou data ISO ("2025-01-11 02:53");
+# a granularidade é o minuto (o minuto que contém `inicio` entra).
+
+ARQUIVO_INDICE = "indice_metricas.npz"
+ARQUIVO_STATS = "stats_completo.json"
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+TOP_PADRAO = 10
+RECARREGAR_PADRAO = 5.0
+LIMITE_LINHA = 8192
+
+_STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+class ErroConsulta(Exception):
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+# --------------------------------------------------------------- índice
+
+def indexar_bloco(df, rotulos):
+    """Pacotes por (minuto, porta de destino) e handshakes por rótulo de um bloco já preparado"""
+    minuto = piso(df['timestamp_ns'].to_numpy(dtype=np.int64), NS_POR_MINUTO)
+    portas = pd.DataFrame({'minuto': minuto, 'porta': df['dst_port'].to_numpy()}).dropna()
+    portas = portas.astype(np.int64).groupby(['minuto', 'porta']).size()
+    handshakes = extrair_handshakes(df)
+    handshakes.index = rotulos[handshakes.index.to_numpy()]
+    return portas, handshakes
+
+
+def construir_indice(entrada, tamanho_bloco=1_000_000, alfa=ALFA_PADRAO):
+    """
+    Lê a entrada em blocos e devolve os arrays do indice_metricas.npz. Os
+    handshakes são mesclados entre blocos pelo rótulo da conexão (primeiro
+    SYN/SYN-ACK/ACK = mínimo), como no modo em blocos da análise.
+    """
+    portas, handshakes = None, None
+    for bloco in carregar_em_blocos(entrada, tamanho_bloco):
+        df, rotulos = preparar_pacotes(bloco)
+        p, h = indexar_bloco(df, rotulos)
+        portas = p if portas is None else portas.add(p, fill_value=0).astype(np.int64)
+        handshakes = h if handshakes is None else pd.concat([handshakes, h]).groupby(level=0).min()
+    if portas is None:
+        raise ValueError("entrada sem pacotes TCP")
+
+    rtt, _ = tempos_handshake(handshakes)
+    valores = rtt.to_numpy(dtype=np.float64)
+    minuto_rtt = piso(handshakes.loc[rtt.index, 'syn'].to_numpy(dtype=np.int64), NS_POR_MINUTO)
+    esbocos = pd.DataFrame({'minuto': minuto_rtt, 'balde': baldes(valores, alfa)}).groupby(['minuto', 'balde']).size()
+    por_minuto = pd.Series(valores).groupby(minuto_rtt)
+    desvio = valores - por_minuto.transform('mean').to_numpy()
+    extremos = pd.DataFrame({'minuto': minuto_rtt, 'rtt': valores, 'quad': np.square(desvio)}).groupby('minuto').agg(
+        n=('rtt', 'size'), soma=('rtt', 'sum'), m2=('quad', 'sum'), minimo=('rtt', 'min'), maximo=('rtt', 'max'))
+
+    # Índices ordenados por minuto: as consultas recortam com searchsorted
+    return {
+        'alfa': np.float64(alfa),
+        'portas_minuto': portas.index.get_level_values(0).to_numpy(dtype=np.int64),
+        'portas_porta': portas.index.get_level_values(1).to_numpy(dtype=np.int64),
+        'portas_contagem': portas.to_numpy(dtype=np.int64),
+        'rtt_minuto': esbocos.index.get_level_values(0).to_numpy(dtype=np.int64),
+        'rtt_balde': esbocos.index.get_level_values(1).to_numpy(dtype=np.int64),
+        'rtt_contagem': esbocos.to_numpy(dtype=np.int64),
+        'momentos_minuto': extremos.index.to_numpy(dtype=np.int64),
+        **{f'momentos_{coluna}': extremos[coluna].to_numpy(dtype=np.float64) for coluna in extremos.columns},
+    }
+
+
+def salvar_indice(indice, caminho=ARQUIVO_INDICE):
+    temporario = caminho + ".tmp.npz"
+    np.savez(temporario, **indice)
+    os.replace(temporario, caminho)
+
+
+# --------------------------------------------------------------- consultas
+
+def _instante(texto, padrao):
+    """Parâmetro de tempo (segundos desde a época ou data ISO) -> ns"""
+    if texto is None:
+        return padrao
+    try:
+        ns = float(texto) * NS_POR_SEGUNDO
+    except ValueError:
+        ns = None
+    if ns is not None:
+        # nan, inf e valores fora do int64 dos timestamps
+        if not -2**63 <= ns < 2**63:
+            raise ErroConsulta(f"instante inválido: {texto}")
+        return int(ns)
+    try:
+        instante = pd.Timestamp(texto)
+    except ValueError:
+        raise ErroConsulta(f"instante inválido: {texto}")
+    if instante is pd.NaT:
+        raise ErroConsulta(f"instante inválido: {texto}")
+    return instante.value
+
+
+def _positivo(texto, padrao):
+    """Parâmetro inteiro >= 1 (o n do top N)"""
+    if texto is None:
+        return padrao
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise ErroConsulta(f"inteiro inválido: {texto}")
+    if valor <= 0:
+        raise ErroConsulta(f"n deve ser positivo: {texto}")
+    return valor
+
+
+def _intervalo(parametros):
+    inicio = _instante(parametros.get('inicio'), np.iinfo(np.int64).min + NS_POR_MINUTO)
+    fim = _instante(parametros.get('fim'), np.iinfo(np.int64).max)
+    return piso(inicio, NS_POR_MINUTO), fim
+
+
+def _recorte(minutos, inicio, fim):
+    """Fatia das linhas (ordenadas por minuto) com inicio <= minuto < fim"""
+    return slice(np.searchsorted(minutos, inicio, side='left'), np.searchsorted(minutos, fim, side='left'))
+
+
+class Metricas:
+    """Estado imutável consultado pelo serviço: stats (com anexos sob demanda) e índice"""
+
+    def __init__(self, caminho_stats, caminho_indice):
+        self.stats = carregar_estatisticas(caminho_stats) if os.path.exists(caminho_stats) else {}
+        self.indice = None
+        if os.path.exists(caminho_indice):
+            with np.load(caminho_indice) as arrays:
+                # Índice de uma versão anterior (soma dos quadrados em vez de M2): precisa ser gerado de novo
+                if 'momentos_m2' in arrays.files:
+                    self.indice = {nome: arrays[nome] for nome in arrays.files}
+        trafego = dict.get(self.stats, 'trafego_por_minuto') or {}
+        self.trafego_minuto = pd.to_datetime(list(trafego.keys())).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        self.trafego_bytes = np.array(list(trafego.values()), dtype=np.float64)
+        ordem = np.argsort(self.trafego_minuto, kind='stable')
+        self.trafego_minuto, self.trafego_bytes = self.trafego_minuto[ordem], self.trafego_bytes[ordem]
+        self._janelas = None
+
+    def _exigir_indice(self):
+        if self.indice is None:
+            raise ErroConsulta(f"índice não encontrado; gere com: python servicoMetricas.py indexar <entrada>", 404)
+        return self.indice
+
+    def secoes(self, parametros):
+        return sorted(self.stats)
+
+    def secao(self, parametros):
+        nome = parametros.get('nome')
+        if nome not in self.stats:
+            raise ErroConsulta(f"seção inexistente: {nome}", 404)
+        return self.stats[nome]
+
+    def top_portas(self, parametros):
+        indice = self._exigir_indice()
+        inicio, fim = _intervalo(parametros)
+        fatia = _recorte(indice['portas_minuto'], inicio, fim)
+        contagem = pd.Series(indice['portas_contagem'][fatia]).groupby(indice['portas_porta'][fatia]).sum()
+        contagem = contagem.sort_values(ascending=False, kind='stable').head(_positivo(parametros.get('n'), TOP_PADRAO))
+        return {'portas': {str(porta): int(n) for porta, n in contagem.items()},
+                'total_pacotes': int(indice['portas_contagem'][fatia].sum())}
+
+    def rtt(self, parametros):
+        indice = self._exigir_indice()
+        inicio, fim = _intervalo(parametros)
+        fatia = _recorte(indice['rtt_minuto'], inicio, fim)
+        esboco = limitar(pd.Series(indice['rtt_contagem'][fatia]).groupby(indice['rtt_balde'][fatia]).sum())
+        fatia = _recorte(indice['momentos_minuto'], inicio, fim)
+        if fatia.stop == fatia.start:
+            return {}
+        momentos_ = combinar_momentos(*(indice[f'momentos_{nome}'][fatia] for nome in ('n', 'soma', 'm2')))
+        return resumir(esboco, momentos_, indice['momentos_minimo'][fatia].min(),
+                       indice['momentos_maximo'][fatia].max(), float(indice['alfa']), 'total_conexoes')
+
+    def trafego(self, parametros):
+        inicio, fim = _intervalo(parametros)
+        fatia = _recorte(self.trafego_minuto, inicio, fim)
+        minutos = para_datas(self.trafego_minuto[fatia]).astype(str)
+        return dict(zip(minutos, self.trafego_bytes[fatia].tolist()))
+
+    def janela(self, parametros):
+        conexao = parametros.get('conexao')
+        if conexao is None:
+            raise ErroConsulta("parâmetro conexao é obrigatório")
+        referencia = dict.get(self.stats, 'janela_congestionamento')
+        if referencia is None:
+            raise ErroConsulta("stats sem janela_congestionamento", 404)
+        if not eh_referencia(referencia):
+            # json gerado com --embutir: a seção já está em memória
+            if conexao not in referencia:
+                raise ErroConsulta(f"conexão inexistente: {conexao}", 404)
+            pontos = referencia[conexao]
+            ns = pd.to_datetime([t for t, _ in pontos]).to_numpy(dtype='datetime64[ns]').view(np.int64)
+            inicio, fim = _intervalo(parametros)
+            return [p for p, t in zip(pontos, ns) if inicio <= t < fim]
+
+        if self._janelas is None:
+            # Só os arrays do anexo; o texto é gerado para a conexão pedida
+            with np.load(os.path.join(self.stats.pasta, referencia['anexo'])) as arrays:
+                janelas = {nome: arrays[nome] for nome in arrays.files}
+            janelas['posicao'] = {rotulo: i for i, rotulo in enumerate(janelas['rotulos'].tolist())}
+            self._janelas = janelas
+        janelas = self._janelas
+        if conexao not in janelas['posicao']:
+            raise ErroConsulta(f"conexão inexistente: {conexao}", 404)
+        i = janelas['posicao'][conexao]
+        a, b = janelas['limites'][i], janelas['limites'][i + 1]
+        ns, valores = janelas['timestamp_ns'][a:b], janelas['valores'][a:b]
+        inicio, fim = _intervalo(parametros)
+        dentro = (ns >= inicio) & (ns < fim)
+        texto = timestamps_para_texto(ns[dentro], np.full(dentro.sum(), janelas['nivel'][i], dtype=np.int8))
+        return [list(p) for p in zip(texto.tolist(), valores[dentro].tolist())]
+
+
+ROTAS = {
+    '/secoes': Metricas.secoes,
+    '/secao': Metricas.secao,
+    '/top_portas': Metricas.top_portas,
+    '/rtt': Metricas.rtt,
+    '/trafego': Metricas.trafego,
+    '/janela': Metricas.janela,
+}
+
+
+# --------------------------------------------------------------- servidor
+
+class ServicoMetricas:
+    """
+    Servidor HTTP/1.1 mínimo (GET, keep-alive) em TCP local ou socket unix.
+    Cada consulta roda no pool de threads do loop, então um recorte grande não
+    trava as outras conexões; a troca do estado recarregado é uma atribuição.
+    """
+
+    def __init__(self, caminho_stats=ARQUIVO_STATS, caminho_indice=ARQUIVO_INDICE, recarregar=RECARREGAR_PADRAO):
+        self.caminhos = (caminho_stats, caminho_indice)
+        self.recarregar = recarregar
+        self.versao = self._versao()
+        self.metricas = Metricas(*self.caminhos)
+
+    def _versao(self):
+        return tuple(os.stat(c).st_mtime_ns if os.path.exists(c) else None for c in self.caminhos)
+
+    async def vigiar(self):
+        """Recarrega stats e índice quando um deles muda no disco"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.recarregar)
+            versao = self._versao()
+            if versao != self.versao:
+                try:
+                    self.metricas = await loop.run_in_executor(None, Metricas, *self.caminhos)
+                    self.versao = versao
+                    print(f"[+] {', '.join(self.caminhos)} recarregados")
+                except (OSError, ValueError) as erro:
+                    # arquivo no meio da gravação: tenta de novo na próxima volta
+                    print(f"[!] falha ao recarregar: {erro}")
+
+    def responder(self, metodo, alvo):
+        if metodo != 'GET':
+            return 405, {'erro': f"método não suportado: {metodo}"}
+        partes = urlsplit(alvo)
+        rota = ROTAS.get(partes.path.rstrip('/') or '/')
+        if rota is None:
+            return 404, {'erro': f"rota inexistente: {partes.path}", 'rotas': sorted(ROTAS)}
+        parametros = {nome: valores[-1] for nome, valores in parse_qs(partes.query).items()}
+        try:
+            return 200, rota(self.metricas, parametros)
+        except ErroConsulta as erro:
+            return erro.status, {'erro': str(erro)}
+        except Exception as erro:
+            # Falha inesperada numa consulta não derruba a conexão
+            return 500, {'erro': f"{type(erro).__name__}: {erro}"}
+
+    async def atender(self, leitor, escritor):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode('latin-1').split()
+                except ValueError:
+                    break
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = linha.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip().lower()
+                status, resposta = await loop.run_in_executor(None, self.responder, metodo, alvo)
+                corpo = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+                manter = versao == 'HTTP/1.1' and cabecalhos.get('connection') != 'close'
+                escritor.write(
+                    f"HTTP/1.1 {status} {_STATUS[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(corpo)}\r\n"
+                    f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode('latin-1') + corpo)
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.LimitOverrunError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self, host=HOST_PADRAO, porta=PORTA_PADRAO, socket_unix=None):
+        if socket_unix:
+            if os.path.exists(socket_unix):
+                os.remove(socket_unix)
+            servidor = await asyncio.start_unix_server(self.atender, socket_unix, limit=LIMITE_LINHA)
+            print(f"[+] servindo em {socket_unix}")
+        else:
+            servidor = await asyncio.start_server(self.atender, host, porta, limit=LIMITE_LINHA)
+            print(f"[+] servindo em http://{host}:{porta}")
+        vigia = asyncio.create_task(self.vigiar())
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            vigia.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON local sobre as estatísticas da análise")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    indexar = comandos.add_parser("indexar", help="gera o índice por minuto usado nas consultas por intervalo")
+    indexar.add_argument("entrada", nargs="+", help="data.csv, diretório .colunas ou arquivo(s) .pcap")
+    indexar.add_argument("--blocos", type=int, default=1_000_000, metavar="N", help="pacotes lidos por vez")
+    indexar.add_argument("--saida", default=ARQUIVO_INDICE)
+
+    servir = comandos.add_parser("servir", help="sobe o serviço")
+    servir.add_argument("--stats", default=ARQUIVO_STATS)
+    servir.add_argument("--indice", default=ARQUIVO_INDICE)
+    servir.add_argument("--host", default=HOST_PADRAO)
+    servir.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    servir.add_argument("--socket", metavar="CAMINHO", help="escuta em um socket unix em vez de TCP")
+    servir.add_argument("--recarregar", type=float, default=RECARREGAR_PADRAO, metavar="S",
+                        help="intervalo de verificação de mudanças nos arquivos")
+    args = parser.parse_args()
+
+    if args.comando == "indexar":
+        entrada = args.entrada
+        if len(entrada) == 1 and not eh_pcap(entrada[0]):
+            entrada = entrada[0]
+        salvar_indice(construir_indice(entrada, args.blocos), args.saida)
+        print(f"[+] índice salvo em {args.saida}")
+    else:
+        servico = ServicoMetricas(args.stats, args.indice, args.recarregar)
+        try:
+            asyncio.run(servico.servir(args.host, args.porta, args.socket))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,401 @@
+import numpy as np
+import pandas as pd
+
+from fluxos import rotulos_inteiros
+from leitorPcap import FLAGS_TCP
+from retransmissoes import classificar_segmentos, NAO_SEGMENTO, RETRANSMISSAO
+from handshake import tempos_handshake
+from quantis import distribuicao
+from tempo import em_segundos
+
+# Tabela de fluxos em arrays: cada fluxo (chave canônica do par de IPs e do par
+# de portas, a mesma do fluxos.chavear_fluxos) ocupa uma posição em arrays
+# NumPy paralelos, e a posição de cada chave é achada por endereçamento aberto
+# (sondagem linear) em uma tabela de espalhamento que também é um array.
+# Os pacotes entram em blocos (atualizar) de forma vetorizada: as chaves
+# distintas do bloco são sondadas juntas e os acumuladores são atualizados com
+# bincount e minimum/maximum.at, sem agrupar o DataFrame inteiro por métrica.
+# Por fluxo e sentido: pacotes, bytes, maior fim de sequência (o estado do
+# detector de retransmissões, o que permite blocos), segmentos e
+# retransmissões; por fluxo: primeiro/último pacote, primeiro SYN, SYN-ACK e
+# ACK puro, menor MSS e a contagem de cada flag. Assim uma passada alimenta
+# duração, throughput, RTT, estabelecimento, MSS, elefantes e retransmissões
+# por conexão (secoes()). Sentido 0 é o do extremo (IP, porta) menor.
+# length, flags, mss e seq/segmento_tcp_len são opcionais: cada acumulador só
+# é atualizado quando as colunas dele estão no bloco. Fluxos parados podem
+# ser expirados (análise ao vivo): a entrada do espalhamento vira "removida",
+# que a busca atravessa e a inserção reaproveita, e a posição volta a ser usada.
+
+CAPACIDADE_INICIAL = 1 << 12
+_SEM_TEMPO = np.iinfo(np.int64).max
+_SEM_MSS = np.iinfo(np.int64).max
+_VAZIO = -1
+_REMOVIDA = -2
+_BITS = dict(FLAGS_TCP)
+
+# Arrays por posição: nome -> (tipo, colunas (None = 1 dimensão), valor inicial)
+CAMPOS = {
+    'ip_menor': (np.uint32, None, 0),
+    'ip_maior': (np.uint32, None, 0),
+    'portas': (np.uint32, None, 0),
+    'incompleto': (bool, None, False),
+    'ativo': (bool, None, False),
+    'primeiro_ns': (np.int64, None, _SEM_TEMPO),
+    'ultimo_ns': (np.int64, None, np.iinfo(np.int64).min),
+    'pacotes': (np.int64, 2, 0),
+    'bytes': (np.float64, 2, 0.0),
+    'syn_ns': (np.int64, None, _SEM_TEMPO),
+    'synack_ns': (np.int64, None, _SEM_TEMPO),
+    'ack_ns': (np.int64, None, _SEM_TEMPO),
+    'mss': (np.int64, None, _SEM_MSS),
+    'flags': (np.int64, len(FLAGS_TCP), 0),
+    # estado do detector de retransmissões e contagens, por sentido
+    'seq_fim': (np.int64, 2, 0),
+    't_seq_fim': (np.int64, 2, 0),
+    'tem_estado': (bool, 2, False),
+    'segmentos': (np.int64, 2, 0),
+    'retransmissoes': (np.int64, 2, 0),
+}
+
+
+def _espalhamento(ip_menor, ip_maior, portas):
+    """Mistura das três partes da chave em 64 bits (multiplicações com estouro)"""
+    h = (ip_menor.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+         ^ ip_maior.astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+         ^ portas.astype(np.uint64) * np.uint64(0x165667B19E3779F9))
+    return h ^ (h >> np.uint64(29))
+
+
+class TabelaFluxos:
+    """
+    Fluxos -> posições em arrays paralelos (ver o comentário do módulo).
+    expirar() tira da tabela os fluxos parados e as posições deles voltam a
+    ser usadas (a análise ao vivo usa isso; a análise em memória não expira).
+    Subclasses acrescentam arrays estendendo CAMPOS.
+    """
+
+    CAMPOS = CAMPOS
+
+    def __init__(self, capacidade=CAPACIDADE_INICIAL):
+        self.tamanho = 0        # posições já usadas alguma vez
+        self.livres = []        # posições de fluxos expirados, reusadas da última para a primeira
+        self.removidas = 0      # entradas do espalhamento marcadas como removidas
+        self.acumulados = set()
+        self._por_fluxo = None
+        self._ordem = None
+        self._alocar(capacidade)
+
+    def _alocar(self, capacidade):
+        anteriores = getattr(self, 'arrays', {})
+        self.arrays = {nome: np.full(capacidade if largura is None else (capacidade, largura), inicial, dtype=tipo)
+                       for nome, (tipo, largura, inicial) in self.CAMPOS.items()}
+        for nome, valores in anteriores.items():
+            self.arrays[nome][:len(valores)] = valores
+        self.capacidade = capacidade
+        self._reespalhar()
+
+    def _reespalhar(self):
+        """Refaz o espalhamento (o dobro de entradas, carga <= 1/2) só com os fluxos ativos"""
+        self.entradas = np.full(2 * self.capacidade, _VAZIO, dtype=np.int64)
+        self.removidas = 0
+        self._inserir(np.flatnonzero(self.arrays['ativo'][:self.tamanho]))
+
+    def __len__(self):
+        return self.tamanho - len(self.livres)
+
+    def _inserir(self, posicoes):
+        """Coloca as posições (chaves já gravadas e ausentes da tabela) nas entradas livres"""
+        a = self.arrays
+        mascara = len(self.entradas) - 1
+        entrada = (_espalhamento(a['ip_menor'][posicoes], a['ip_maior'][posicoes], a['portas'][posicoes])
+                   & np.uint64(mascara)).astype(np.int64)
+        while len(posicoes):
+            livres = np.flatnonzero(self.entradas[entrada] < 0)
+            # Chaves que caíram na mesma entrada livre: só a primeira fica com ela
+            _, primeiras = np.unique(entrada[livres], return_index=True)
+            ocupam = livres[primeiras]
+            self.removidas -= int((self.entradas[entrada[ocupam]] == _REMOVIDA).sum())
+            self.entradas[entrada[ocupam]] = posicoes[ocupam]
+            resto = np.ones(len(posicoes), dtype=bool)
+            resto[ocupam] = False
+            posicoes, entrada = posicoes[resto], (entrada[resto] + 1) & mascara
+
+    def _procurar(self, ip_menor, ip_maior, portas):
+        """(posição, entrada do espalhamento) de cada chave distinta; -1 nas ausentes"""
+        a = self.arrays
+        posicao = np.full(len(ip_menor), _VAZIO, dtype=np.int64)
+        onde = np.full(len(ip_menor), _VAZIO, dtype=np.int64)
+        mascara = len(self.entradas) - 1
+        pendentes = np.arange(len(ip_menor))
+        entrada = (_espalhamento(ip_menor, ip_maior, portas) & np.uint64(mascara)).astype(np.int64)
+        while len(pendentes):
+            ocupante = self.entradas[entrada]
+            igual = ((ocupante >= 0) & (a['ip_menor'][ocupante] == ip_menor[pendentes])
+                     & (a['ip_maior'][ocupante] == ip_maior[pendentes]) & (a['portas'][ocupante] == portas[pendentes]))
+            posicao[pendentes[igual]] = ocupante[igual]
+            onde[pendentes[igual]] = entrada[igual]
+            # Uma entrada vazia encerra a busca (a chave não está na tabela);
+            # as removidas não, a chave pode ter sido gravada depois delas
+            seguir = (ocupante != _VAZIO) & ~igual
+            pendentes, entrada = pendentes[seguir], (entrada[seguir] + 1) & mascara
+        return posicao, onde
+
+    def posicionar(self, ip_menor, ip_maior, portas):
+        """Posição de cada chave distinta, criando as que não existem"""
+        saida, _ = self._procurar(ip_menor, ip_maior, portas)
+        novas = np.flatnonzero(saida == _VAZIO)
+        if len(novas):
+            reusadas = min(len(novas), len(self.livres))
+            if reusadas:
+                posicoes = self.livres[len(self.livres) - reusadas:][::-1]
+                del self.livres[len(self.livres) - reusadas:]
+            else:
+                posicoes = []
+            frescas = len(novas) - reusadas
+            if self.tamanho + frescas > self.capacidade:
+                capacidade = self.capacidade
+                while self.tamanho + frescas > capacidade:
+                    capacidade *= 2
+                self._alocar(capacidade)
+            posicoes = np.concatenate((np.array(posicoes, dtype=np.int64),
+                                       np.arange(self.tamanho, self.tamanho + frescas)))
+            self.tamanho += frescas
+            a = self.arrays
+            a['ip_menor'][posicoes] = ip_menor[novas]
+            a['ip_maior'][posicoes] = ip_maior[novas]
+            a['portas'][posicoes] = portas[novas]
+            a['ativo'][posicoes] = True
+            if len(self) + self.removidas > self.capacidade:
+                self._reespalhar()
+            else:
+                self._inserir(posicoes)
+            saida[novas] = posicoes
+            self._ordem = None
+        return saida
+
+    def expirar(self, limite_ns):
+        """Remove os fluxos sem pacotes desde `limite_ns`; devolve quantos saíram"""
+        a = self.arrays
+        velhos = np.flatnonzero(a['ativo'][:self.tamanho] & (a['ultimo_ns'][:self.tamanho] < limite_ns))
+        if not len(velhos):
+            return 0
+        _, onde = self._procurar(a['ip_menor'][velhos], a['ip_maior'][velhos], a['portas'][velhos])
+        self.entradas[onde] = _REMOVIDA
+        self.removidas += len(velhos)
+        for nome, (_, _, inicial) in self.CAMPOS.items():
+            a[nome][velhos] = inicial
+        self.livres.extend(velhos.tolist())
+        self._por_fluxo = self._ordem = None
+        return len(velhos)
+
+    def atualizar(self, pacotes):
+        """
+        Incorpora um bloco (dict de colunas do leitorPcap ou DataFrame do
+        carregamento compacto, em ordem de tempo). Devolve, por pacote, a
+        posição do fluxo, o sentido e a classe do detector de retransmissões
+        (None sem seq/segmento_tcp_len/flags no bloco).
+        """
+        self._por_fluxo = None
+        ns = np.asarray(pacotes['timestamp_ns'], dtype=np.int64)
+        src_ip = np.asarray(pacotes['src_ip'], dtype=np.uint32)
+        dst_ip = np.asarray(pacotes['dst_ip'], dtype=np.uint32)
+        src_port = np.asarray(pacotes['src_port'], dtype=np.uint32)
+        dst_port = np.asarray(pacotes['dst_port'], dtype=np.uint32)
+
+        # Pacotes sem algum dos IPs vão todos para uma chave só (rótulo de incompleto)
+        incompleto = (src_ip == 0) | (dst_ip == 0)
+        extremo_src = (src_ip.astype(np.uint64) << np.uint64(16)) | src_port
+        extremo_dst = (dst_ip.astype(np.uint64) << np.uint64(16)) | dst_port
+        sentido = (extremo_src > extremo_dst).astype(np.int64)
+        ip_menor = np.where(incompleto, 0, np.minimum(src_ip, dst_ip)).astype(np.uint32)
+        ip_maior = np.where(incompleto, 0, np.maximum(src_ip, dst_ip)).astype(np.uint32)
+        portas = np.where(incompleto, 0, (np.minimum(src_port, dst_port) << 16)
+                          | np.maximum(src_port, dst_port)).astype(np.uint32)
+
+        # Só as chaves distintas do bloco são sondadas
+        codigos_par, pares = pd.factorize((ip_menor.astype(np.uint64) << np.uint64(32)) | ip_maior)
+        codigos, unicas = pd.factorize((codigos_par.astype(np.int64) << 32) | portas)
+        pares = np.asarray(pares, dtype=np.uint64)[unicas >> 32]
+        posicoes = self.posicionar((pares >> np.uint64(32)).astype(np.uint32),
+                                   (pares & np.uint64(0xFFFFFFFF)).astype(np.uint32),
+                                   (unicas & 0xFFFFFFFF).astype(np.uint32))
+        a = self.arrays
+        a['incompleto'][posicoes] = incompleto[np.unique(codigos, return_index=True)[1]]
+        posicao = posicoes[codigos]
+        direcao = posicao * 2 + sentido
+        n = self.tamanho
+
+        np.minimum.at(a['primeiro_ns'], posicao, ns)
+        np.maximum.at(a['ultimo_ns'], posicao, ns)
+        a['pacotes'][:n].reshape(-1)[:] += np.bincount(direcao, minlength=2 * n)
+        if 'length' in pacotes:
+            tamanhos = np.nan_to_num(np.asarray(pacotes['length'], dtype=np.float64))
+            a['bytes'][:n].reshape(-1)[:] += np.bincount(direcao, weights=tamanhos, minlength=2 * n)
+            self.acumulados.add('bytes')
+        if 'mss' in pacotes:
+            mss = np.asarray(pacotes['mss'], dtype=np.int64)
+            np.minimum.at(a['mss'], posicao[mss >= 0], mss[mss >= 0])
+            self.acumulados.add('mss')
+
+        classes = None
+        if 'flags' in pacotes:
+            flags = np.asarray(pacotes['flags'], dtype=np.uint8)
+            for coluna, (_, bit) in enumerate(FLAGS_TCP):
+                a['flags'][:n, coluna] += np.bincount(posicao[(flags & bit) != 0], minlength=n)
+            syn = (flags & _BITS['S']) != 0
+            ack = (flags & _BITS['A']) != 0
+            for nome, selecao in (('syn_ns', syn & ~ack), ('synack_ns', syn & ack), ('ack_ns', ~syn & ack)):
+                np.minimum.at(a[nome], posicao[selecao], ns[selecao])
+            self.acumulados.update(('flags', 'handshake'))
+
+            if 'seq' in pacotes and 'segmento_tcp_len' in pacotes:
+                classes = self._classificar(direcao, ns, pacotes['seq'], pacotes['segmento_tcp_len'],
+                                            syn, (flags & _BITS['F']) != 0)
+        return posicao, sentido, classes
+
+    def _classificar(self, direcao, ns, seq, tamanho, syn, fin):
+        """Retransmissões do bloco com o estado só dos sentidos presentes nele"""
+        a = self.arrays
+        seq_fim, t_seq_fim, tem_estado = (a[nome].reshape(-1) for nome in ('seq_fim', 't_seq_fim', 'tem_estado'))
+        presentes = np.unique(direcao)
+        presentes = presentes[tem_estado[presentes]]
+        estado = pd.DataFrame({'seq_fim': seq_fim[presentes], 't_seq_fim': t_seq_fim[presentes]},
+                              index=pd.Index(presentes, name='direcao'))
+        classes, estado = classificar_segmentos(direcao, ns, seq, tamanho, syn, fin, estado=estado)
+        atualizadas = estado.index.to_numpy(dtype=np.int64)
+        seq_fim[atualizadas] = estado['seq_fim'].to_numpy()
+        t_seq_fim[atualizadas] = estado['t_seq_fim'].to_numpy()
+        tem_estado[atualizadas] = True
+        minimo = 2 * self.tamanho
+        a['segmentos'][:self.tamanho].reshape(-1)[:] += np.bincount(direcao[classes != NAO_SEGMENTO],
+                                                                    minlength=minimo)
+        a['retransmissoes'][:self.tamanho].reshape(-1)[:] += np.bincount(direcao[classes == RETRANSMISSAO],
+                                                                         minlength=minimo)
+        self.acumulados.add('retransmissoes')
+        return classes
+
+    def _ordenar(self):
+        """(rótulos em ordem alfabética, id por posição, posições nessa ordem), calculados uma vez"""
+        if self._ordem is None:
+            a = self.arrays
+            ativas = np.flatnonzero(a['ativo'][:self.tamanho])
+            portas = a['portas'][ativas]
+            rotulos = rotulos_inteiros(a['ip_menor'][ativas], a['ip_maior'][ativas], portas >> 16,
+                                       portas & 0xFFFF, a['incompleto'][ativas])
+            ordem = np.argsort(rotulos.astype(str), kind='stable')
+            id_por_posicao = np.full(self.tamanho, -1, dtype=np.int64)
+            id_por_posicao[ativas[ordem]] = np.arange(len(ordem))
+            self._ordem = (rotulos[ordem], id_por_posicao, ativas[ordem])
+        return self._ordem
+
+    def rotulos(self):
+        """
+        Rótulos dos fluxos ativos em ordem alfabética e o id de cada posição
+        nessa ordem (o flow_id do chavear_fluxos; -1 nas posições livres):
+        devolve (rotulos, id_por_posicao).
+        """
+        rotulos, id_por_posicao, _ = self._ordenar()
+        return rotulos, id_por_posicao
+
+    def rotulo(self, posicao):
+        """Rótulo de uma posição só, sem ordenar a tabela"""
+        a = self.arrays
+        fatia = slice(posicao, posicao + 1)
+        return rotulos_inteiros(a['ip_menor'][fatia], a['ip_maior'][fatia], a['portas'][fatia] >> 16,
+                                a['portas'][fatia] & 0xFFFF, a['incompleto'][fatia])[0]
+
+    def por_fluxo(self):
+        """
+        DataFrame indexado pelo rótulo (em ordem alfabética) com os acumulados
+        de cada fluxo ativo; só entram as colunas dos acumuladores alimentados.
+        """
+        if self._por_fluxo is not None:
+            return self._por_fluxo
+        a = self.arrays
+        rotulos, _, ordem = self._ordenar()
+
+        def campo(nome):
+            return a[nome][ordem]
+
+        inicio, fim = campo('primeiro_ns'), campo('ultimo_ns')
+        pacotes = campo('pacotes')
+        colunas = {'pacotes': pacotes.sum(axis=1), 'pacotes_0': pacotes[:, 0], 'pacotes_1': pacotes[:, 1],
+                   'inicio_ns': inicio, 'fim_ns': fim, 'duracao': em_segundos(fim - inicio)}
+        if 'bytes' in self.acumulados:
+            por_sentido = campo('bytes')
+            colunas['bytes_0'], colunas['bytes_1'] = por_sentido[:, 0], por_sentido[:, 1]
+            volume = pd.Series(por_sentido.sum(axis=1))
+            duracao = pd.Series(colunas['duracao'])
+            colunas['bytes'] = volume.to_numpy()
+            colunas['throughput'] = (volume / duracao.replace(0, np.nan)).fillna(0).to_numpy()
+        if 'handshake' in self.acumulados:
+            for coluna, nome in (('syn', 'syn_ns'), ('syn_ack', 'synack_ns'), ('ack', 'ack_ns')):
+                tempos = campo(nome)
+                colunas[coluna] = pd.arrays.IntegerArray(tempos, tempos == _SEM_TEMPO)
+        if 'mss' in self.acumulados:
+            mss = campo('mss')
+            colunas['mss'] = np.where(mss == _SEM_MSS, np.nan, mss)
+        if 'flags' in self.acumulados:
+            for coluna, (letra, _) in enumerate(FLAGS_TCP):
+                colunas['flags_' + letra] = a['flags'][ordem, coluna]
+        if 'retransmissoes' in self.acumulados:
+            for sentido in (0, 1):
+                tem = a['tem_estado'][ordem, sentido]
+                colunas[f'seq_fim_{sentido}'] = pd.arrays.IntegerArray(a['seq_fim'][ordem, sentido], ~tem)
+            colunas['segmentos'] = campo('segmentos').sum(axis=1)
+            colunas['retransmissoes'] = campo('retransmissoes').sum(axis=1)
+        self._por_fluxo = pd.DataFrame(colunas, index=pd.Index(rotulos))
+        return self._por_fluxo
+
+    def secoes(self):
+        """Seções por conexão do stats_completo.json que os acumuladores alimentados permitem"""
+        por_fluxo = self.por_fluxo()
+        stats = secoes_duracao(por_fluxo)
+        if 'bytes' in self.acumulados:
+            stats.update(secoes_throughput(por_fluxo))
+            stats.update(secoes_elefantes(por_fluxo))
+        if 'handshake' in self.acumulados:
+            stats.update(secoes_handshake(por_fluxo))
+        if 'mss' in self.acumulados:
+            stats.update(secoes_mss(por_fluxo))
+        if 'retransmissoes' in self.acumulados:
+            stats.update(secoes_retransmissoes(por_fluxo))
+        return stats
+
+
+# Seções do stats a partir de TabelaFluxos.por_fluxo (usadas também pelas
+# métricas registradas em dataProcessing.py)
+
+def secoes_duracao(por_fluxo):
+    duracao = por_fluxo['duracao']
+    return {'duracao_conexoes': duracao.to_dict(),
+            'distribuicao_duracao_conexoes': distribuicao(duracao, chave_total='total_conexoes')}
+
+
+def secoes_throughput(por_fluxo):
+    throughput = por_fluxo['throughput']
+    return {'throughput_por_conexao': throughput.to_dict(),
+            'distribuicao_throughput': distribuicao(throughput, chave_total='total_conexoes')}
+
+
+def secoes_elefantes(por_fluxo):
+    return {'fluxos_elefantes': por_fluxo['bytes'].sort_values(ascending=False).head(10).to_dict()}
+
+
+def secoes_handshake(por_fluxo):
+    # RTT entre SYN e SYN-ACK; estabelecimento entre SYN e ACK final
+    rtt, estabelecimento = tempos_handshake(por_fluxo[['syn', 'syn_ack', 'ack']])
+    return {'rtt_por_conexao': rtt.to_dict(),
+            'distribuicao_rtt': distribuicao(rtt, chave_total='total_conexoes'),
+            'tempos_estabelecimento': estabelecimento.tolist()}
+
+
+def secoes_mss(por_fluxo):
+    return {'mss_por_conexao': por_fluxo['mss'].dropna().to_dict()}
+
+
+def secoes_retransmissoes(por_fluxo):
+    # Sobre os segmentos que ocupam sequência
+    com_segmentos = por_fluxo[por_fluxo['segmentos'] > 0]
+    return {'taxa_retransmissoes_por_conexao':
+            (com_segmentos['retransmissoes'] / com_segmentos['segmentos']).to_dict()}
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+# Os pacotes carregam o tempo na coluna timestamp_ns (int64, nanossegundos
+# desde a época), do carregamento até a geração dos jsons. Arredondamentos,
+# durações e agrupamentos por segundo/minuto são aritmética inteira; a
+# conversão para pd.Timestamp (que o escritorJson grava como texto ISO) só
+# acontece no fim e só para as chaves que vão para a saída.
+
+NS_POR_SEGUNDO = 1_000_000_000
+NS_POR_MINUTO = 60 * NS_POR_SEGUNDO
+
+
+def segundos_para_ns(segundos):
+    """
+    Timestamps em segundos (float do data.csv) -> (ns int64, máscara dos
+    válidos), com a mesma conversão do pd.to_datetime(unit='s').
+    """
+    datas = pd.to_datetime(segundos, unit='s', errors='coerce')
+    validos = datas.notna().to_numpy()
+    return datas.to_numpy(dtype='datetime64[ns]').view(np.int64), validos
+
+
+def piso(ns, largura_ns):
+    """Equivalente ao .dt.floor: início do intervalo de `largura_ns` que contém cada timestamp"""
+    return ns - ns % largura_ns
+
+
+def em_segundos(delta_ns):
+    """Diferença em ns -> segundos float (mesmo valor do .dt.total_seconds())"""
+    return delta_ns / NS_POR_SEGUNDO
+
+
+def para_datas(ns):
+    return pd.DatetimeIndex(np.asarray(ns, dtype=np.int64).view('datetime64[ns]'))
+
+
+def com_datas(serie):
+    """Troca o índice em ns (já reduzido ao que vai para a saída) por pd.Timestamp"""
+    return serie.set_axis(para_datas(serie.index))
@@ -0,0 +1,15 @@
+import filecmp
+
+from amostragem import amostrar_por_tempo
+from gerarTrafego import gerar_colunas, salvar_csv
+
+
+def test_amostra_por_tempo_independe_dos_blocos(tmp_path):
+    # Estratos divididos entre blocos continuam a contagem do bloco anterior,
+    # mesmo com os contadores dos estratos antigos descartados
+    entrada = tmp_path / 'data.csv'
+    salvar_csv(gerar_colunas(30_000, fluxos=500, semente=3), str(entrada))
+    inteiro, blocos = tmp_path / 'inteiro.csv', tmp_path / 'blocos.csv'
+    total = amostrar_por_tempo(str(entrada), str(inteiro), 0.1, estrato=0.5, tamanho_bloco=1_000_000)
+    assert amostrar_por_tempo(str(entrada), str(blocos), 0.1, estrato=0.5, tamanho_bloco=777) == total
+    assert filecmp.cmp(inteiro, blocos, shallow=False)
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from frequentes import CAPACIDADE_PADRAO, combinar_frequentes, mais_frequentes, resumir_frequentes
+
+
+def _exato(chaves, n=10):
+    """Top n exato com os desempates do value_counts (primeira ocorrência)"""
+    contagem = pd.Series(chaves).value_counts(sort=False)
+    return contagem.sort_values(ascending=False, kind='stable').head(n)
+
+
+def _mesclar(partes, capacidade=CAPACIDADE_PADRAO):
+    resumo, inicio = None, 0
+    for parte in partes:
+        atual = resumir_frequentes(parte, posicoes=np.arange(inicio, inicio + len(parte)), capacidade=capacidade)
+        resumo = atual if resumo is None else combinar_frequentes(resumo, atual, capacidade)
+        inicio += len(parte)
+    return resumo
+
+
+def test_mesclagem_sem_descarte_e_exata():
+    rng = np.random.default_rng(1)
+    chaves = rng.zipf(1.5, 20_000) % 3000
+    resumo = _mesclar(np.array_split(chaves, 7))
+    assert mais_frequentes(resumo).astype(np.int64).to_dict() == _exato(chaves).to_dict()
+
+
+def test_fatias_disjuntas_acima_da_capacidade_nao_inflam():
+    # Cada fatia tem mais chaves que contadores e nenhuma chave aparece em
+    # duas fatias (como os fluxos do modo paralelo): o piso de um lado não
+    # pode entrar na contagem informada de chaves que ele não viu
+    rng = np.random.default_rng(2)
+    fatias = [rng.zipf(1.3, 60_000) % 20_000 + i * 100_000 for i in range(3)]
+    chaves = np.concatenate(fatias)
+    resumo = _mesclar(fatias)
+    exato = pd.Series(chaves).value_counts()
+    informado = mais_frequentes(resumo, n=100)
+    assert (informado <= exato.reindex(informado.index)).all()
+    assert mais_frequentes(resumo).astype(np.int64).to_dict() == _exato(chaves).to_dict()
+
+
+def test_limites_da_garantia():
+    rng = np.random.default_rng(3)
+    chaves = rng.zipf(1.2, 50_000) % 10_000
+    capacidade = 256
+    resumo = _mesclar(np.array_split(chaves, 5), capacidade)
+    exato = pd.Series(chaves).value_counts().reindex(resumo.index)
+    assert len(resumo) <= capacidade
+    assert ((resumo['contagem'] - resumo['erro'] <= exato) & (exato <= resumo['contagem'])).all()
+    # Toda chave acima de N / capacidade está no resumo
+    pesadas = pd.Series(chaves).value_counts()
+    assert pesadas[pesadas > len(chaves) / capacidade].index.isin(resumo.index).all()
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+import dataProcessing as dp
+from anexos import embutir_anexos
+from frequentes import CAPACIDADE_PADRAO
+from gerarTrafego import gerar_colunas, salvar_csv
+
+# Os modos paralelo e em blocos têm de dar o mesmo resultado da análise em
+# memória. A captura tem mais fluxos, portas e IPs de destino distintos que
+# os contadores de um resumo de itens frequentes (CAPACIDADE_PADRAO), mesmo
+# em cada fatia ou bloco.
+
+
+@pytest.fixture(scope='module')
+def captura(tmp_path_factory):
+    colunas = gerar_colunas(200_000, fluxos=12_000, semente=7)
+    for coluna in ('dst_port', 'dst_ip'):
+        assert len(np.unique(colunas[coluna])) > CAPACIDADE_PADRAO
+    pasta = tmp_path_factory.mktemp('captura')
+    salvar_csv(colunas, pasta / 'data.csv')
+    # A mesma captura em dois arquivos, para o modo com cache
+    metade = len(colunas['timestamp_ns']) // 2
+    for i, fatia in enumerate((slice(None, metade), slice(metade, None))):
+        salvar_csv({nome: coluna[fatia] for nome, coluna in colunas.items()}, pasta / f'parte_{i}.csv')
+    return str(pasta / 'data.csv')
+
+
+@pytest.fixture(scope='module')
+def serial(captura):
+    stats, resumo = dp.analisar_estatisticas(captura)
+    return embutir_anexos(stats), resumo
+
+
+def _igual(stats, esperado):
+    """
+    Igualdade exata, menos o desvio padrão dos tamanhos: os momentos mesclados
+    (quantis.combinar_momentos) arredondam em outra ordem que os do conjunto
+    inteiro
+    """
+    assert list(stats) == list(esperado)
+    stats, esperado = dict(stats), dict(esperado)
+    if 'distribuicao_tamanhos_segmentos' in esperado:
+        distribuicao = dict(stats.pop('distribuicao_tamanhos_segmentos'))
+        referencia = dict(esperado.pop('distribuicao_tamanhos_segmentos'))
+        desvio, desvio_referencia = distribuicao.pop('desvio_padrao'), referencia.pop('desvio_padrao')
+        assert desvio == pytest.approx(desvio_referencia, rel=1e-12)
+        assert distribuicao == referencia
+    assert stats == esperado
+
+
+def test_paralelo_igual_ao_serial(captura, serial):
+    stats, resumo = dp.analisar_estatisticas_paralelo(captura, 2)
+    assert len(serial[0]['duracao_conexoes']) > CAPACIDADE_PADRAO
+    _igual(embutir_anexos(stats), serial[0])
+    _igual(embutir_anexos(resumo), embutir_anexos(serial[1]))
+
+
+def _sem_secoes_por_pacote(stats):
+    """O modo em blocos não gera as seções com um valor por pacote"""
+    return {secao: valor for secao, valor in stats.items() if secao not in
+            ('janela_congestionamento', 'tamanhos_segmentos', 'microbursts_subsegundo')}
+
+
+def test_blocos_igual_ao_serial(captura, serial):
+    stats, resumo = dp.analisar_estatisticas_em_blocos(captura, 40_000)
+    _igual(stats, _sem_secoes_por_pacote(serial[0]))
+    _igual(resumo, _sem_secoes_por_pacote(serial[1]))
+
+
+def test_cache_igual_ao_serial(captura, serial, tmp_path):
+    pasta = os.path.dirname(captura)
+    caminhos = [os.path.join(pasta, f'parte_{i}.csv') for i in range(2)]
+    # A segunda rodada lê os parciais do cache
+    for _ in range(2):
+        parcial, _ = dp.acumular_arquivos(caminhos, 40_000, str(tmp_path / 'cache'))
+        stats, _ = dp.estatisticas_de_parcial(parcial)
+        _igual(stats, _sem_secoes_por_pacote(serial[0]))
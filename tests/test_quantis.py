@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from quantis import ALFA_PADRAO, combinar_esbocos, combinar_momentos, esbocar, momentos, quantis, resumir
+
+
+def _partes(valores, n_partes):
+    return np.array_split(valores, n_partes)
+
+
+def test_esboco_mesclado_igual_ao_do_conjunto():
+    rng = np.random.default_rng(1)
+    valores = np.concatenate((rng.lognormal(6, 2, 30_000), np.zeros(500)))
+    esboco = None
+    for parte in _partes(valores, 9):
+        atual = esbocar(parte)
+        esboco = atual if esboco is None else combinar_esbocos(esboco, atual)
+    assert esboco.sort_index().equals(esbocar(valores).sort_index())
+
+
+def test_garantia_de_erro_relativo():
+    rng = np.random.default_rng(2)
+    valores = rng.pareto(1.5, 50_000) * 100
+    qs = np.array([0.01, 0.25, 0.5, 0.9, 0.99])
+    estimados = quantis(esbocar(valores), qs)
+    reais = np.sort(valores)[np.floor(qs * (len(valores) - 1)).astype(np.int64)]
+    assert (np.abs(estimados - reais) <= ALFA_PADRAO * reais + 1e-12).all()
+
+
+def test_momentos_mesclados_sem_cancelamento():
+    # Timestamps em ns: valores ~1.7e18 com desvio de alguns segundos, onde
+    # soma_quad / n - media^2 perde todos os dígitos
+    rng = np.random.default_rng(3)
+    valores = 1.736e18 + rng.normal(0, 5e9, 100_000)
+    partes = [momentos(p) for p in _partes(valores, 7)]
+    juntos = combinar_momentos(*([m[nome] for m in partes] for nome in ('n', 'soma', 'm2')))
+    assert juntos['n'] == len(valores)
+    assert np.isclose(juntos['soma'] / juntos['n'], valores.mean(), rtol=1e-15, atol=0)
+    assert np.isclose(np.sqrt(juntos['m2'] / juntos['n']), valores.std(), rtol=1e-9)
+    resumo = resumir(esbocar(valores), juntos, valores.min(), valores.max())
+    assert np.isclose(resumo['desvio_padrao'], valores.std(), rtol=1e-9)
+
+
+def test_momentos_com_partes_vazias():
+    partes = [momentos([]), momentos([1.0, 2.0, 4.0]), momentos([])]
+    juntos = combinar_momentos(*([m[nome] for m in partes] for nome in ('n', 'soma', 'm2')))
+    esperado = momentos([1.0, 2.0, 4.0])
+    assert juntos.equals(esperado)
+    assert combinar_momentos([], [], [])['n'] == 0
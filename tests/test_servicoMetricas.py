@@ -0,0 +1,27 @@
+import pytest
+
+from servicoMetricas import ErroConsulta, _instante, _positivo
+
+
+@pytest.mark.parametrize('texto', ['0', '-3', 'x', '1.5'])
+def test_n_invalido_e_rejeitado(texto):
+    with pytest.raises(ErroConsulta) as erro:
+        _positivo(texto, 10)
+    assert erro.value.status == 400
+
+
+def test_n_valido():
+    assert _positivo(None, 10) == 10
+    assert _positivo('3', 10) == 3
+
+
+@pytest.mark.parametrize('texto', ['inf', '-inf', 'nan', '1e300', 'NaT', 'ontem'])
+def test_instante_invalido_e_rejeitado(texto):
+    with pytest.raises(ErroConsulta) as erro:
+        _instante(texto, 0)
+    assert erro.value.status == 400
+
+
+def test_instante_valido():
+    assert _instante('1736564000', 0) == 1736564000 * 10**9
+    assert _instante('2025-01-11 02:53:20', 0) == 1736564000 * 10**9